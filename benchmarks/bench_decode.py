@@ -0,0 +1,100 @@
+"""
+Benchmark of response decoding: the decode speed of one page of the mock
+server's wide Job object (limit=100, every property) with the standard
+library json module and with orjson, then ``--endpoints`` concurrent
+endpoints paging through it as the client does. Reports the peak of Python
+allocations (tracemalloc) and the wall time, e.g.::
+
+    python benchmarks/bench_decode.py --endpoints 20 --jobs 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import urllib.request
+
+from common import mock_server, setup_django
+
+
+async def drain(url, endpoints, pages):
+    import aiohttp
+
+    from hubspot_sync.client import HubSpotClient, RateLimiter
+
+    async def fetch(session, client):
+        params = {"limit": 100}
+        records = 0
+        for _ in range(pages):
+            status, data = await client.get("/crm/v3/objects/2-37778614", params=params)
+            records += len(data["results"])
+            after = data.get("paging", {}).get("next", {}).get("after")
+            # Only the in-flight page is kept, as in the serial sync loop.
+            del data
+            if not after:
+                break
+            params["after"] = after
+        return records
+
+    async with aiohttp.ClientSession() as session:
+        client = HubSpotClient(session, "benchmark", limiter=RateLimiter(100000, 1.0), base_url=url)
+        counts = await asyncio.gather(*(fetch(session, client) for _ in range(endpoints)))
+    return sum(counts)
+
+
+def measure(url, endpoints, pages):
+    started = time.perf_counter()
+    asyncio.run(drain(url, endpoints, pages))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    records = asyncio.run(drain(url, endpoints, pages))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, elapsed, peak
+
+
+def decode_speed(url, repeat=20):
+    with urllib.request.urlopen(f"{url}/crm/v3/objects/2-37778614?limit=100") as response:
+        body = response.read()
+    results = {}
+    backends = [("json", json.loads)]
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        backends.append(("orjson", orjson.loads))
+    for name, loads in backends:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            loads(body)
+        results[name] = (time.perf_counter() - started) / repeat
+    return len(body), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", type=int, default=20)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--pages", type=int, default=20, help="Pages fetched per endpoint.")
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    setup_django()
+    from hubspot_sync.client import JSON_BACKEND
+
+    with mock_server(jobs=args.jobs, divisions=0, employees=0, latency=args.latency) as url:
+        page_bytes, speeds = decode_speed(url)
+        print(f"One page of 100 jobs: {page_bytes / 1024:,.0f} KiB")
+        for name, seconds in speeds.items():
+            print(f"  {name:<8} {seconds * 1000:8.2f} ms/page")
+        print(f"{args.endpoints} concurrent endpoints x {args.pages} pages, JSON backend: {JSON_BACKEND}")
+        records, elapsed, peak = measure(url, args.endpoints, args.pages)
+        print(
+            f"  {records:8,} records {elapsed:8.2f}s "
+            f"{records / elapsed:10,.0f} records/s  peak {peak / 2**20:8.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compare the three ways sync_hubspot can persist the Job table:
+
+* per-row   - one update_or_create() per record (the original save_record path)
+* bulk      - BulkWriter, one bulk_create(update_conflicts=True) per page
+* copy      - CopyLoader, COPY into a staging table + one INSERT ... ON CONFLICT
+
+The COPY path is only measured on PostgreSQL.
+"""
+import argparse
+
+from common import report, setup_django, synthetic_records, test_database, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    setup_django()
+    from hubspot_sync.models import Job
+    from hubspot_sync.writers import BulkWriter, CopyLoader
+
+    endpoint = "2-37778614"
+    records = synthetic_records(Job, "job_id", args.rows)
+    pages = [records[i:i + args.page_size] for i in range(0, len(records), args.page_size)]
+    results = {}
+
+    with test_database():
+        writer = BulkWriter(endpoint)
+
+        with timed(results, "per-row"):
+            for record in records:
+                obj = writer.build_instance(record)
+                data = {field.name: getattr(obj, field.attname) for field in writer.fields}
+                Job.objects.update_or_create(job_id=data.pop("job_id"), defaults=data)
+        Job.objects.all().delete()
+
+        with timed(results, "bulk"):
+            for page in pages:
+                writer.write(page)
+        Job.objects.all().delete()
+
+        if CopyLoader.supported():
+            loader = CopyLoader(endpoint)
+            with timed(results, "copy"):
+                loader.begin()
+                for page in pages:
+                    loader.write(page)
+                loader.finish()
+        else:
+            print("COPY loader skipped: the configured database is not PostgreSQL.")
+
+    report(f"Job full load, {args.rows} rows, {args.page_size} rows/page", args.rows, results)
+
+
+if __name__ == "__main__":
+    main()
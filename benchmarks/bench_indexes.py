@@ -0,0 +1,184 @@
+"""
+Time representative report queries on Job, Division and Employee without
+and with the indexes declared on the models (migration 0010):
+
+* modified      - jobs modified in the last day (BRIN on hs_lastmodifieddate)
+* object ids    - 1,000 jobs by hs_object_id (reconciliation, association joins)
+* division      - contract total of one division over a quarter
+* contract month - jobs per division signed in one month
+* active staff  - active employees of one division (partial index)
+* staff by user - 50 active employees by user id (partial index)
+
+The tables are filled with ``--rows`` synthetic jobs (1M by default), a
+tenth as many employees and 500 divisions. Only the columns the queries
+touch are set. Modification times ascend with the row order, as
+incremental syncs write them. Each query runs ``--repeat`` times and the
+median is reported. On PostgreSQL ``--explain`` prints the plans as well.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from common import setup_django, test_database
+
+BATCH_SIZE = 10000
+DIVISIONS = 500
+
+
+def fill(args):
+    from hubspot_sync.models import Division, Employee, Job
+
+    rng = random.Random(0)
+    modified = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    step = timedelta(days=365) / args.rows
+    first_contract = date(2022, 1, 1)
+    Division.objects.bulk_create(
+        Division(id=i, hs_object_id=i, label=f"Division {i}", hs_lastmodifieddate=modified)
+        for i in range(1, DIVISIONS + 1)
+    )
+    for start in range(0, args.rows, BATCH_SIZE):
+        Job.objects.bulk_create(
+            [
+                Job(
+                    job_id=i,
+                    hs_object_id=i,
+                    division_id=float(rng.randint(1, DIVISIONS)),
+                    contract_date=first_contract + timedelta(days=rng.randrange(3 * 365)),
+                    contract_amount=rng.uniform(1000, 50000),
+                    hs_lastmodifieddate=modified + step * i,
+                )
+                for i in range(start + 1, min(start + BATCH_SIZE, args.rows) + 1)
+            ]
+        )
+    employees = max(1, args.rows // 10)
+    for start in range(0, employees, BATCH_SIZE):
+        Employee.objects.bulk_create(
+            [
+                Employee(
+                    hs_object_id=i,
+                    firstname="Synthetic",
+                    employee_division_id=rng.randint(1, DIVISIONS),
+                    employee_user_id=i,
+                    # Most of the history is people who have left.
+                    is_inactive="0" if rng.random() < 0.2 else "1",
+                )
+                for i in range(start + 1, min(start + BATCH_SIZE, employees) + 1)
+            ]
+        )
+    return modified + step * args.rows
+
+
+def queries(last_modified, rows):
+    from django.db.models import Count, Sum
+
+    from hubspot_sync.models import ACTIVE_EMPLOYEE, Employee, Job
+
+    rng = random.Random(1)
+    ids = rng.sample(range(1, rows + 1), min(1000, rows))
+    return {
+        "modified": lambda: Job.objects.filter(hs_lastmodifieddate__gte=last_modified - timedelta(days=1)).count(),
+        "object ids": lambda: len(Job.objects.filter(hs_object_id__in=ids).values_list("job_id")),
+        "division": lambda: Job.objects.filter(
+            division_id=7.0, contract_date__range=(date(2023, 1, 1), date(2023, 3, 31))
+        ).aggregate(Sum("contract_amount")),
+        "contract month": lambda: list(
+            Job.objects.filter(contract_date__range=(date(2023, 6, 1), date(2023, 6, 30)))
+            .values("division_id")
+            .annotate(jobs=Count("job_id"))
+        ),
+        "active staff": lambda: Employee.objects.filter(ACTIVE_EMPLOYEE, employee_division_id=7).count(),
+        "staff by user": lambda: list(
+            Employee.objects.filter(ACTIVE_EMPLOYEE, employee_user_id__in=ids[:50]).values_list("hs_object_id")
+        ),
+    }
+
+
+def measure(cases, repeat):
+    results = {}
+    for label, query in cases.items():
+        query()  # warm the cache
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - started)
+        results[label] = statistics.median(timings)
+    return results
+
+
+def explain(connection, cases):
+    for label, query in cases.items():
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            query()
+        print(f"-- {label}")
+        with connection.cursor() as cursor:
+            for sql, params in statements:
+                cursor.execute(f"EXPLAIN {sql}", params)
+                for (line,) in cursor.fetchall():
+                    print(f"   {line}")
+
+
+def set_indexes(connection, models, create):
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                if create:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+    analyze(connection)
+
+
+def analyze(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--explain", action="store_true", help="Print the query plans (PostgreSQL).")
+    args = parser.parse_args()
+
+    setup_django()
+    from hubspot_sync.models import Division, Employee, Job
+
+    models = (Job, Division, Employee)
+    with test_database() as connection:
+        # Load without the new indexes, as the tables were before them.
+        set_indexes(connection, models, create=False)
+        started = time.perf_counter()
+        last_modified = fill(args)
+        print(f"Loaded {args.rows:,} jobs in {time.perf_counter() - started:.1f}s ({connection.vendor}).")
+        analyze(connection)
+        cases = queries(last_modified, args.rows)
+        show_plans = args.explain and connection.vendor == "postgresql"
+
+        if show_plans:
+            explain(connection, cases)
+        before = measure(cases, args.repeat)
+        started = time.perf_counter()
+        set_indexes(connection, models, create=True)
+        print(f"Built the indexes in {time.perf_counter() - started:.1f}s.")
+        if show_plans:
+            explain(connection, cases)
+        after = measure(cases, args.repeat)
+
+    print(f"Report queries, median of {args.repeat} runs")
+    print(f"  {'query':<16} {'before':>10} {'after':>10} {'speedup':>9}")
+    for label in cases:
+        speedup = before[label] / after[label] if after[label] else float("inf")
+        print(f"  {label:<16} {before[label] * 1000:8.2f}ms {after[label] * 1000:8.2f}ms {speedup:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
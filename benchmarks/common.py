@@ -0,0 +1,104 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+The scripts run against a throwaway test database created from the configured
+DATABASE_URL (the same way ``manage.py test`` does), so they never touch real
+synced data. Run them from the project root, e.g.::
+
+    DATABASE_URL=postgres://... python benchmarks/bench_full_load.py --rows 50000
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hubspot.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def timed(results, label):
+    started = time.perf_counter()
+    yield
+    results[label] = time.perf_counter() - started
+
+
+def synthetic_records(model, key, count, seed=0, start=1):
+    from hubspot_sync.mock_server import synthetic_records
+
+    return synthetic_records(model, key, count, seed=seed, start=start)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def fetch_stats(url):
+    with urllib.request.urlopen(f"{url}/__stats") as response:
+        return json.loads(response.read())
+
+
+@contextmanager
+def mock_server(**options):
+    """
+    Run hubspot_sync.mock_server in a child process for the duration of the
+    block and yield its base URL. Keyword arguments become its command line
+    flags (``rate_limit=100`` -> ``--rate-limit 100``); None values are left out.
+    """
+    port = free_port()
+    command = [sys.executable, "-m", "hubspot_sync.mock_server", "--port", str(port)]
+    for name, value in options.items():
+        if value is not None:
+            command += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command, cwd=ROOT)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                fetch_stats(url)
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise SystemExit("The mock server did not start.")
+                time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def report(title, rows, results):
+    print(title)
+    for label, seconds in results.items():
+        rate = rows / seconds if seconds else float("inf")
+        print(f"  {label:<24} {seconds:9.3f}s  {rate:12,.0f} rows/s")
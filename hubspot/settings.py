@@ -133,3 +133,72 @@ STATIC_URL = "/static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 HUBSPOT_API_TOKEN = os.environ.get("HUBSPOT_API_TOKEN")
+HUBSPOT_API_BASE_URL = os.environ.get("HUBSPOT_API_BASE_URL", "https://api.hubapi.com")
+
+# Several HubSpot accounts (e.g. production and sandbox) synced concurrently,
+# each with its own token and database alias from DATABASES:
+#   {"production": {"token": "...", "database": "default", "portal_id": 123},
+#    "sandbox": {"token": "...", "database": "sandbox", "base_url": None}}
+# "portal_id" (the HubSpot account id) routes webhook events to the portal.
+# When empty, the single portal of HUBSPOT_API_TOKEN is synced into "default".
+HUBSPOT_PORTALS = {}
+
+# Starting point for the shared request limiter (calls per interval in
+# seconds); it adjusts itself from HubSpot's rate-limit response headers.
+HUBSPOT_RATE_LIMIT_MAX = int(os.environ.get("HUBSPOT_RATE_LIMIT_MAX", 100))
+HUBSPOT_RATE_LIMIT_INTERVAL = float(os.environ.get("HUBSPOT_RATE_LIMIT_INTERVAL", 10))
+
+# Seconds the cached object schemas and property definitions are trusted
+# before /crm/v3/schemas is asked again (conditionally, if it sent an ETag).
+HUBSPOT_SCHEMA_TTL = int(os.environ.get("HUBSPOT_SCHEMA_TTL", 24 * 60 * 60))
+
+# Seconds between full comparisons of HubSpot's live ids with the local
+# tables in sync_hubspot --reconcile (archived records are fetched every run).
+HUBSPOT_RECONCILE_INTERVAL = int(os.environ.get("HUBSPOT_RECONCILE_INTERVAL", 24 * 60 * 60))
+
+# Associations synced by sync_hubspot --associations, as (from, to) pairs of
+# object names, fully qualified names or object type ids. Edges of an object
+# are refreshed for every record fetched by that object's sync.
+HUBSPOT_ASSOCIATIONS = [
+    ("jobs", "divisions"),
+    ("jobs", "employees"),
+    ("employees", "divisions"),
+]
+
+# Client secret of the HubSpot app, used to validate webhook signatures (v3).
+# Behind a TLS-terminating proxy, SECURE_PROXY_SSL_HEADER must be set so the
+# signed URL is rebuilt with the scheme HubSpot called.
+HUBSPOT_CLIENT_SECRET = os.environ.get("HUBSPOT_CLIENT_SECRET")
+# Webhook requests whose timestamp is older than this many seconds are rejected.
+HUBSPOT_WEBHOOK_MAX_AGE = int(os.environ.get("HUBSPOT_WEBHOOK_MAX_AGE", 300))
+
+# Bearer token required to scrape /hubspot/metrics/ (open when unset).
+HUBSPOT_METRICS_TOKEN = os.environ.get("HUBSPOT_METRICS_TOKEN")
+
+# Schedule of sync_hubspot --daemon, by endpoint (any alias): seconds between
+# runs and a priority (lower first when several endpoints are due together).
+# "webhooks" is the processing of queued webhook events (with --webhooks).
+HUBSPOT_SCHEDULES = {
+    "webhooks": {"interval": 10, "priority": 0},
+    "jobs": {"interval": 120, "priority": 1},
+    "employees": {"interval": 900, "priority": 2},
+    "divisions": {"interval": 3600, "priority": 3},
+}
+# Schedule of the endpoints without an entry in HUBSPOT_SCHEDULES.
+HUBSPOT_DEFAULT_SCHEDULE = {"interval": 3600, "priority": 10}
+
+# Properties requested for objects stored in HubSpotData, keyed by endpoint
+# (object type id). Endpoints not listed get HubSpot's default property set.
+HUBSPOT_DATA_PROPERTIES = {}
+
+# Properties of HubSpotData records that reports filter on, keyed by endpoint
+# like HUBSPOT_DATA_PROPERTIES: {"2-123": {"dealstage": "text", "amount":
+# "numeric"}} (a list means text). sync_hubspot keeps an indexed generated
+# column per property (hot_<property>), which
+# HubSpotData.objects.filter_properties() filters on.
+HUBSPOT_HOT_PROPERTIES = {}
+
+# Store custom objects that have no model in generated typed tables
+# (hubspot_object_<name>, one column per property) instead of HubSpotData.
+# Can also be enabled per run with sync_hubspot --dynamic-tables.
+HUBSPOT_DYNAMIC_TABLES = os.environ.get("HUBSPOT_DYNAMIC_TABLES", "").lower() in ("1", "true", "yes")
@@ -17,6 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from hubspot_sync import views as hubspot_sync_views
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("hubspot/webhooks/", hubspot_sync_views.webhook, name="hubspot-webhook"),
+    path("hubspot/metrics/", hubspot_sync_views.metrics, name="hubspot-metrics"),
 ]
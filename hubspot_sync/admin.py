@@ -1,5 +1,18 @@
 from django.contrib import admin
-from .models import HubSpotData, HubSpotSyncHistory, Job, Division, Employee
+from .models import (
+    HubSpotData,
+    HubSpotSyncHistory,
+    SyncRun,
+    SyncRunEndpoint,
+    SyncEndpointDay,
+    HubSpotObjectSchema,
+    HubSpotProperty,
+    HubSpotAssociation,
+    HubSpotWebhookEvent,
+    Job,
+    Division,
+    Employee,
+)
 
 @admin.register(HubSpotData)
 class HubSpotDataAdmin(admin.ModelAdmin):
@@ -12,6 +25,78 @@ class HubSpotSyncHistoryAdmin(admin.ModelAdmin):
     list_display = ('endpoint', 'last_synced_at')
     search_fields = ('endpoint',)
 
+class ReadOnlyAdmin(admin.ModelAdmin):
+    # Written by sync_hubspot only; the history is append-only.
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class SyncRunEndpointInline(admin.TabularInline):
+    model = SyncRunEndpoint
+    fields = ('endpoint', 'status', 'duration', 'records', 'api_calls', 'throttled', 'watermark_before', 'watermark_after', 'error')
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(SyncRun)
+class SyncRunAdmin(ReadOnlyAdmin):
+    list_display = ('id', 'portal', 'mode', 'started_at', 'finished_at', 'status')
+    list_filter = ('status', 'mode', 'portal')
+    date_hierarchy = 'started_at'
+    inlines = (SyncRunEndpointInline,)
+
+@admin.register(SyncRunEndpoint)
+class SyncRunEndpointAdmin(ReadOnlyAdmin):
+    list_display = ('endpoint', 'run', 'started_at', 'status', 'duration', 'records', 'api_calls', 'throttled', 'inserted', 'updated', 'skipped')
+    list_filter = ('status', 'endpoint')
+    search_fields = ('endpoint', 'error')
+    date_hierarchy = 'started_at'
+    list_select_related = ('run',)
+
+@admin.register(SyncEndpointDay)
+class SyncEndpointDayAdmin(ReadOnlyAdmin):
+    # Slowest endpoints first within each day.
+    list_display = ('day', 'endpoint', 'runs', 'failures', 'duration_max', 'duration_avg', 'records', 'records_per_second', 'api_calls', 'throttled')
+    list_filter = ('endpoint',)
+    date_hierarchy = 'day'
+    ordering = ('-day', '-duration_max')
+
+    @admin.display(description='avg duration')
+    def duration_avg(self, obj):
+        return round(obj.duration_avg, 2)
+
+    @admin.display(description='records/s')
+    def records_per_second(self, obj):
+        return round(obj.records_per_second, 1)
+
+@admin.register(HubSpotObjectSchema)
+class HubSpotObjectSchemaAdmin(admin.ModelAdmin):
+    list_display = ('object_type_id', 'name', 'fully_qualified_name', 'fetched_at')
+    search_fields = ('object_type_id', 'name')
+
+@admin.register(HubSpotProperty)
+class HubSpotPropertyAdmin(admin.ModelAdmin):
+    list_display = ('schema', 'name', 'type', 'field_type')
+    search_fields = ('name',)
+    list_filter = ('schema', 'type')
+
+@admin.register(HubSpotAssociation)
+class HubSpotAssociationAdmin(admin.ModelAdmin):
+    list_display = ('from_type', 'from_id', 'to_type', 'to_id', 'label')
+    search_fields = ('from_id', 'to_id')
+    list_filter = ('from_type', 'to_type', 'label')
+
+@admin.register(HubSpotWebhookEvent)
+class HubSpotWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'object_type', 'object_id', 'change', 'received_at', 'processed_at')
+    search_fields = ('object_id',)
+    list_filter = ('object_type', 'change')
+
 @admin.register(Job)
 class JobAdmin(admin.ModelAdmin):
     # Removed 'updated_at' from list_display since Job does not define it.
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class HubspotSyncConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "hubspot_sync"
+
+    def ready(self):
+        from hubspot_sync.mapping import build_plans
+
+        build_plans()
@@ -0,0 +1,55 @@
+"""
+Association edges between synced objects.
+
+Edges are read with the v4 batch associations API for the records an
+endpoint's sync fetched, and replace that set of records' stored edges in
+one transaction per batch, so links removed in HubSpot disappear as well.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from hubspot_sync.mapping import to_int
+from hubspot_sync.models import HubSpotAssociation
+
+# Inputs accepted by one v4 batch associations read.
+ASSOCIATION_BATCH_SIZE = 1000
+
+
+def association_pairs(endpoint, registry):
+    """
+    The HUBSPOT_ASSOCIATIONS pairs starting at ``endpoint``, as
+    ``(from type id, to type id)`` resolved through the portal's registry.
+    """
+    object_type = registry.object_type(endpoint)
+    pairs = []
+    for from_name, to_name in getattr(settings, "HUBSPOT_ASSOCIATIONS", None) or []:
+        if registry.object_type(from_name) == object_type:
+            pairs.append((object_type, registry.object_type(to_name)))
+    return list(dict.fromkeys(pairs))
+
+
+def edges_from(from_type, to_type, from_id, targets):
+    """Edges for one record's ``[{"toObjectId": ..., "associationTypes": [...]}]``."""
+    edges = []
+    for target in targets:
+        to_id = to_int(target.get("toObjectId"))
+        if to_id is None:
+            continue
+        labels = {association.get("label") or "" for association in target.get("associationTypes") or [{}]}
+        edges.extend(
+            HubSpotAssociation(from_type=from_type, from_id=from_id, to_type=to_type, to_id=to_id, label=label)
+            for label in sorted(labels)
+        )
+    return edges
+
+
+def replace_edges(from_type, to_type, from_ids, edges, using=DEFAULT_DB_ALIAS):
+    """Make ``edges`` the only stored edges of ``from_ids`` towards ``to_type``."""
+    with transaction.atomic(using=using):
+        HubSpotAssociation.objects.using(using).filter(
+            from_type=from_type, to_type=to_type, from_id__in=from_ids
+        ).delete()
+        HubSpotAssociation.objects.using(using).bulk_create(
+            edges, batch_size=ASSOCIATION_BATCH_SIZE, ignore_conflicts=True
+        )
+    return len(edges)
@@ -0,0 +1,305 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+import aiohttp
+from django.conf import settings
+
+from hubspot_sync import metrics
+
+# orjson decodes several times faster than the standard library and accepts
+# bytes directly; both raise a ValueError subclass on malformed input.
+try:
+    from orjson import loads
+
+    JSON_BACKEND = "orjson"
+except ImportError:  # pragma: no cover - orjson is optional
+    from json import loads
+
+    JSON_BACKEND = "json"
+
+DEFAULT_BASE_URL = "https://api.hubapi.com"
+
+
+def _header_number(headers, name):
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every request made with one HubSpot token.
+
+    The bucket holds ``max_requests`` tokens and each spent token comes back
+    ``interval`` seconds after its response arrived (the server counts a call
+    when it receives it, not when it was sent), so no window of ``interval``
+    seconds ever sees more than ``max_requests`` calls (HubSpot counts in
+    fixed windows, where a continuously refilled bucket could burst to twice
+    the limit). Limit, interval and remaining calls are corrected from the
+    rate-limit headers on every response, so other clients using the same app
+    are accounted for. A 429 empties the bucket and blocks all callers until
+    ``Retry-After`` expires.
+
+    Until the first response has reported the real limits only one request is
+    let through, and tokens are held for ``margin`` of an interval longer
+    than strictly needed to absorb differences in request latency.
+
+    A ``fixed`` limiter keeps its limits and ignores the rate-limit headers,
+    for endpoints (search) whose responses do not report their own limit.
+    """
+
+    def __init__(self, max_requests=100, interval=10.0, margin=0.05, fixed=False):
+        self.max_requests = max_requests
+        self.interval = interval
+        self.margin = margin
+        self.fixed = fixed
+        # The server's count of calls left in the current window, minus what
+        # was sent since it was reported. None until a response says so.
+        self.remaining = None
+        self.blocked_until = 0.0
+        # Requests sent but not answered yet. Their tokens do not expire, and
+        # a reported remaining count may not have seen them.
+        self.in_flight = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self._sent = deque()
+        self._lock = asyncio.Lock()
+        self._calibrated = None
+
+    @property
+    def window(self):
+        return self.interval * (1 + self.margin)
+
+    def _expire(self, now):
+        while self._sent and self._sent[0] <= now - self.window:
+            self._sent.popleft()
+            if self.remaining is not None:
+                self.remaining += 1
+
+    def available(self, now=None):
+        self._expire(time.monotonic() if now is None else now)
+        available = self.max_requests - len(self._sent) - self.in_flight
+        if self.remaining is not None:
+            available = min(available, self.remaining)
+        return available
+
+    async def acquire(self):
+        async with self._lock:
+            if self._calibrated is None:
+                self._calibrated = asyncio.Event()
+            if not self.fixed and (self._sent or self.in_flight) and not self._calibrated.is_set():
+                try:
+                    await asyncio.wait_for(self._calibrated.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.available(now) >= 1:
+                    self.in_flight += 1
+                    if self.remaining is not None:
+                        self.remaining -= 1
+                    return
+                elif self._sent:
+                    delay = self._sent[0] + self.window - now
+                elif self.in_flight:
+                    # Every token is held by a request still waiting for its
+                    # response.
+                    delay = self.interval / self.max_requests
+                else:
+                    # Other clients used up the window; probe again after
+                    # one request's worth of time.
+                    delay = self.interval / self.max_requests
+                    self.remaining = 1
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    def update(self, status, headers):
+        if not self.fixed:
+            self.learn(headers)
+        if status == 429:
+            self.block(_header_number(headers, "Retry-After"))
+        if self._calibrated is not None:
+            self._calibrated.set()
+
+    def learn(self, headers):
+        limit = _header_number(headers, "X-HubSpot-RateLimit-Max")
+        interval_ms = _header_number(headers, "X-HubSpot-RateLimit-Interval-Milliseconds")
+        remaining = _header_number(headers, "X-HubSpot-RateLimit-Remaining")
+        if limit and interval_ms:
+            self.max_requests = int(limit)
+            self.interval = interval_ms / 1000
+        if remaining is not None:
+            # Every other request in flight may still be counted against it.
+            self.remaining = int(remaining) - max(0, self.in_flight - 1)
+
+    def release(self):
+        """Start the expiry of a request's token once its response is in."""
+        if self.in_flight:
+            self.in_flight -= 1
+            self._sent.append(time.monotonic())
+
+    def block(self, retry_after=None):
+        if retry_after is None:
+            retry_after = self.interval
+        self.throttled += 1
+        # Waiting out Retry-After resets the server's window.
+        self.remaining = None
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+
+class HubSpotError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class RetryPolicy:
+    """
+    How often and how long to retry a failed call: up to ``attempts`` tries in
+    total, with full-jitter exponential backoff (a random delay between 0 and
+    ``backoff * 2 ** retry``, capped at ``max_backoff`` seconds). Connection
+    errors, timeouts and the HTTP ``statuses`` listed are retried; 429s
+    additionally wait for the limiter's Retry-After block.
+    """
+
+    DEFAULT_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, attempts=5, backoff=1.0, max_backoff=60.0, statuses=DEFAULT_STATUSES):
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+
+    def delay(self, retry):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+
+
+class HubSpotClient:
+    """
+    Thin wrapper around an aiohttp session that sends every request through
+    the shared rate limiter. Requests return ``(status, data)`` where
+    ``data`` is the decoded JSON body for 2xx responses and None otherwise.
+    """
+
+    # Search has its own, much lower, per-second limit and sends no rate-limit
+    # headers, so it gets a separate fixed bucket.
+    SEARCH_RATE = 4
+
+    def __init__(
+        self,
+        session,
+        token,
+        limiter=None,
+        search_limiter=None,
+        base_url=None,
+        retry=None,
+    ):
+        self.session = session
+        self.token = token
+        base_url = base_url or getattr(settings, "HUBSPOT_API_BASE_URL", None) or DEFAULT_BASE_URL
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter or RateLimiter(
+            getattr(settings, "HUBSPOT_RATE_LIMIT_MAX", 100),
+            getattr(settings, "HUBSPOT_RATE_LIMIT_INTERVAL", 10.0),
+        )
+        self.search_limiter = search_limiter or RateLimiter(self.SEARCH_RATE, 1.0, fixed=True)
+        self.retry = retry or RetryPolicy()
+        self.requests = 0
+        self.retries = 0
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def request(self, method, path, params=None, json=None):
+        status, data, _ = await self.send(method, path, params=params, json=json)
+        return status, data
+
+    async def send(self, method, path, params=None, json=None, headers=None):
+        """Like request(), but also returns the final response's headers."""
+        limiter = self.search_limiter if path.endswith("/search") else self.limiter
+        retry = 0
+        while True:
+            await limiter.acquire()
+            self.requests += 1
+            metrics.count("requests")
+            started = time.perf_counter()
+            decoding = 0.0
+            try:
+                async with self.session.request(
+                    method,
+                    f"{self.base_url}{path}",
+                    headers={**self.headers, **(headers or {})},
+                    params=params,
+                    json=json,
+                ) as response:
+                    limiter.update(response.status, response.headers)
+                    status = response.status
+                    response_headers = response.headers
+                    if status == 429:
+                        metrics.count("throttled")
+                    if 200 <= status < 300:
+                        data, decoding = await self.read(response, path)
+                        return status, data, response_headers
+            except (HubSpotError, aiohttp.ClientError, asyncio.TimeoutError):
+                # A garbled or truncated body is retried like a dropped connection.
+                if retry + 1 >= self.retry.attempts:
+                    raise
+                status = None
+            finally:
+                limiter.release()
+                # Round trip including the body transfer, but not its decoding.
+                metrics.observe("http", time.perf_counter() - started - decoding)
+            if status is not None and (
+                status not in self.retry.statuses or retry + 1 >= self.retry.attempts
+            ):
+                return status, None, response_headers
+            self.retries += 1
+            metrics.count("retries")
+            if status != 429:
+                await asyncio.sleep(self.retry.delay(retry))
+            retry += 1
+
+    async def read(self, response, path):
+        """
+        The decoded JSON body of ``response`` and the seconds spent decoding it.
+        Raises HubSpotError if the body is not valid JSON, or missing from
+        anything but a 204.
+        """
+        body = await response.read()
+        metrics.count("bytes", len(body))
+        if not body.strip():
+            if response.status == 204:
+                return None, 0.0
+            raise HubSpotError(f"Empty response from {path}", response.status)
+        started = time.perf_counter()
+        try:
+            data = loads(body)
+        except ValueError:
+            raise HubSpotError(f"Invalid JSON from {path}", response.status) from None
+        seconds = time.perf_counter() - started
+        metrics.observe("decode", seconds)
+        return data, seconds
+
+    async def get(self, path, params=None):
+        return await self.request("GET", path, params=params)
+
+    async def post(self, path, json=None):
+        return await self.request("POST", path, json=json)
+
+    async def conditional_get(self, path, etag=None, params=None):
+        """
+        GET with ``If-None-Match: etag``. Returns ``(status, data, etag)``;
+        status 304 means the cached copy is still current.
+        """
+        headers = {"If-None-Match": etag} if etag else None
+        status, data, response_headers = await self.send("GET", path, params=params, headers=headers)
+        return status, data, response_headers.get("ETag") or etag
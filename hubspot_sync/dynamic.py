@@ -0,0 +1,132 @@
+"""
+Typed tables for custom objects that have no model of their own.
+
+With dynamic tables enabled, each cached object schema without a mapped model
+gets an unmanaged model built from its property definitions, with one column
+per property and ``hs_object_id`` as the primary key. The table is created
+(or widened with the properties added since) through the schema editor, and
+the model is registered for its aliases in the portal's endpoint registry
+so it is loaded through the same
+BulkWriter / CopyLoader path and mapping plan as Job, Division and Employee.
+"""
+import keyword
+import re
+
+from django.apps.registry import Apps
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+from hubspot_sync.mapping import ARCHIVED_FIELD, FINGERPRINT_FIELD, MappingPlan, SYNC_FIELDS
+from hubspot_sync.models import HubSpotData
+from hubspot_sync.registry import default_registry, schema_aliases
+
+TABLE_PREFIX = "hubspot_object_"
+KEY = "hs_object_id"
+# PostgreSQL truncates longer identifiers.
+MAX_NAME_LENGTH = 63
+# Property names that would clash with Django's own attributes or columns
+# (besides the Model methods, which are checked directly).
+RESERVED_NAMES = frozenset(("id", "pk", "objects")) | SYNC_FIELDS
+
+_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+_UNSAFE = re.compile(r"[^a-z0-9_]+")
+
+
+def table_name(schema):
+    slug = _UNSAFE.sub("_", (schema.name or schema.object_type_id).lower()).strip("_")
+    return f"{TABLE_PREFIX}{slug}"[:MAX_NAME_LENGTH]
+
+
+def column_for(prop):
+    """The model field for one HubSpot property definition."""
+    options = {"null": True, "blank": True}
+    if prop.type == "number":
+        return models.FloatField(**options)
+    if prop.type == "bool":
+        return models.BooleanField(**options)
+    if prop.type == "datetime":
+        return models.DateTimeField(**options)
+    if prop.type == "date":
+        return models.DateField(**options)
+    if prop.type == "enumeration" and prop.field_type == "checkbox":
+        # Multi-select: stored as a list.
+        return models.JSONField(**options)
+    return models.TextField(**options)
+
+
+def build_model(schema):
+    """
+    An unmanaged model for ``schema`` in its own app registry. Properties
+    whose names cannot be columns are listed in ``model.skipped_properties``.
+    """
+    attrs = {
+        "__module__": __name__,
+        KEY: models.BigIntegerField(primary_key=True),
+        FINGERPRINT_FIELD: models.CharField(max_length=32, null=True, blank=True, editable=False),
+        ARCHIVED_FIELD: models.DateTimeField(null=True, blank=True, editable=False),
+    }
+    skipped = []
+    for prop in schema.properties.all():
+        name = prop.name
+        if name == KEY:
+            continue
+        if (
+            name in RESERVED_NAMES
+            or len(name) > MAX_NAME_LENGTH
+            or not _NAME.match(name)
+            or keyword.iskeyword(name)
+            or hasattr(models.Model, name)
+        ):
+            skipped.append(name)
+            continue
+        attrs[name] = column_for(prop)
+    attrs["Meta"] = type(
+        "Meta",
+        (),
+        {
+            "app_label": "hubspot_sync",
+            "apps": Apps(),
+            "db_table": table_name(schema),
+            "managed": False,
+        },
+    )
+    class_name = "HubSpotObject" + "".join(part.title() for part in table_name(schema).split("_")[2:])
+    model = type(class_name, (models.Model,), attrs)
+    model.skipped_properties = skipped
+    return model
+
+
+def ensure_table(model, using=DEFAULT_DB_ALIAS):
+    """Create the model's table, or add the columns it is missing."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            with connection.schema_editor() as editor:
+                editor.create_model(model)
+            return len(model._meta.concrete_fields)
+        existing = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+    missing = [field for field in model._meta.concrete_fields if field.column not in existing]
+    if missing:
+        with connection.schema_editor() as editor:
+            for field in missing:
+                editor.add_field(model, field)
+    return len(missing)
+
+
+def register_dynamic_models(schemas, registry=None, using=DEFAULT_DB_ALIAS):
+    """
+    Build, create and register typed tables for every schema whose object
+    has no mapped model. Returns ``(model, columns added)`` pairs.
+    """
+    registry = registry or default_registry
+    registered = []
+    for schema in schemas:
+        model = registry.resolve(schema.object_type_id)
+        if model is not HubSpotData and model.__module__ != __name__:
+            continue
+        model = build_model(schema)
+        added = ensure_table(model, using)
+        definitions = {prop.name: (prop.type, prop.field_type) for prop in schema.properties.all()}
+        registry.register(schema_aliases(schema), model, MappingPlan(model, KEY, definitions))
+        registered.append((model, added))
+    return registered
@@ -0,0 +1,188 @@
+"""
+Indexed filters on the properties of records stored in HubSpotData.
+
+On PostgreSQL ``data`` has a GIN ``jsonb_path_ops`` index (migration 0011).
+It serves containment filters such as
+``data @> '{"properties": {"dealstage": "won"}}'``, but not ranges or
+sorting. The properties that reports filter on most ("hot" properties,
+HUBSPOT_HOT_PROPERTIES) also get a generated column, ``hot_<property>``,
+with a B-tree index on (endpoint, column). The database computes these
+columns from ``data``, so the writers are unaware of them. They are not
+model fields: ensure_hot_columns() adds and drops them to match the
+settings, the same way the dynamic tables are widened.
+
+HubSpotData.objects.filter_properties() sends each filter to the best of
+these: the hot column, then GIN containment, then a JSON key lookup.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.db.models.expressions import RawSQL
+
+COLUMN_PREFIX = "hot_"
+# PostgreSQL truncates longer identifiers.
+MAX_NAME_LENGTH = 63
+TEXT = "text"
+NUMERIC = "numeric"
+KINDS = (TEXT, NUMERIC)
+# Column types by database. On SQLite (tests and benchmarks) generated
+# columns can only be added as VIRTUAL; they are still indexable.
+COLUMN_TYPES = {
+    "postgresql": {TEXT: "text", NUMERIC: "numeric"},
+    "sqlite": {TEXT: "text", NUMERIC: "numeric"},
+}
+
+_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def supported(using=None):
+    return connections[using or DEFAULT_DB_ALIAS].vendor in COLUMN_TYPES
+
+
+def configured():
+    """
+    ``{endpoint: {property: kind}}`` from HUBSPOT_HOT_PROPERTIES, where a
+    list of property names stands for text properties.
+    """
+    hot = {}
+    for endpoint, properties in (getattr(settings, "HUBSPOT_HOT_PROPERTIES", {}) or {}).items():
+        if not isinstance(properties, dict):
+            properties = dict.fromkeys(properties, TEXT)
+        for name, kind in properties.items():
+            if kind not in KINDS:
+                raise ImproperlyConfigured(f"HUBSPOT_HOT_PROPERTIES[{endpoint!r}][{name!r}]: unknown kind {kind!r}")
+            if not _NAME.match(name) or len(COLUMN_PREFIX + name) > MAX_NAME_LENGTH:
+                raise ImproperlyConfigured(f"HUBSPOT_HOT_PROPERTIES[{endpoint!r}]: {name!r} cannot be a column")
+        hot[endpoint] = dict(properties)
+    return hot
+
+
+def hot_properties(endpoint=None):
+    """
+    ``{property: kind}`` of ``endpoint``, or of all endpoints. Endpoints
+    share the column of a property, so its kind must agree.
+    """
+    hot = configured()
+    if endpoint is not None:
+        return hot.get(endpoint, {})
+    merged = {}
+    for endpoint, properties in hot.items():
+        for name, kind in properties.items():
+            if merged.setdefault(name, kind) != kind:
+                raise ImproperlyConfigured(f"HUBSPOT_HOT_PROPERTIES: {name!r} is both {merged[name]} and {kind}")
+    return merged
+
+
+def column_name(prop):
+    return COLUMN_PREFIX + prop
+
+
+def index_name(column):
+    return f"hubspot_data_{column}"[:MAX_NAME_LENGTH]
+
+
+def value_sql(prop, vendor):
+    """The property's value as text, read as record_properties() does."""
+    if vendor == "postgresql":
+        return f"(COALESCE(data -> 'properties', data) ->> '{prop}')"
+    return f"json_extract(COALESCE(json_extract(data, '$.properties'), data), '$.{prop}')"
+
+
+def generated_sql(prop, kind, vendor):
+    value = value_sql(prop, vendor)
+    if kind == TEXT:
+        return value
+    # Values that are not numbers (empty strings, typos) become NULL rather
+    # than failing the write of the whole row.
+    if vendor == "postgresql":
+        return f"CASE WHEN {value} ~ '^-?[0-9]+(\\.[0-9]+)?$' THEN {value}::numeric END"
+    return f"CASE WHEN {value} GLOB '*[0-9]*' AND {value} NOT GLOB '*[^0-9.-]*' THEN CAST({value} AS numeric) END"
+
+
+def add_column_sql(table, prop, kind, connection):
+    """The statements adding the hot column of ``prop`` and its index."""
+    qn = connection.ops.quote_name
+    vendor = connection.vendor
+    column = column_name(prop)
+    stored = "STORED" if vendor == "postgresql" else "VIRTUAL"
+    return [
+        f"ALTER TABLE {qn(table)} ADD COLUMN {qn(column)} {COLUMN_TYPES[vendor][kind]} "
+        f"GENERATED ALWAYS AS ({generated_sql(prop, kind, vendor)}) {stored}",
+        f"CREATE INDEX {qn(index_name(column))} ON {qn(table)} ({qn('endpoint')}, {qn(column)})",
+    ]
+
+
+def drop_column_sql(table, column, connection):
+    qn = connection.ops.quote_name
+    # SQLite refuses to drop an indexed column.
+    return [
+        f"DROP INDEX IF EXISTS {qn(index_name(column))}",
+        f"ALTER TABLE {qn(table)} DROP COLUMN {qn(column)}",
+    ]
+
+
+def ensure_hot_columns(model, using=DEFAULT_DB_ALIAS):
+    """
+    Add the missing hot columns of HubSpotData (``model``) and drop those no
+    longer configured. Returns ``(added, dropped)`` column names. Changing
+    the kind of a property takes two runs: without it, then with it.
+    """
+    if not supported(using):
+        return [], []
+    connection = connections[using]
+    table = model._meta.db_table
+    hot = {column_name(name): (name, kind) for name, kind in hot_properties().items()}
+    with connection.cursor() as cursor:
+        existing = {
+            column.name
+            for column in connection.introspection.get_table_description(cursor, table)
+            if column.name.startswith(COLUMN_PREFIX)
+        }
+        added = sorted(set(hot) - existing)
+        dropped = sorted(existing - set(hot))
+        for column in dropped:
+            for statement in drop_column_sql(table, column, connection):
+                cursor.execute(statement)
+        for column in added:
+            # Adding a stored column rewrites the table on PostgreSQL.
+            for statement in add_column_sql(table, *hot[column], connection):
+                cursor.execute(statement)
+    return added, dropped
+
+
+def hot_column(model, prop, kind, connection):
+    """The hot column of ``prop`` as an expression for alias()."""
+    qn = connection.ops.quote_name
+    output_field = models.DecimalField() if kind == NUMERIC else models.TextField()
+    return RawSQL(f"{qn(model._meta.db_table)}.{qn(column_name(prop))}", (), output_field=output_field)
+
+
+class HubSpotDataQuerySet(models.QuerySet):
+    def filter_properties(self, endpoint, **lookups):
+        """
+        Records of ``endpoint`` whose properties match ``lookups``, e.g.
+        ``filter_properties("deals", dealstage="won", amount__gte=1000)``.
+        Hot properties are filtered on their generated column (which
+        ensure_hot_columns(), run by sync_hubspot, must have added), exact
+        matches on others on PostgreSQL with GIN-indexed containment, and
+        the rest with JSON key lookups.
+        """
+        connection = connections[self.db]
+        hot = hot_properties(endpoint) if supported(self.db) else {}
+        queryset = self.filter(endpoint=endpoint)
+        contains = {}
+        for lookup, value in lookups.items():
+            prop, _, operator = lookup.partition("__")
+            if prop in hot:
+                column = column_name(prop)
+                queryset = queryset.alias(**{column: hot_column(self.model, prop, hot[prop], connection)})
+                queryset = queryset.filter(**{f"{column}__{operator or 'exact'}": value})
+            elif not operator and value is not None and connection.vendor == "postgresql":
+                contains[prop] = value
+            else:
+                queryset = queryset.filter(**{f"data__properties__{lookup}": value})
+        if contains:
+            queryset = queryset.filter(data__contains={"properties": contains})
+        return queryset
@@ -1,13 +1,72 @@
 import asyncio
-from datetime import datetime
+import signal
+from array import array
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 import aiohttp
 from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
 from django.utils import timezone
 
-from hubspot_sync.models import HubSpotData, HubSpotSyncHistory, Job, Division, Employee
+from hubspot_sync import metrics
+from hubspot_sync.associations import ASSOCIATION_BATCH_SIZE, association_pairs, edges_from, replace_edges
+from hubspot_sync.client import HubSpotClient, HubSpotError, RetryPolicy
+from hubspot_sync.dynamic import register_dynamic_models
+from hubspot_sync.hot import ensure_hot_columns
+from hubspot_sync.mapping import to_datetime, to_int
+from hubspot_sync.metrics import SyncMetrics, collecting, merge_totals
+from hubspot_sync.models import HubSpotData, HubSpotSyncHistory, SyncEndpointDay, SyncRun, SyncRunEndpoint
+from hubspot_sync.pipeline import merge_pages, run_pipeline
+from hubspot_sync.profiling import SyncProfiler
+from hubspot_sync.reconcile import Reconciler, sorted_ids
+from hubspot_sync.registry import configured_portals
+from hubspot_sync.scheduler import Scheduler, schedule_for
+from hubspot_sync.schemas import load_schemas, schema_ttl
+from hubspot_sync.webhooks import mark_processed, pending_changes
+from hubspot_sync.writers import BulkWriter, CopyLoader, requested_properties
+
+# Largest page the CRM list endpoint serves (its default is 10).
+LIST_PAGE_SIZE = 100
+# The CRM search API returns at most 10,000 results per query (after + limit),
+# in pages of up to 200. It is limited to a few requests per second, so its
+# pages are kept as large as allowed.
+SEARCH_PAGE_SIZE = 200
+SEARCH_RESULT_CAP = 10000
+# Search is backed by an index that trails writes by a few seconds, so each
+# incremental window starts slightly before the previous run.
+SEARCH_OVERLAP = timedelta(minutes=1)
+# Inputs accepted by one batch read call.
+BATCH_READ_SIZE = 100
+# Jobs of the daemon besides the endpoints.
+SCHEMAS_JOB = "schemas"
+WEBHOOKS_JOB = "webhooks"
+# Shortest interval between schema refreshes in daemon mode.
+MIN_SCHEMA_INTERVAL = 60
+DEFAULT_PROFILE_PATH = "sync_hubspot.pstats"
+
+
+def _from_epoch_ms(value):
+    return datetime.fromtimestamp(value / 1000, tz=dt_timezone.utc)
+
+
+# Checkpoint of a sharded search: the unfinished hs_object_id ranges as
+# "shards:<next>-<end>,...", the end exclusive.
+SHARDS_CHECKPOINT = "shards:"
+
+
+def _shards_cursor(ranges):
+    return SHARDS_CHECKPOINT + ",".join(f"{start}-{end}" for start, end in ranges if start < end)
+
+
+def _shard_ranges(after):
+    """The ranges of a sharded checkpoint, or None for any other cursor."""
+    if not after or not after.startswith(SHARDS_CHECKPOINT):
+        return None
+    ranges = after[len(SHARDS_CHECKPOINT):]
+    return [tuple(map(int, shard.split("-"))) for shard in ranges.split(",") if shard]
 
 
 class Command(BaseCommand):
@@ -19,143 +78,1165 @@ class Command(BaseCommand):
             nargs="+",
             help="Specify one or more endpoints to sync. If omitted, all available endpoints will be discovered.",
         )
+        parser.add_argument(
+            "--portal",
+            nargs="+",
+            help=(
+                "Sync only these portals from HUBSPOT_PORTALS (default: all of them, concurrently). "
+                "Without HUBSPOT_PORTALS the single portal of HUBSPOT_API_TOKEN is synced."
+            ),
+        )
         parser.add_argument(
             "--concurent",
             type=int,
             default=5,
             help="Number of endpoints to process concurrently (default: 5).",
         )
+        parser.add_argument(
+            "--batch-pages",
+            type=int,
+            default=1,
+            help="Number of API pages to buffer before each bulk write (default: 1).",
+        )
+        parser.add_argument(
+            "--full-load",
+            action="store_true",
+            help=(
+                "Ignore the last sync time and reload every record. On PostgreSQL, mapped "
+                "models are loaded through a COPY staging table and merged in one statement."
+            ),
+        )
+        parser.add_argument(
+            "--ids",
+            nargs="+",
+            help="Re-fetch only these record ids (requires a single --endpoint).",
+        )
+        parser.add_argument(
+            "--ids-file",
+            help="File with record ids to re-fetch, one per line or comma separated (requires a single --endpoint).",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=1,
+            help=(
+                "Split each endpoint into this many hs_object_id ranges and fetch them "
+                "concurrently through the search API (default: 1, no sharding)."
+            ),
+        )
+        parser.add_argument(
+            "--refresh-schemas",
+            action="store_true",
+            help="Fetch object schemas from HubSpot even if the cached copy is within HUBSPOT_SCHEMA_TTL.",
+        )
+        parser.add_argument(
+            "--dynamic-tables",
+            action="store_true",
+            help=(
+                "Store custom objects without a model in generated typed tables built from their "
+                "schema instead of HubSpotData (see HUBSPOT_DYNAMIC_TABLES)."
+            ),
+        )
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help=(
+                "After syncing an endpoint, flag records that HubSpot archived since the last run, "
+                "and every HUBSPOT_RECONCILE_INTERVAL compare all live ids with the local table."
+            ),
+        )
+        parser.add_argument(
+            "--full-reconcile",
+            action="store_true",
+            help="Like --reconcile, but compare all live ids with the local table on this run.",
+        )
+        parser.add_argument(
+            "--delete-missing",
+            action="store_true",
+            help="Delete archived and deleted records found by --reconcile instead of setting archived_at.",
+        )
+        parser.add_argument(
+            "--associations",
+            action="store_true",
+            help=(
+                "Refresh the association edges (HUBSPOT_ASSOCIATIONS) of every record fetched, "
+                "through the v4 batch associations API."
+            ),
+        )
+        parser.add_argument(
+            "--webhooks",
+            action="store_true",
+            help=(
+                "Instead of polling, fetch the objects changed by queued webhook events "
+                "(coalesced per object, through the batch read API) and archive deleted ones."
+            ),
+        )
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help=(
+                "Keep running and sync each endpoint on its own interval (HUBSPOT_SCHEDULES) "
+                "with one connection pool. SIGTERM stops it once the batches in flight are written."
+            ),
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            default=5,
+            help="Attempts per API call before an endpoint's sync is abandoned (default: 5).",
+        )
+        parser.add_argument(
+            "--backoff",
+            type=float,
+            default=1.0,
+            help="Base delay in seconds for jittered exponential backoff between retries (default: 1.0).",
+        )
+        parser.add_argument(
+            "--retry-statuses",
+            type=int,
+            nargs="+",
+            default=list(RetryPolicy.DEFAULT_STATUSES),
+            help="HTTP statuses that are retried (default: 429 500 502 503 504).",
+        )
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="Fetch the next pages while earlier ones are being written to the database.",
+        )
+        parser.add_argument(
+            "--queue-depth",
+            type=int,
+            default=4,
+            help="Maximum number of fetched pages held in memory per endpoint in pipeline mode (default: 4).",
+        )
+        parser.add_argument(
+            "--writers",
+            type=int,
+            default=1,
+            help="Number of database writer workers per endpoint in pipeline mode (default: 1).",
+        )
+        parser.add_argument(
+            "--profile",
+            nargs="?",
+            const=DEFAULT_PROFILE_PATH,
+            metavar="PATH",
+            help=(
+                "Run under cProfile, write the stats to PATH (default: sync_hubspot.pstats) and print the "
+                "hot spots per stage, database queries per stage and asyncio task timings."
+            ),
+        )
 
     def handle(self, *args, **options):
         endpoints = options.get("endpoint")
         concurrent = options.get("concurent")
-        token = settings.HUBSPOT_API_TOKEN
+        self.batch_pages = max(1, options.get("batch_pages") or 1)
+        self.full_load = options.get("full_load", False)
+        self.pipeline = options.get("pipeline", False)
+        self.queue_depth = max(1, options.get("queue_depth") or 1)
+        self.writers = max(1, options.get("writers") or 1)
+        self.shards = max(1, options.get("shards") or 1)
+        self.refresh_schemas = options.get("refresh_schemas", False)
+        self.dynamic_tables = options.get("dynamic_tables") or getattr(settings, "HUBSPOT_DYNAMIC_TABLES", False)
+        self.full_reconcile = options.get("full_reconcile", False)
+        self.reconcile = options.get("reconcile", False) or self.full_reconcile
+        self.delete_missing = options.get("delete_missing", False)
+        self.associations = options.get("associations", False)
+        self.webhooks = options.get("webhooks", False)
+        self.daemon = options.get("daemon", False)
+        # Set on SIGTERM in daemon mode: endpoints stop fetching after the
+        # current page.
+        self.stopping = None
+        self.profiler = None
+        # Whether the latest run of each endpoint (or webhook round) failed,
+        # by name; any failure makes the command exit non-zero.
+        self.outcomes = {}
+        if options["retries"] < 1:
+            raise CommandError("--retries must be at least 1.")
+        self.retry = RetryPolicy(
+            attempts=options["retries"],
+            backoff=options.get("backoff", 1.0),
+            statuses=options.get("retry_statuses") or RetryPolicy.DEFAULT_STATUSES,
+        )
+        portals = self.get_portals(options.get("portal"))
+        if self.pipeline and self.writers > 1:
+            for portal in portals:
+                if connections[portal.database].vendor == "sqlite":
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"Portal {portal.name} uses SQLite, which allows one writer at a time; "
+                            f"ignoring --writers {self.writers}."
+                        )
+                    )
 
-        if not token:
-            raise CommandError("HUBSPOT_API_TOKEN is not set in settings or environment variables.")
+        ids = self.read_ids(options.get("ids"), options.get("ids_file"))
+        if ids is not None and (not endpoints or len(endpoints) != 1):
+            raise CommandError("--ids/--ids-file require exactly one --endpoint.")
+        if ids is not None and self.daemon:
+            raise CommandError("--ids/--ids-file cannot be combined with --daemon.")
 
         self.stdout.write(self.style.SUCCESS("Starting HubSpot sync..."))
-        asyncio.run(self.async_handle(endpoints, concurrent, token))
+        if options.get("profile"):
+            with SyncProfiler(options["profile"]) as self.profiler:
+                asyncio.run(self.async_handle(endpoints, concurrent, portals, ids))
+            for line in self.profiler.report():
+                self.stdout.write(line)
+        else:
+            asyncio.run(self.async_handle(endpoints, concurrent, portals, ids))
+        failed = [name for name, failure in self.outcomes.items() if failure]
+        if failed:
+            raise CommandError(f"HubSpot sync failed for {len(failed)} endpoint(s): {', '.join(failed)}")
         self.stdout.write(self.style.SUCCESS("HubSpot sync complete."))
 
-    async def async_handle(self, endpoints, concurrent, token):
-        semaphore = asyncio.Semaphore(concurrent)
+    def record_outcome(self, portal, name, failed):
+        prefix = "" if portal.name == "default" else f"{portal.name}:"
+        self.outcomes[prefix + name] = failed
+
+    def get_portals(self, names=None):
+        configured = configured_portals()
+        if names:
+            unknown = [name for name in names if name not in configured]
+            if unknown:
+                raise CommandError(f"Unknown portal(s): {', '.join(unknown)}. Configured: {', '.join(configured)}.")
+            portals = [configured[name] for name in dict.fromkeys(names)]
+        else:
+            portals = list(configured.values())
+        databases = {}
+        for portal in portals:
+            if not portal.token:
+                if portal.name == "default":
+                    raise CommandError("HUBSPOT_API_TOKEN is not set in settings or environment variables.")
+                raise CommandError(f"Portal {portal.name} has no token.")
+            if portal.database not in settings.DATABASES:
+                raise CommandError(f"Portal {portal.name} uses unknown database {portal.database}.")
+            # Object ids, sync history and schema caches are only unique
+            # within one portal.
+            if portal.database in databases:
+                raise CommandError(
+                    f"Portals {databases[portal.database]} and {portal.name} cannot share database "
+                    f"{portal.database}."
+                )
+            databases[portal.database] = portal.name
+        return portals
+
+    async def async_handle(self, endpoints, concurrent, portals, ids=None):
+        if self.profiler:
+            await self.profiler.start_loop()
+            try:
+                await self.run_portals(endpoints, concurrent, portals, ids)
+            finally:
+                await self.profiler.stop_loop()
+        else:
+            await self.run_portals(endpoints, concurrent, portals, ids)
+
+    async def run_portals(self, endpoints, concurrent, portals, ids=None):
         async with aiohttp.ClientSession() as session:
-            if not endpoints:
-                endpoints = await self.discover_endpoints(session, token)
-                self.stdout.write(self.style.SUCCESS(f"Discovered endpoints: {endpoints}"))
-            tasks = [
-                self.sync_endpoint(ep, token, session, semaphore)
-                for ep in endpoints
-            ]
-            await asyncio.gather(*tasks)
-
-    async def discover_endpoints(self, session, token):
-        url = "https://api.hubapi.com/crm/v3/schemas"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with session.get(url, headers=headers) as response:
-            if response.status != 200:
+            if self.daemon:
+                await self.run_daemon(session, endpoints, concurrent, portals)
+                return
+            await asyncio.gather(
+                *(self.sync_portal(portal, session, endpoints, concurrent, ids) for portal in portals)
+            )
+
+    def get_client(self, session, portal):
+        return HubSpotClient(session, portal.token, base_url=portal.base_url, retry=self.retry)
+
+    async def prepare_portal(self, client, portal, force=None):
+        """
+        Load the portal's object schemas and learn its endpoints (and dynamic
+        tables) from them, and bring the hot columns up to date.
+        """
+        schemas = await self.load_schemas(client, portal, force)
+        portal.registry.learn(schemas)
+        if self.dynamic_tables:
+            await sync_to_async(self.prepare_dynamic_tables)(schemas, portal)
+        await sync_to_async(self.prepare_hot_columns)(portal)
+        return schemas
+
+    async def sync_portal(self, portal, session, endpoints, concurrent, ids=None):
+        """Sync one portal with its own client (and rate limits), registry and database."""
+        if portal.name != "default":
+            self.stdout.write(self.style.SUCCESS(f"Syncing portal: {portal.name}"))
+        semaphore = asyncio.Semaphore(concurrent)
+        client = self.get_client(session, portal)
+        schemas = await self.prepare_portal(client, portal)
+        if self.webhooks:
+            await self.process_webhooks(client, semaphore, portal)
+        elif ids is not None:
+            counts = await self.sync_ids(endpoints[0], client, ids, semaphore, portal)
+            self.record_outcome(portal, endpoints[0], bool(counts["failed"]))
+        else:
+            run = await sync_to_async(self.start_run)(portal)
+            results = None
+            try:
+                results = await self.sync_endpoints(endpoints, schemas, client, semaphore, portal, run)
+            finally:
+                await sync_to_async(self.finish_run)(run, results, portal.database)
+        self.report_client(client, portal)
+
+    async def run_daemon(self, session, endpoints, concurrent, portals):
+        loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        signals = (signal.SIGTERM, signal.SIGINT)
+        for signum in signals:
+            loop.add_signal_handler(signum, self.stop)
+        self.stdout.write(self.style.SUCCESS("Sync daemon started."))
+        try:
+            await asyncio.gather(
+                *(self.daemon_portal(portal, session, endpoints, concurrent) for portal in portals)
+            )
+        finally:
+            for signum in signals:
+                loop.remove_signal_handler(signum)
+        self.stdout.write(self.style.SUCCESS("Sync daemon stopped."))
+
+    def stop(self):
+        if not self.stopping.is_set():
+            self.stdout.write(self.style.WARNING("Stopping once the batches in flight are written..."))
+        self.stopping.set()
+
+    async def daemon_portal(self, portal, session, endpoints, concurrent):
+        """
+        Run one portal's endpoints on their HUBSPOT_SCHEDULES intervals until
+        stopped, with one client (connection pool and rate limiter) for the
+        whole process. Due endpoints start in priority order and share the
+        --concurent slots; schemas are refreshed (and newly discovered
+        endpoints scheduled) every HUBSPOT_SCHEMA_TTL.
+        """
+        semaphore = asyncio.Semaphore(concurrent)
+        client = self.get_client(session, portal)
+        scheduler = Scheduler()
+
+        async def refresh(force=False):
+            schemas = await self.prepare_portal(client, portal, force)
+            for endpoint in endpoints or self.discover_endpoints(schemas, portal):
+                if endpoint not in scheduler.jobs:
+                    scheduler.add(endpoint, *schedule_for(endpoint, portal.registry))
+
+        await refresh(self.refresh_schemas)
+        interval = max(MIN_SCHEMA_INTERVAL, schema_ttl().total_seconds())
+        scheduler.add(SCHEMAS_JOB, interval, -1, due=scheduler.clock() + interval)
+        if self.webhooks:
+            scheduler.add(WEBHOOKS_JOB, *schedule_for(WEBHOOKS_JOB))
+
+        async def run(name):
+            # Connections outlive their usefulness in a long-running process.
+            await sync_to_async(close_old_connections)()
+            try:
+                if name == SCHEMAS_JOB:
+                    await refresh()
+                elif name == WEBHOOKS_JOB:
+                    await self.process_webhooks(client, semaphore, portal)
+                else:
+                    run = await sync_to_async(self.start_run)(portal)
+                    results = None
+                    try:
+                        results = [await self.sync_endpoint(name, client, semaphore, portal, run)]
+                    finally:
+                        await sync_to_async(self.finish_run)(run, results, portal.database)
+            except Exception as exc:
+                # One failing endpoint must not take the others down.
+                self.stdout.write(self.style.ERROR(f"Scheduled run of {name} failed: {exc!r}"))
+
+        running = {}
+        while not self.stopping.is_set():
+            for name in scheduler.pop_due():
+                running[asyncio.ensure_future(run(name))] = name
+            stopped = asyncio.ensure_future(self.stopping.wait())
+            done, _ = await asyncio.wait(
+                [*running, stopped], timeout=scheduler.next_in(), return_when=asyncio.FIRST_COMPLETED
+            )
+            stopped.cancel()
+            for task in done:
+                if task in running:
+                    scheduler.reschedule(running.pop(task))
+        # Runs in progress stop fetching at their next page and write what
+        # they already have.
+        await asyncio.gather(*running)
+        self.report_client(client, portal)
+
+    def report_client(self, client, portal):
+        prefix = "" if portal.name == "default" else f"Portal {portal.name}: "
+        if client.retries:
+            self.stdout.write(self.style.WARNING(f"{prefix}Retried {client.retries} HubSpot request(s)."))
+        if client.limiter.throttled:
+            self.stdout.write(
+                self.style.WARNING(f"{prefix}HubSpot rate limited {client.limiter.throttled} request(s).")
+            )
+
+    async def load_schemas(self, client, portal, force=None):
+        if force is None:
+            force = self.refresh_schemas
+        try:
+            return await load_schemas(client, force=force, using=portal.database)
+        except (HubSpotError, aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            self.stdout.write(self.style.ERROR(f"Failed to load object schemas of portal {portal.name}: {exc}"))
+            return []
+
+    def prepare_dynamic_tables(self, schemas, portal):
+        for model, added in register_dynamic_models(schemas, portal.registry, portal.database):
+            table = model._meta.db_table
+            if added:
+                self.stdout.write(f"Table {table}: {added} columns added.")
+            if model.skipped_properties:
                 self.stdout.write(
-                    self.style.ERROR(f"Failed to discover endpoints. Status: {response.status}")
+                    self.style.WARNING(
+                        f"Table {table}: properties without a usable column name are not stored: "
+                        f"{', '.join(model.skipped_properties)}"
+                    )
                 )
-                return []
-            data = await response.json()
-        endpoints = [
-            schema.get("objectTypeId")
-            for schema in data.get("results", [])
-            if schema.get("objectTypeId")
+
+    def prepare_hot_columns(self, portal):
+        added, dropped = ensure_hot_columns(HubSpotData, portal.database)
+        if added:
+            self.stdout.write(f"HubSpotData: hot columns added: {', '.join(added)}")
+        if dropped:
+            self.stdout.write(f"HubSpotData: hot columns dropped: {', '.join(dropped)}")
+
+    async def sync_endpoints(self, endpoints, schemas, client, semaphore, portal, run=None):
+        if not endpoints:
+            endpoints = self.discover_endpoints(schemas, portal)
+            self.stdout.write(self.style.SUCCESS(f"Discovered endpoints: {endpoints}"))
+        tasks = [
+            self.sync_endpoint(ep, client, semaphore, portal, run)
+            for ep in endpoints
         ]
-        return endpoints
+        return await asyncio.gather(*tasks)
+
+    def read_ids(self, ids, ids_file):
+        if not ids and not ids_file:
+            return None
+        values = list(ids or [])
+        if ids_file:
+            try:
+                with open(ids_file) as handle:
+                    for line in handle:
+                        line = line.split("#", 1)[0]
+                        values.extend(line.replace(",", " ").split())
+            except OSError as exc:
+                raise CommandError(f"Cannot read ids file {ids_file}: {exc}")
+        # Keep the order but drop duplicates so no id is fetched twice.
+        return list(dict.fromkeys(value.strip() for value in values if value.strip()))
+
+    async def sync_ids(self, endpoint, client, ids, semaphore, portal):
+        """
+        Refresh a known set of records with the batch read API: chunks of 100
+        ids are fetched concurrently (bounded by --concurent and the shared
+        rate limiter) and written through the endpoint's usual writer. The
+        ids of chunks whose batch read failed are reported and returned in
+        ``counts["failed"]``; the other chunks are still written.
+        """
+        writer = BulkWriter(endpoint, portal.registry, portal.database)
+        properties = requested_properties(endpoint, portal.registry)
+        chunks = [ids[i:i + BATCH_READ_SIZE] for i in range(0, len(ids), BATCH_READ_SIZE)]
+        counts = {"written": 0, "missing": 0, "failed": []}
+
+        async def refetch(chunk):
+            async with semaphore:
+                try:
+                    results, missing = await self.batch_read(endpoint, client, chunk, properties)
+                except (HubSpotError, aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    self.stdout.write(self.style.ERROR(f"Batch read of endpoint {endpoint} failed: {exc}"))
+                    counts["failed"].extend(chunk)
+                    return
+                counts["missing"] += missing
+                if results:
+                    written = await sync_to_async(self.save_records)(endpoint, results, writer)
+                    counts["written"] += written
+
+        await asyncio.gather(*(refetch(chunk) for chunk in chunks))
+        self.stdout.write(
+            f"Endpoint {endpoint}: re-fetched {len(ids)} ids in {len(chunks)} batch reads, "
+            f"{counts['written']} records written, {writer.skipped} unchanged, {counts['missing']} not found."
+        )
+        if counts["failed"]:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"Endpoint {endpoint}: {len(counts['failed'])} ids were not re-fetched: "
+                    f"{' '.join(map(str, counts['failed']))}"
+                )
+            )
+        pairs = association_pairs(endpoint, portal.registry) if self.associations else []
+        if pairs:
+            object_ids = sorted({object_id for object_id in map(to_int, ids) if object_id is not None})
+            await self.sync_associations(endpoint, client, object_ids, pairs, portal.database)
+        return counts
+
+    async def process_webhooks(self, client, semaphore, portal):
+        """
+        Drain the portal's webhook queue: every round coalesces up to
+        WEBHOOK_BATCH_SIZE events to the latest change per object, re-fetches
+        the changed objects of each type with batch reads and archives the
+        deleted ones. Events are marked processed only once their round
+        succeeded, so failed rounds are retried by the next run.
+        """
+        using = portal.database
+        while self.stopping is None or not self.stopping.is_set():
+            started_at = timezone.now()
+            pks, changes = await sync_to_async(pending_changes)(using)
+            if not pks:
+                return
+            self.stdout.write(f"Processing {len(pks)} webhook events for {len(changes)} object types.")
+            try:
+                await asyncio.gather(
+                    *(
+                        self.apply_changes(object_type, fetch, archive, client, semaphore, portal, started_at)
+                        for object_type, (fetch, archive) in changes.items()
+                    )
+                )
+            except (HubSpotError, aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                self.stdout.write(self.style.ERROR(f"Processing webhook events failed: {exc}"))
+                self.record_outcome(portal, WEBHOOKS_JOB, True)
+                return
+            await sync_to_async(mark_processed)(pks, timezone.now(), using)
+            self.record_outcome(portal, WEBHOOKS_JOB, False)
+
+    async def apply_changes(self, endpoint, fetch, archive, client, semaphore, portal, archived_at):
+        if fetch:
+            ids = [str(object_id) for object_id in fetch]
+            counts = await self.sync_ids(endpoint, client, ids, semaphore, portal)
+            if counts["failed"]:
+                # Fail the round so its events are applied again next time.
+                raise HubSpotError(f"Batch reads of endpoint {endpoint} failed for {len(counts['failed'])} ids.")
+        if archive:
+            reconciler = Reconciler(endpoint, portal.registry, portal.database, delete=self.delete_missing)
+            archived = await sync_to_async(reconciler.archive)(archive, archived_at, reconciler.object_key)
+            action = "deleted" if self.delete_missing else "flagged"
+            self.stdout.write(f"Endpoint {endpoint}: {archived} records deleted in HubSpot {action}.")
 
-    async def sync_endpoint(self, endpoint, token, session, semaphore):
+    async def batch_read(self, endpoint, client, ids, properties=None):
+        body = {"inputs": [{"id": str(object_id)} for object_id in ids]}
+        if properties:
+            body["properties"] = properties
+        status, data = await client.post(f"/crm/v3/objects/{endpoint}/batch/read", json=body)
+        # 207 means some ids were not found; the rest are still returned.
+        if status not in (200, 207):
+            raise HubSpotError(
+                f"Failed to batch read endpoint {endpoint}. Status: {status}", status
+            )
+        missing = sum(len(error.get("context", {}).get("ids", [])) for error in data.get("errors", []))
+        return data.get("results", []), missing
+
+    def discover_endpoints(self, schemas, portal):
+        # Without schemas (HubSpot failed and nothing is cached) there is
+        # nothing to sync, which must not pass for a successful run.
+        if not schemas:
+            self.stdout.write(self.style.ERROR("Failed to discover endpoints: no object schemas available."))
+        self.record_outcome(portal, SCHEMAS_JOB, not schemas)
+        return [schema.object_type_id for schema in schemas]
+
+    async def sync_endpoint(self, endpoint, client, semaphore, portal, run=None):
         async with semaphore:
             self.stdout.write(self.style.SUCCESS(f"Syncing endpoint: {endpoint}"))
-            last_sync = await sync_to_async(self.get_last_sync)(endpoint)
-            params = {}
-            if last_sync:
-                params["updatedAfter"] = last_sync.isoformat()
-            url = f"https://api.hubapi.com/crm/v3/objects/{endpoint}"
-            while True:
-                async with session.get(
-                    url,
-                    headers={"Authorization": f"Bearer {token}"},
-                    params=params,
-                ) as response:
-                    if response.status != 200:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f"Failed to fetch data for endpoint {endpoint}. Status: {response.status}"
-                            )
-                        )
-                        break
-                    data = await response.json()
-                results = data.get("results", [])
-                if not results:
-                    break
-                for record in results:
-                    await sync_to_async(self.save_record)(endpoint, record)
-                paging = data.get("paging", {})
-                next_page = paging.get("next", {}).get("after")
-                if next_page:
-                    params["after"] = next_page
-                else:
-                    break
-            await sync_to_async(self.update_last_sync)(endpoint)
+            record = await sync_to_async(self.start_endpoint)(endpoint, run, portal.database)
+            completed = False
+            # Everything recorded by this task and the tasks and threads it
+            # starts goes into the run's metrics.
+            with collecting(SyncMetrics(endpoint)) as measured:
+                try:
+                    completed = await self.run_endpoint(endpoint, client, portal, record)
+                except Exception as exc:
+                    record.error = repr(exc)
+                    raise
+                finally:
+                    measured.finish()
+                    await sync_to_async(self.finish_endpoint)(record, measured, completed, portal.database)
+                    self.record_outcome(portal, endpoint, record.status == SyncRun.Status.FAILED)
+            self.stdout.write(f"Endpoint {endpoint}: {measured.summary()} in {measured.elapsed:.2f}s.")
+            return completed
+
+    async def run_endpoint(self, endpoint, client, portal, record=None):
+        """
+        Fetch and write one endpoint; True once it completed. ``record`` (a
+        SyncRunEndpoint) gets the watermarks, and the error of a failed run.
+        """
+        record = record or SyncRunEndpoint(endpoint=endpoint)
+        using = portal.database
+        # Taken before the first request so records modified during the
+        # run are picked up again next time.
+        started_at = timezone.now()
+        history = await sync_to_async(self.get_history)(endpoint, using)
+        record.watermark_before = record.watermark_after = history.last_synced_at if history else None
+        if self.full_load:
+            history = None
+        last_sync = history.last_synced_at if history else None
+        # The model, key and plan are resolved once, before paging starts.
+        writer = await sync_to_async(self.get_writer)(endpoint, portal)
+        properties = requested_properties(endpoint, portal.registry)
+        pairs = association_pairs(endpoint, portal.registry) if self.associations else []
+        if pairs:
+            writer.track_ids()
+        # A COPY staging table does not survive the process, so full
+        # loads always start over.
+        checkpoint = None
+        if not isinstance(writer, CopyLoader):
 
-    def get_last_sync(self, endpoint):
+            async def checkpoint(cursor):
+                if cursor is not None:
+                    since, after = cursor
+                    if since is not None:
+                        since = _from_epoch_ms(since)
+                    cursor = (since, after)
+                await sync_to_async(self.save_checkpoint)(endpoint, started_at, cursor, using)
+
+        ranges = None
+        if history and history.checkpoint_started_at:
+            started_at = history.checkpoint_started_at
+            since, after = history.checkpoint_since, history.checkpoint_after
+            ranges = _shard_ranges(after)
+            if ranges is not None:
+                self.stdout.write(
+                    f"Resuming endpoint {endpoint} from its checkpoint ({len(ranges)} unfinished shards)."
+                )
+                after = None
+            elif since:
+                self.stdout.write(
+                    f"Resuming endpoint {endpoint} from its checkpoint (modified since {since}, "
+                    f"last record {after})."
+                )
+                # Search offsets shift as records are modified, so the
+                # window restarts at the last committed record instead.
+                after = None
+            else:
+                self.stdout.write(f"Resuming endpoint {endpoint} from its checkpoint (after {after}).")
+        else:
+            since = last_sync - SEARCH_OVERLAP if last_sync else None
+            after = None
+        if ranges is not None or (self.shards > 1 and not after):
+            pages = self.sharded_pages(endpoint, client, since, properties, ranges)
+        elif since:
+            pages = self.search_pages(endpoint, client, int(since.timestamp() * 1000), properties)
+        else:
+            params = {"limit": LIST_PAGE_SIZE}
+            if properties:
+                params["properties"] = ",".join(properties)
+            if after:
+                params["after"] = after
+            pages = self.fetch_pages(endpoint, client, params)
+        stop = {"interrupted": False}
+        pages = self.until_stopped(pages, stop)
+        try:
+            if self.pipeline:
+                await self.write_pipelined(endpoint, pages, writer, checkpoint)
+            else:
+                await self.write_serial(endpoint, pages, writer, checkpoint)
+        except (HubSpotError, aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            # Leave last_synced_at alone so the missing records are not
+            # skipped next time; the next run resumes from the checkpoint.
+            self.stdout.write(
+                self.style.ERROR(f"Sync of endpoint {endpoint} stopped before completion: {exc}")
+            )
+            record.error = str(exc) or repr(exc)
+            return False
+        if stop["interrupted"]:
+            self.stdout.write(
+                self.style.WARNING(f"Sync of endpoint {endpoint} stopped on shutdown; the next run resumes it.")
+            )
+            record.status = SyncRun.Status.INTERRUPTED
+            return False
+        await sync_to_async(writer.finish)(
+            lambda ep: self.update_last_sync(ep, started_at, using)
+        )
+        record.watermark_after = started_at
+        if pairs:
+            object_ids = sorted(set(writer.object_ids))
+            if not await self.sync_associations(endpoint, client, object_ids, pairs, using):
+                record.error = "Association sync failed."
+                return False
+        if self.reconcile:
+            if not await self.reconcile_endpoint(endpoint, client, portal):
+                record.error = "Reconciliation failed."
+                return False
+        return True
+
+    async def sync_associations(self, endpoint, client, object_ids, pairs, using=DEFAULT_DB_ALIAS):
+        """
+        Replace the stored edges of ``object_ids`` for each ``(from, to)``
+        type pair with what the v4 batch associations API returns, in
+        batches of ASSOCIATION_BATCH_SIZE records.
+        """
+        written = 0
+        try:
+            for from_type, to_type in pairs:
+                for start in range(0, len(object_ids), ASSOCIATION_BATCH_SIZE):
+                    chunk = object_ids[start:start + ASSOCIATION_BATCH_SIZE]
+                    edges = await self.read_associations(from_type, to_type, client, chunk)
+                    written += await sync_to_async(replace_edges)(from_type, to_type, chunk, edges, using)
+        except (HubSpotError, aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            self.stdout.write(self.style.ERROR(f"Association sync of endpoint {endpoint} failed: {exc}"))
+            return False
+        self.stdout.write(
+            f"Endpoint {endpoint}: {written} association edges stored for {len(object_ids)} records "
+            f"({', '.join(to_type for _, to_type in pairs)})."
+        )
+        return True
+
+    async def read_associations(self, from_type, to_type, client, ids):
+        path = f"/crm/v4/associations/{from_type}/{to_type}/batch/read"
+        status, data = await client.post(path, json={"inputs": [{"id": str(object_id)} for object_id in ids]})
+        # 207 means some records have no associations of this type.
+        if status not in (200, 207):
+            raise HubSpotError(
+                f"Failed to read associations {from_type} -> {to_type}. Status: {status}", status
+            )
+        edges = []
+        for result in data.get("results", []):
+            from_id = to_int(result.get("from", {}).get("id"))
+            if from_id is None:
+                continue
+            targets = list(result.get("to", []))
+            # A record with more associations than one batch result holds
+            # is paged through on its own.
+            after = result.get("paging", {}).get("next", {}).get("after")
+            while after:
+                more, after = await self.association_page(from_type, from_id, to_type, client, after)
+                targets.extend(more)
+            edges.extend(edges_from(from_type, to_type, from_id, targets))
+        return edges
+
+    async def association_page(self, from_type, from_id, to_type, client, after):
+        path = f"/crm/v4/objects/{from_type}/{from_id}/associations/{to_type}"
+        status, data = await client.get(path, params={"limit": 500, "after": after})
+        if status != 200:
+            raise HubSpotError(
+                f"Failed to read associations of {from_type} {from_id} -> {to_type}. Status: {status}", status
+            )
+        return data.get("results", []), data.get("paging", {}).get("next", {}).get("after")
+
+    async def reconcile_endpoint(self, endpoint, client, portal):
+        """
+        Apply HubSpot's deletions to the endpoint's table. Archived records
+        are listed every run (HubSpot cannot filter them by date, but only
+        the ones archived since the previous pass are written); all live ids
+        are streamed and diffed against the local keys when the last full
+        comparison is older than HUBSPOT_RECONCILE_INTERVAL.
+        """
+        using = portal.database
+        started_at = timezone.now()
+        reconciler = Reconciler(endpoint, portal.registry, using, delete=self.delete_missing)
+        history = await sync_to_async(self.get_history)(endpoint, using)
+        since = history.archived_synced_at if history else None
+        interval = timedelta(seconds=getattr(settings, "HUBSPOT_RECONCILE_INTERVAL", 24 * 60 * 60))
+        compare = (
+            self.full_reconcile
+            or not history
+            or not history.reconciled_at
+            or history.reconciled_at + interval <= started_at
+        )
         try:
-            history = HubSpotSyncHistory.objects.get(endpoint=endpoint)
-            return history.last_synced_at
-        except HubSpotSyncHistory.DoesNotExist:
+            archived_ids = await self.archived_ids(endpoint, client, reconciler, since)
+            live_ids = await self.live_ids(endpoint, client, reconciler) if compare else None
+        except (HubSpotError, aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            self.stdout.write(self.style.ERROR(f"Reconciliation of endpoint {endpoint} failed: {exc}"))
+            return False
+        archived = await sync_to_async(reconciler.archive)(archived_ids, started_at)
+        missing = restored = 0
+        if live_ids is not None:
+            local = await sync_to_async(reconciler.local_ids)()
+            if not live_ids and local:
+                # An empty listing is far more likely a problem on HubSpot's
+                # side than every record having been deleted.
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Endpoint {endpoint}: HubSpot listed no records; {len(local)} local rows left alone."
+                    )
+                )
+                compare = False
+            else:
+                missing, restored = await sync_to_async(reconciler.reconcile)(live_ids, started_at)
+        await sync_to_async(self.save_reconciliation)(endpoint, started_at, compare, using)
+        action = "deleted" if self.delete_missing else "flagged"
+        summary = f"Endpoint {endpoint}: {archived} archived records {action}"
+        if live_ids is not None:
+            summary += (
+                f"; {len(live_ids)} live ids compared, {missing} rows no longer in HubSpot {action}, "
+                f"{restored} restored"
+            )
+        self.stdout.write(summary + ".")
+        return True
+
+    async def archived_ids(self, endpoint, client, reconciler, since=None):
+        """Sorted keys of the records archived at or after ``since``."""
+        params = {"limit": LIST_PAGE_SIZE, "archived": "true", "properties": reconciler.property}
+        since = since - SEARCH_OVERLAP if since else None
+        ids = array("q")
+        async for results, _ in self.fetch_pages(endpoint, client, params):
+            for record in results:
+                archived_at = to_datetime(record.get("archivedAt"))
+                if since and archived_at and archived_at < since:
+                    continue
+                key = reconciler.remote_key(record)
+                if key is not None:
+                    ids.append(key)
+        return sorted_ids(ids)
+
+    async def live_ids(self, endpoint, client, reconciler):
+        """Sorted keys of every live record, requesting nothing but the key property."""
+        params = {"limit": LIST_PAGE_SIZE, "properties": reconciler.property}
+        ids = array("q")
+        async for results, _ in self.fetch_pages(endpoint, client, params):
+            ids.extend(key for key in map(reconciler.remote_key, results) if key is not None)
+        return sorted_ids(ids)
+
+    async def until_stopped(self, pages, state):
+        """Pass ``pages`` through until shutdown is requested, then stop fetching."""
+        async with aclosing(pages):
+            async for page in pages:
+                metrics.count("pages")
+                metrics.count("records", len(page[0]))
+                yield page
+                if self.stopping is not None and self.stopping.is_set():
+                    state["interrupted"] = True
+                    return
+
+    async def write_serial(self, endpoint, pages, writer, checkpoint=None):
+        buffer = []
+        buffered_pages = 0
+        cursor = None
+        async for results, cursor in pages:
+            buffer.extend(results)
+            buffered_pages += 1
+            if buffered_pages >= self.batch_pages:
+                await sync_to_async(self.save_records)(endpoint, buffer, writer)
+                if checkpoint:
+                    await checkpoint(cursor)
+                buffer = []
+                buffered_pages = 0
+        if buffer:
+            await sync_to_async(self.save_records)(endpoint, buffer, writer)
+            if checkpoint:
+                await checkpoint(cursor)
+
+    async def fetch_pages(self, endpoint, client, params):
+        """
+        Yield ``(results, cursor)`` for each page of the list endpoint, where
+        ``cursor`` is where to resume after that page (None on the last one).
+        """
+        path = f"/crm/v3/objects/{endpoint}"
+        while True:
+            status, data = await client.get(path, params=params)
+            if status != 200:
+                raise HubSpotError(
+                    f"Failed to fetch data for endpoint {endpoint}. Status: {status}", status
+                )
+            results = data.get("results", [])
+            if not results:
+                return
+            paging = data.get("paging", {})
+            next_page = paging.get("next", {}).get("after")
+            yield results, ((None, next_page) if next_page else None)
+            if not next_page:
+                return
+            params["after"] = next_page
+
+    async def search_pages(
+        self,
+        endpoint,
+        client,
+        start,
+        properties=None,
+        sort_property="hs_lastmodifieddate",
+        filters=(),
+    ):
+        """
+        Page through records whose ``sort_property`` is at least ``start`` in
+        ascending order, narrowed by any extra search ``filters``. When a
+        window reaches the search API's 10k-result cap, a new window is opened
+        at the last value seen. Yields ``(results, cursor)`` like fetch_pages,
+        with a ``(sort value, id)`` cursor of the page's last record: a resumed
+        search starts a new window at that value rather than reusing an
+        offset, which records modified in the meantime would shift.
+        """
+        path = f"/crm/v3/objects/{endpoint}/search"
+        window_start = start
+        after = None
+        if properties and sort_property not in properties:
+            # Needed to move the window forward at the result cap.
+            properties = list(properties) + [sort_property]
+        while True:
+            body = {
+                "filterGroups": [
+                    {
+                        "filters": [
+                            {
+                                "propertyName": sort_property,
+                                "operator": "GTE",
+                                "value": str(window_start),
+                            },
+                            *filters,
+                        ]
+                    }
+                ],
+                "sorts": [{"propertyName": sort_property, "direction": "ASCENDING"}],
+                "limit": SEARCH_PAGE_SIZE,
+            }
+            if properties:
+                body["properties"] = properties
+            if after:
+                body["after"] = after
+            status, data = await client.post(path, json=body)
+            if status != 200:
+                raise HubSpotError(
+                    f"Failed to search data for endpoint {endpoint}. Status: {status}", status
+                )
+            results = data.get("results", [])
+            if not results:
+                return
+            next_page = data.get("paging", {}).get("next", {}).get("after")
+            if not next_page:
+                yield results, None
+                return
+            if int(next_page) + SEARCH_PAGE_SIZE <= SEARCH_RESULT_CAP:
+                after = next_page
+            else:
+                next_start = self.next_window_start(results[-1], sort_property)
+                if next_start is None or next_start <= window_start:
+                    yield results, None
+                    raise HubSpotError(
+                        f"Cannot advance the search window for endpoint {endpoint} past {window_start}."
+                    )
+                window_start = next_start
+                after = None
+            value = self.sort_value(results[-1], sort_property)
+            yield results, ((value, results[-1].get("id")) if value is not None else None)
+
+    def sort_value(self, record, sort_property):
+        """``record``'s ``sort_property`` as the search API compares it."""
+        if sort_property == "hs_object_id":
+            return to_int(record.get("properties", {}).get("hs_object_id") or record.get("id"))
+        last_modified = to_datetime(
+            record.get("properties", {}).get(sort_property) or record.get("updatedAt")
+        )
+        return int(last_modified.timestamp() * 1000) if last_modified else None
+
+    def next_window_start(self, last, sort_property):
+        value = self.sort_value(last, sort_property)
+        if value is not None and sort_property == "hs_object_id":
+            # Ids are unique, so the next window can start strictly after it.
+            return value + 1
+        # Records sharing the boundary timestamp are fetched again; the
+        # upsert makes that harmless.
+        return value
+
+    async def sharded_pages(self, endpoint, client, since, properties, ranges=None):
+        """
+        Split the object into ``--shards`` disjoint hs_object_id ranges (or
+        search the ``(start, end)`` ``ranges`` of a checkpoint) and search
+        them concurrently, yielding pages from all shards as they arrive.
+        Each page's cursor holds the progress of every shard up to and
+        including it.
+        """
+        filters = []
+        window = None
+        if since:
+            window = int(since.timestamp() * 1000)
+            filters.append({"propertyName": "hs_lastmodifieddate", "operator": "GTE", "value": str(window)})
+        if ranges is None:
+            low = await self.search_bound(endpoint, client, filters, "ASCENDING")
+            if low is None:
+                return
+            high = await self.search_bound(endpoint, client, filters, "DESCENDING")
+            step = max(1, -(-(high - low + 1) // self.shards))
+            ranges = [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+            self.stdout.write(f"Endpoint {endpoint}: searching ids {low}-{high} in {len(ranges)} shards.")
+        progress = [list(shard) for shard in ranges]
+
+        async def shard_pages(index, start, end):
+            shard_filters = filters + [{"propertyName": "hs_object_id", "operator": "LT", "value": str(end)}]
+            pages = self.search_pages(
+                endpoint, client, start, properties, sort_property="hs_object_id", filters=shard_filters
+            )
+            async with aclosing(pages):
+                async for results, cursor in pages:
+                    yield index, results, cursor
+
+        shards = [shard_pages(index, start, end) for index, (start, end) in enumerate(ranges)]
+        async for index, results, cursor in merge_pages(shards, buffer=self.queue_depth):
+            # The last page of a shard has no cursor: nothing is left of it.
+            progress[index][0] = cursor[0] + 1 if cursor else progress[index][1]
+            yield results, (window, _shards_cursor(progress))
+
+    async def search_bound(self, endpoint, client, filters, direction):
+        body = {
+            "filterGroups": [{"filters": filters}] if filters else [],
+            "sorts": [{"propertyName": "hs_object_id", "direction": direction}],
+            "properties": ["hs_object_id"],
+            "limit": 1,
+        }
+        status, data = await client.post(f"/crm/v3/objects/{endpoint}/search", json=body)
+        if status != 200:
+            raise HubSpotError(
+                f"Failed to search data for endpoint {endpoint}. Status: {status}", status
+            )
+        results = data.get("results", [])
+        if not results:
             return None
+        return to_int(results[0].get("properties", {}).get("hs_object_id") or results[0].get("id"))
+
+    async def write_pipelined(self, endpoint, pages, writer, checkpoint=None):
+        writers = self.writers
+        if isinstance(writer, CopyLoader) and writers > 1:
+            # The staging table is a temporary table, visible to one connection only.
+            writers = 1
+        if connections[writer.using].vendor == "sqlite":
+            # SQLite locks the whole database while writing, so concurrent
+            # writers fail with "database table is locked".
+            writers = 1
+        if writers > 1:
+            # Each worker runs in its own thread and therefore on its own connection.
+            save = sync_to_async(self.save_records_threaded, thread_sensitive=False)
+        else:
+            save = sync_to_async(self.save_records)
+
+        async def write(records):
+            await save(endpoint, records, writer)
 
-    def update_last_sync(self, endpoint):
-        history, _ = HubSpotSyncHistory.objects.get_or_create(endpoint=endpoint)
-        history.last_synced_at = timezone.now()
+        stats = await run_pipeline(
+            pages,
+            write,
+            queue_depth=self.queue_depth,
+            writers=writers,
+            batch_pages=self.batch_pages,
+            checkpoint=checkpoint,
+        )
+        self.stdout.write(
+            f"Endpoint {endpoint}: {stats.records} records in {stats.pages} pages, "
+            f"{stats.batches} writes, {stats.elapsed:.2f}s "
+            f"(fetch idle {stats.fetch_idle:.2f}s, write idle {stats.write_idle:.2f}s)"
+        )
+        return stats
+
+    def get_writer(self, endpoint, portal=None):
+        registry = portal.registry if portal else None
+        using = portal.database if portal else DEFAULT_DB_ALIAS
+        writer = BulkWriter(endpoint, registry, using)
+        if self.full_load:
+            if writer.model is not HubSpotData and CopyLoader.supported(using):
+                writer = CopyLoader(endpoint, registry, using)
+            else:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"COPY full load is not available for endpoint {endpoint}; using bulk upserts."
+                    )
+                )
+        writer.begin()
+        return writer
+
+    def get_history(self, endpoint, using=DEFAULT_DB_ALIAS):
+        return HubSpotSyncHistory.objects.using(using).filter(endpoint=endpoint).first()
+
+    def save_checkpoint(self, endpoint, started_at, cursor, using=DEFAULT_DB_ALIAS):
+        if cursor is None:
+            return
+        since, after = cursor
+        HubSpotSyncHistory.objects.using(using).update_or_create(
+            endpoint=endpoint,
+            defaults={
+                "checkpoint_started_at": started_at,
+                "checkpoint_since": since,
+                "checkpoint_after": after,
+            },
+        )
+
+    def update_last_sync(self, endpoint, synced_at=None, using=DEFAULT_DB_ALIAS):
+        history, _ = HubSpotSyncHistory.objects.using(using).get_or_create(endpoint=endpoint)
+        history.last_synced_at = synced_at or timezone.now()
+        history.checkpoint_started_at = None
+        history.checkpoint_since = None
+        history.checkpoint_after = None
         history.save()
 
-    def save_record(self, endpoint, record):
-        # For the "jobs" endpoint (or its known aliases)
-        print("endpoint received:", endpoint)
-        print("Record received:", record)
-        
-
-        if endpoint.lower() in ['jobs', 'p47947320_jobs', '2-37778614']:
-            job_data = {}
-            job_field_names = {field.name for field in Job._meta.get_fields() if field.concrete and not field.auto_created}
-            print("job_field_names:", job_field_names)
-            for key in job_field_names:
-                if key in record:
-                    job_data[key] = record[key]
-                    print("Job (", key, "): ", record[key])
-            #Job.objects.update_or_create(job_id=job_data.get("job_id"), defaults=job_data)
-
-        # # For the "divisions" endpoint (or its known aliases)
-        elif endpoint.lower() in ['divisions', 'p47947320_divisions', '2-37778609']:
-            division_data = {}
-            division_field_names = {field.name for field in Division._meta.get_fields() if field.concrete and not field.auto_created}
-            for key in division_field_names:
-                if key in record:
-                    division_data[key] = record[key]
-                    print("division_data (", key, "): ", record[key])
-        #     Division.objects.update_or_create(id=division_data.get("id"), defaults=division_data)
-
-        # # For the "employees" endpoint (or its known aliases)
-        elif endpoint.lower() in ['employees', 'p47947320_employees', '2-38071071']:
-            employee_data = {}
-            employee_field_names = {field.name for field in Employee._meta.get_fields() if field.concrete and not field.auto_created}
-            for key in employee_field_names:
-                if key in record:
-                    employee_data[key] = record[key]
-                    print("employee_data (", key, "): ", record[key])
-        #     # Use the unique HubSpot record id ("hs_object_id") if available.
-        #     Employee.objects.update_or_create(hs_object_id=employee_data.get("hs_object_id"), defaults=employee_data)
-
-        # # Fallback: store the record in the generic table.
-        # else:
-        #     record_id = record.get("id") or record.get("job_id")
-        #     HubSpotData.objects.update_or_create(
-        #         endpoint=endpoint,
-        #         record_id=record_id,
-        #         defaults={"data": record},
-        #     )
+    @property
+    def mode(self):
+        if self.daemon:
+            return "daemon"
+        return "full" if self.full_load else "incremental"
+
+    def start_run(self, portal):
+        return SyncRun.objects.using(portal.database).create(
+            portal=portal.name, mode=self.mode, started_at=timezone.now()
+        )
+
+    def finish_run(self, run, results, using=DEFAULT_DB_ALIAS):
+        """Close ``run`` with the outcome of its endpoints (None when it raised)."""
+        run.finished_at = timezone.now()
+        statuses = dict(
+            SyncRunEndpoint.objects.using(using).filter(run=run).values_list("endpoint", "status")
+        )
+        failed = sorted(endpoint for endpoint, status in statuses.items() if status != SyncRun.Status.SUCCEEDED)
+        if results is not None and all(results):
+            run.status = SyncRun.Status.SUCCEEDED
+        elif results is not None and all(
+            status in (SyncRun.Status.SUCCEEDED, SyncRun.Status.INTERRUPTED) for status in statuses.values()
+        ):
+            run.status = SyncRun.Status.INTERRUPTED
+        else:
+            run.status = SyncRun.Status.FAILED
+        if failed:
+            run.error = f"{len(failed)} of {len(statuses)} endpoints did not complete: {', '.join(failed)}"
+        run.save(update_fields=["finished_at", "status", "error"])
+
+    def start_endpoint(self, endpoint, run=None, using=DEFAULT_DB_ALIAS):
+        return SyncRunEndpoint.objects.using(using).create(run=run, endpoint=endpoint, started_at=timezone.now())
+
+    def finish_endpoint(self, record, measured, completed, using=DEFAULT_DB_ALIAS):
+        """
+        Close the endpoint's SyncRunEndpoint row with its metrics, and add
+        them to the endpoint's cumulative and daily totals.
+        """
+        finished_at = timezone.now()
+        if completed:
+            record.status = SyncRun.Status.SUCCEEDED
+        elif record.status == SyncRun.Status.RUNNING:
+            record.status = SyncRun.Status.FAILED
+        counters = measured.counters
+        record.finished_at = finished_at
+        record.duration = measured.elapsed
+        record.pages = counters["pages"]
+        record.records = counters["records"]
+        record.bytes = counters["bytes"]
+        record.api_calls = counters["requests"]
+        record.retries = counters["retries"]
+        record.throttled = counters["throttled"]
+        record.inserted = counters["inserted"]
+        record.updated = counters["updated"]
+        record.skipped = counters["skipped"]
+        record.http_seconds = measured.seconds("http")
+        record.decode_seconds = measured.seconds("decode")
+        record.mapping_seconds = measured.seconds("mapping")
+        record.write_seconds = measured.seconds("write")
+        record.histograms = measured.histograms
+        day = timezone.localdate(record.started_at)
+        with transaction.atomic(using=using):
+            record.save(using=using)
+            history, _ = (
+                HubSpotSyncHistory.objects.using(using).select_for_update().get_or_create(endpoint=record.endpoint)
+            )
+            history.metrics = merge_totals(history.metrics, measured, finished_at, completed)
+            history.save(update_fields=["metrics"])
+            totals, _ = (
+                SyncEndpointDay.objects.using(using).select_for_update().get_or_create(endpoint=record.endpoint, day=day)
+            )
+            totals.runs += 1
+            totals.failures += record.status == SyncRun.Status.FAILED
+            totals.records += record.records
+            totals.api_calls += record.api_calls
+            totals.throttled += record.throttled
+            totals.duration_total += record.duration
+            totals.duration_max = max(totals.duration_max, record.duration)
+            totals.save(using=using)
+
+    def save_reconciliation(self, endpoint, reconciled_at, compared, using=DEFAULT_DB_ALIAS):
+        defaults = {"archived_synced_at": reconciled_at}
+        if compared:
+            defaults["reconciled_at"] = reconciled_at
+        HubSpotSyncHistory.objects.using(using).update_or_create(endpoint=endpoint, defaults=defaults)
+
+    def save_records(self, endpoint, records, writer=None):
+        writer = writer or BulkWriter(endpoint)
+        return writer.write(records)
+
+    def save_records_threaded(self, endpoint, records, writer=None):
+        try:
+            return self.save_records(endpoint, records, writer)
+        finally:
+            close_old_connections()
@@ -0,0 +1,291 @@
+import hashlib
+import json
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from hubspot_sync import metrics
+
+# -------------------------------------------------------------------
+# Converters from HubSpot's string-valued properties to model types.
+# Every converter maps None / "" to None and returns None for values
+# that cannot be parsed, so one bad property never fails a whole page.
+# -------------------------------------------------------------------
+
+
+def to_str(value):
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def to_float(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_int(value):
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    # Numbers sometimes arrive as "12.0" or "1.2E+3".
+    try:
+        return int(Decimal(value))
+    except (InvalidOperation, TypeError, ValueError, OverflowError):
+        return None
+
+
+def to_bool(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ("true", "1", "yes")
+
+
+def _epoch_ms(value):
+    return datetime.fromtimestamp(int(value) / 1000, tz=dt_timezone.utc)
+
+
+def to_datetime(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        if value.isdigit():
+            return _epoch_ms(value)
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        parsed = datetime.fromisoformat(value)
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+def to_date(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    try:
+        if len(value) == 10:
+            return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    parsed = to_datetime(value)
+    return parsed.date() if parsed else None
+
+
+def to_json(value):
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        return value
+    if value[0] in "[{":
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    # Multi-value properties (owner / team id lists, checkboxes) are sent as
+    # "a;b;c".
+    return value.split(";")
+
+
+def to_list(value):
+    # Multi-select enumerations, known from the property definition, are
+    # always "a;b;c" and never JSON.
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        return value
+    return value.split(";")
+
+
+def char_converter(max_length):
+    if not max_length:
+        return to_str
+
+    def convert(value):
+        value = to_str(value)
+        if value is not None and len(value) > max_length:
+            # Counted in the run's metrics rather than failing the page.
+            metrics.count("truncated")
+            value = value[:max_length]
+        return value
+
+    return convert
+
+
+FIELD_CONVERTERS = {
+    "BigIntegerField": to_int,
+    "IntegerField": to_int,
+    "PositiveIntegerField": to_int,
+    "SmallIntegerField": to_int,
+    "FloatField": to_float,
+    "BooleanField": to_bool,
+    "DateField": to_date,
+    "DateTimeField": to_datetime,
+    "JSONField": to_json,
+    "TextField": to_str,
+}
+
+
+NUMERIC_TYPES = frozenset(
+    ("BigIntegerField", "IntegerField", "PositiveIntegerField", "SmallIntegerField", "FloatField")
+)
+
+
+def field_converter(field):
+    internal_type = field.get_internal_type()
+    if internal_type == "CharField":
+        return char_converter(field.max_length)
+    return FIELD_CONVERTERS.get(internal_type, to_str)
+
+
+def property_converter(field, definition=None):
+    """
+    Converter for ``field`` that also takes the HubSpot property definition,
+    a ``(type, fieldType)`` pair from the schema cache, into account when the
+    column type alone would misread the value.
+    """
+    converter = field_converter(field)
+    if not definition:
+        return converter
+    hubspot_type, _ = definition
+    internal_type = field.get_internal_type()
+    if hubspot_type == "bool" and internal_type in NUMERIC_TYPES:
+        # Checkboxes stored in numeric columns: "true" -> 1.
+
+        def convert(value):
+            value = to_bool(value)
+            return None if value is None else converter(int(value))
+
+        return convert
+    if hubspot_type == "enumeration" and internal_type == "JSONField":
+        return to_list
+    return converter
+
+
+# Column holding a hash of a row's mapped values; it is filled by the sync,
+# not from a HubSpot property.
+FINGERPRINT_FIELD = "fingerprint"
+# Set on rows whose record HubSpot archived or deleted (see sync_hubspot
+# --reconcile); writing a live copy of the record clears it again.
+ARCHIVED_FIELD = "archived_at"
+SYNC_FIELDS = frozenset((FINGERPRINT_FIELD, ARCHIVED_FIELD))
+
+
+def fingerprint(values):
+    """
+    Stable 32-character hash of JSON-compatible values (datetimes and
+    decimals are hashed as their str()). Always uses the standard json module
+    so installing orjson does not change every stored fingerprint.
+    """
+    payload = json.dumps(values, default=str, separators=(",", ":"), sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def row_fingerprint(values, key=b""):
+    """
+    32-character hash of the raw HubSpot values a row is converted from.
+    The converters are deterministic, so equal values make equal rows;
+    hashing their repr() is several times cheaper than JSON of the
+    converted values. ``key`` (up to 64 bytes) ties the hash to the plan
+    that converts them.
+    """
+    return hashlib.blake2b(repr(values).encode(), digest_size=16, key=key).hexdigest()
+
+
+class MappingPlan:
+    """
+    Precompiled mapping from HubSpot properties to one model's columns.
+
+    ``columns`` is a flat list of (property name, attname, converter,
+    required) tuples built once per model, so converting a page does no
+    model introspection.
+    ``fields`` are all columns the sync writes, including the fingerprint
+    and archived_at columns of models that have them; convert() fills them in. ``definitions``
+    maps property names to their cached HubSpot ``(type, fieldType)``.
+    """
+
+    def __init__(self, model, key, definitions=None):
+        self.model = model
+        self.key = key
+        definitions = definitions or {}
+        self.fields = [
+            field
+            for field in model._meta.concrete_fields
+            if not field.auto_created
+        ]
+        mapped = [field for field in self.fields if field.name not in SYNC_FIELDS]
+        names = {field.name for field in self.fields}
+        self.fingerprinted = FINGERPRINT_FIELD in names
+        self.archivable = ARCHIVED_FIELD in names
+        # Non-nullable ("required") columns are left to their model default
+        # when HubSpot has no value for them.
+        self.columns = [
+            (field.name, field.attname, property_converter(field, definitions.get(field.name)), not field.null)
+            for field in mapped
+        ]
+        self.properties = [field.name for field in mapped]
+        # Row fingerprints hash the raw values, so a change to the columns or
+        # their property types changes every fingerprint and rewrites the
+        # rows with the new conversion once.
+        spec = [
+            (field.name, field.get_internal_type(), field.max_length, definitions.get(field.name))
+            for field in mapped
+        ]
+        self.fingerprint_key = hashlib.blake2b(repr(spec).encode()).digest()
+
+    def convert(self, properties):
+        row = {}
+        values = []
+        get = properties.get
+        for name, attname, converter, required in self.columns:
+            value = get(name)
+            values.append(value)
+            # Most properties of a record are empty; skip the call for them.
+            if value is not None:
+                value = converter(value)
+            if value is None and required:
+                continue
+            row[attname] = value
+        if self.fingerprinted:
+            row[FINGERPRINT_FIELD] = row_fingerprint(values, self.fingerprint_key)
+        if self.archivable:
+            row[ARCHIVED_FIELD] = None
+        return row
+
+    def convert_page(self, records):
+        convert = self.convert
+        return [convert(record.get("properties") or record) for record in records]
+
+
+_plans = {}
+
+
+def register_plan(model, key, definitions=None):
+    plan = MappingPlan(model, key, definitions)
+    _plans[model] = plan
+    return plan
+
+
+def get_plan(model):
+    return _plans[model]
+
+
+def build_plans():
+    from hubspot_sync.models import Division, Employee, Job
+
+    register_plan(Job, "job_id")
+    register_plan(Division, "id")
+    register_plan(Employee, "hs_object_id")
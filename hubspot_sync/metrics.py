@@ -0,0 +1,243 @@
+"""
+Per-run sync metrics and their Prometheus text exposition.
+
+Each endpoint's sync collects a SyncMetrics (counters plus latency / stage
+histograms) in a context variable, so the client, the JSON decoder and the
+writers record into the run they belong to without it being passed around;
+asyncio tasks and sync_to_async threads started by the run inherit it. At
+the end of the run it is saved on its SyncRunEndpoint row and merged into
+the cumulative totals on the endpoint's HubSpotSyncHistory, which is what
+the /hubspot/metrics/ endpoint reads.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the duration histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNTERS = (
+    "pages",
+    "records",
+    "bytes",
+    "requests",
+    "retries",
+    "throttled",
+    "inserted",
+    "updated",
+    "skipped",
+    # Property values cut to their column's max_length.
+    "truncated",
+)
+# Histograms: HTTP round trips (per request), JSON decoding (per response),
+# mapping to model rows and database writes (per written batch).
+STAGES = ("http", "decode", "mapping", "write")
+
+_current = contextvars.ContextVar("hubspot_sync_metrics", default=None)
+# The stage being timed, for attributing work done inside it (e.g. queries).
+_stage = contextvars.ContextVar("hubspot_sync_stage", default=None)
+
+
+def empty_histogram():
+    return {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+
+
+def observe_histogram(histogram, seconds):
+    for index, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            break
+    else:
+        index = len(BUCKETS)
+    histogram["buckets"][index] += 1
+    histogram["sum"] += seconds
+    histogram["count"] += 1
+
+
+class SyncMetrics:
+    """Counters and stage histograms of one endpoint's run; thread safe."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {stage: empty_histogram() for stage in STAGES}
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            observe_histogram(self.histograms[stage], seconds)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def seconds(self, stage):
+        return self.histograms[stage]["sum"]
+
+    def summary(self):
+        return (
+            f"{self.counters['records']} records in {self.counters['pages']} pages "
+            f"({self.counters['bytes'] / 2**20:.1f} MiB, {self.counters['requests']} requests); "
+            f"http {self.seconds('http'):.2f}s, decode {self.seconds('decode'):.2f}s, "
+            f"mapping {self.seconds('mapping'):.2f}s, db {self.seconds('write'):.2f}s; "
+            f"{self.counters['inserted']} inserted, {self.counters['updated']} updated, "
+            f"{self.counters['skipped']} unchanged"
+            + (f", {self.counters['truncated']} values truncated" if self.counters["truncated"] else "")
+        )
+
+
+@contextmanager
+def collecting(metrics):
+    """Make ``metrics`` the current run's metrics inside the block."""
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def current_stage():
+    return _stage.get()
+
+
+def count(name, value=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, value)
+
+
+def observe(stage, seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.observe(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    token = _stage.set(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+        _stage.reset(token)
+
+
+def merge_totals(totals, metrics, finished_at, completed=True):
+    """
+    Add a finished run to an endpoint's cumulative ``totals`` dict; the
+    ``last_run`` gauges only follow completed runs.
+    """
+    totals = dict(totals or {})
+    counters = dict(totals.get("counters") or {})
+    for name, value in metrics.counters.items():
+        counters[name] = counters.get(name, 0) + value
+    counters["runs"] = counters.get("runs", 0) + 1
+    if not completed:
+        counters["failed"] = counters.get("failed", 0) + 1
+    histograms = dict(totals.get("histograms") or {})
+    for stage, run in metrics.histograms.items():
+        total = histograms.get(stage) or empty_histogram()
+        if len(total["buckets"]) != len(run["buckets"]):
+            # The buckets changed; start over rather than mix them.
+            total = empty_histogram()
+        histograms[stage] = {
+            "buckets": [a + b for a, b in zip(total["buckets"], run["buckets"])],
+            "sum": total["sum"] + run["sum"],
+            "count": total["count"] + run["count"],
+        }
+    totals["counters"] = counters
+    totals["histograms"] = histograms
+    if completed:
+        totals["last_run"] = {
+            "finished_at": finished_at.timestamp(),
+            "duration": metrics.elapsed,
+            "records": metrics.counters["records"],
+        }
+    return totals
+
+
+# -------------------------------------------------------------------
+# Prometheus text format
+# -------------------------------------------------------------------
+
+COUNTER_METRICS = (
+    ("runs", "hubspot_sync_runs_total", "Endpoint sync runs."),
+    ("failed", "hubspot_sync_failed_runs_total", "Endpoint sync runs that did not complete."),
+    ("pages", "hubspot_sync_pages_total", "API pages fetched."),
+    ("records", "hubspot_sync_records_total", "Records fetched."),
+    ("bytes", "hubspot_sync_response_bytes_total", "Response body bytes received."),
+    ("requests", "hubspot_sync_requests_total", "HubSpot API requests sent."),
+    ("retries", "hubspot_sync_retries_total", "HubSpot API requests retried."),
+    ("throttled", "hubspot_sync_rate_limited_total", "HubSpot API requests answered with 429."),
+    ("truncated", "hubspot_sync_truncated_values_total", "Property values cut to their column's max_length."),
+)
+ROW_RESULTS = ("inserted", "updated", "skipped")
+HISTOGRAM_METRICS = (
+    ("http", "hubspot_sync_http_request_duration_seconds", "HubSpot API round trip time."),
+    ("decode", "hubspot_sync_decode_duration_seconds", "JSON decoding time per response."),
+    ("mapping", "hubspot_sync_mapping_duration_seconds", "Mapping time per written batch."),
+    ("write", "hubspot_sync_db_write_duration_seconds", "Database write time per written batch."),
+)
+
+
+def _label_value(value):
+    # The exposition format escapes backslashes, double quotes and line
+    # feeds in label values; portal and endpoint names can contain any of them.
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+
+def render(rows):
+    """
+    Prometheus text exposition of ``(labels, totals)`` pairs, one per
+    endpoint (and portal), where ``totals`` come from merge_totals().
+    """
+    lines = []
+    for key, name, help_text in COUNTER_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for labels, totals in rows:
+            value = (totals.get("counters") or {}).get(key, 0)
+            lines.append(f"{name}{{{_labels(labels)}}} {value}")
+    name = "hubspot_sync_rows_total"
+    lines += [f"# HELP {name} Rows by write result.", f"# TYPE {name} counter"]
+    for labels, totals in rows:
+        for result in ROW_RESULTS:
+            value = (totals.get("counters") or {}).get(result, 0)
+            lines.append(f"{name}{{{_labels({**labels, 'result': result})}}} {value}")
+    for stage, name, help_text in HISTOGRAM_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for labels, totals in rows:
+            histogram = (totals.get("histograms") or {}).get(stage)
+            if not histogram or len(histogram["buckets"]) != len(BUCKETS) + 1:
+                continue
+            cumulative = 0
+            for bound, value in zip((*BUCKETS, "+Inf"), histogram["buckets"]):
+                cumulative += value
+                lines.append(f"{name}_bucket{{{_labels({**labels, 'le': bound})}}} {cumulative}")
+            lines.append(f"{name}_sum{{{_labels(labels)}}} {histogram['sum']}")
+            lines.append(f"{name}_count{{{_labels(labels)}}} {histogram['count']}")
+    for key, name, help_text in (
+        ("finished_at", "hubspot_sync_last_run_timestamp_seconds", "End of the last completed run."),
+        ("duration", "hubspot_sync_last_run_duration_seconds", "Duration of the last completed run."),
+        ("records", "hubspot_sync_last_run_records", "Records fetched by the last completed run."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for labels, totals in rows:
+            value = (totals.get("last_run") or {}).get(key)
+            if value is not None:
+                lines.append(f"{name}{{{_labels(labels)}}} {value}")
+    return "\n".join(lines) + "\n"
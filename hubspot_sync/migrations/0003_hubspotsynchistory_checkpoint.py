@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_sync', '0002_rename_hubspot_createdate_division_hs_createdate_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hubspotsynchistory',
+            name='checkpoint_after',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hubspotsynchistory',
+            name='checkpoint_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hubspotsynchistory',
+            name='checkpoint_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
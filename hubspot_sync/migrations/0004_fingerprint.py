@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_sync', '0003_hubspotsynchistory_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='division',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='hubspotdata',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+    ]
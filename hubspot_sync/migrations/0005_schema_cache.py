@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_sync', '0004_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HubSpotObjectSchema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type_id', models.CharField(max_length=100, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('fully_qualified_name', models.CharField(blank=True, default='', max_length=255)),
+                ('etag', models.CharField(blank=True, max_length=255, null=True)),
+                ('fetched_at', models.DateTimeField()),
+                ('labels', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HubSpotProperty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('type', models.CharField(max_length=50)),
+                ('field_type', models.CharField(blank=True, default='', max_length=50)),
+                ('schema', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='properties', to='hubspot_sync.hubspotobjectschema')),
+            ],
+            options={
+                'verbose_name_plural': 'HubSpot properties',
+                'unique_together': {('schema', 'name')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_sync', '0006_reconcile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HubSpotAssociation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_type', models.CharField(max_length=100)),
+                ('from_id', models.BigIntegerField()),
+                ('to_type', models.CharField(max_length=100)),
+                ('to_id', models.BigIntegerField()),
+                ('label', models.CharField(blank=True, default='', max_length=255)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['to_type', 'to_id'], name='hubspot_association_to')],
+                'constraints': [models.UniqueConstraint(fields=('from_type', 'from_id', 'to_type', 'to_id', 'label'), name='hubspot_association_unique')],
+            },
+        ),
+    ]
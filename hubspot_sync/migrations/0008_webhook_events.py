@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_sync', '0007_associations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HubSpotWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.BigIntegerField(unique=True)),
+                ('portal_id', models.BigIntegerField(blank=True, null=True)),
+                ('object_type', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('change', models.CharField(max_length=50)),
+                ('occurred_at', models.DateTimeField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['object_type', 'id'], name='hubspot_webhook_pending')],
+            },
+        ),
+    ]
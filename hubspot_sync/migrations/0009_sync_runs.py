@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_sync', '0008_webhook_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hubspotsynchistory',
+            name='metrics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('portal', models.CharField(default='default', max_length=100)),
+                ('mode', models.CharField(max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('interrupted', 'Interrupted')], default='running', max_length=20)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-started_at'], name='sync_run_started')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncRunEndpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=100)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('interrupted', 'Interrupted')], default='running', max_length=20)),
+                ('error', models.TextField(blank=True, default='')),
+                ('duration', models.FloatField(default=0)),
+                ('watermark_before', models.DateTimeField(blank=True, null=True)),
+                ('watermark_after', models.DateTimeField(blank=True, null=True)),
+                ('pages', models.IntegerField(default=0)),
+                ('records', models.IntegerField(default=0)),
+                ('bytes', models.BigIntegerField(default=0)),
+                ('api_calls', models.IntegerField(default=0)),
+                ('retries', models.IntegerField(default=0)),
+                ('throttled', models.IntegerField(default=0)),
+                ('inserted', models.IntegerField(default=0)),
+                ('updated', models.IntegerField(default=0)),
+                ('skipped', models.IntegerField(default=0)),
+                ('http_seconds', models.FloatField(default=0)),
+                ('decode_seconds', models.FloatField(default=0)),
+                ('mapping_seconds', models.FloatField(default=0)),
+                ('write_seconds', models.FloatField(default=0)),
+                ('histograms', models.JSONField(blank=True, default=dict)),
+                ('run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='endpoints', to='hubspot_sync.syncrun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['endpoint', '-started_at'], name='sync_run_endpoint_history'), models.Index(fields=['started_at', 'endpoint', 'duration'], name='sync_run_endpoint_slowest')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncEndpointDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=100)),
+                ('day', models.DateField()),
+                ('runs', models.IntegerField(default=0)),
+                ('failures', models.IntegerField(default=0)),
+                ('records', models.BigIntegerField(default=0)),
+                ('api_calls', models.IntegerField(default=0)),
+                ('throttled', models.IntegerField(default=0)),
+                ('duration_total', models.FloatField(default=0)),
+                ('duration_max', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('endpoint', 'day'), name='sync_endpoint_day_unique')],
+                'indexes': [models.Index(fields=['day', 'duration_max'], name='sync_endpoint_day_slowest')],
+            },
+        ),
+    ]
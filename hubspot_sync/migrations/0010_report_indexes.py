@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:42
+
+import hubspot_sync.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_sync', '0009_sync_runs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='division',
+            index=hubspot_sync.indexes.BrinIndex(fields=['hs_lastmodifieddate'], name='division_modified_brin'),
+        ),
+        migrations.AddIndex(
+            model_name='division',
+            index=models.Index(fields=['hs_object_id'], name='division_hs_object_id'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['employee_division_id'], name='employee_division'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True), models.Q(('is_inactive__isnull', True), ('is_inactive__in', ['', '0', 'false']), _connector='OR')), fields=['employee_division_id'], name='employee_active_division'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True), models.Q(('is_inactive__isnull', True), ('is_inactive__in', ['', '0', 'false']), _connector='OR')), fields=['employee_user_id'], name='employee_active_user'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=hubspot_sync.indexes.BrinIndex(fields=['hs_lastmodifieddate'], name='job_modified_brin'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['hs_object_id'], name='job_hs_object_id'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['division_id', 'contract_date'], name='job_division_contract'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['contract_date'], name='job_contract_date'),
+        ),
+    ]
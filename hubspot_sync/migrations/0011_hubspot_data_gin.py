@@ -0,0 +1,33 @@
+from django.db import migrations
+
+INDEX = "hubspot_data_path_ops"
+
+
+def create_gin_index(apps, schema_editor):
+    # jsonb_path_ops only exists on PostgreSQL; other databases filter on
+    # data without an index.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    HubSpotData = apps.get_model("hubspot_sync", "HubSpotData")
+    qn = schema_editor.quote_name
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {qn(INDEX)} ON {qn(HubSpotData._meta.db_table)} "
+        f"USING gin ({qn('data')} jsonb_path_ops)"
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(INDEX)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_sync', '0010_report_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,626 @@
+"""
+Local stand-in for the parts of the HubSpot CRM API that sync_hubspot uses:
+
+    GET  /crm/v3/schemas
+    GET  /crm/v3/objects/{type}            (archived=true lists archived records)
+    POST /crm/v3/objects/{type}/search
+    POST /crm/v3/objects/{type}/batch/read
+    POST /crm/v4/associations/{from}/{to}/batch/read
+    GET  /crm/v4/objects/{from}/{id}/associations/{to}
+
+It serves synthetic Job / Division / Employee records whose properties follow
+the model field types, and can inject latency, rate limiting (429) and server
+errors (5xx), either at random or for chosen requests (MockHubSpot.fail).
+Request counts, and the most requests served at once, are available
+from ``GET /__stats``.
+
+Run it standalone with::
+
+    python -m hubspot_sync.mock_server --port 8765 --jobs 100000
+
+and point the command at it with ``HUBSPOT_API_BASE_URL=http://127.0.0.1:8765``.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+from hubspot_sync.mapping import SYNC_FIELDS
+
+SEARCH_RESULT_CAP = 10000
+INDEXED_PROPERTIES = ("hs_object_id", "hs_lastmodifieddate")
+
+# objectTypeId, fully qualified name, name, model name, unique property
+OBJECT_TYPES = [
+    ("2-37778614", "p47947320_jobs", "jobs", "Job", "job_id"),
+    ("2-37778609", "p47947320_divisions", "divisions", "Division", "id"),
+    ("2-38071071", "p47947320_employees", "employees", "Employee", "hs_object_id"),
+]
+
+# HubSpot property (type, fieldType) for each model field type.
+PROPERTY_TYPES = {
+    "BigIntegerField": ("number", "number"),
+    "IntegerField": ("number", "number"),
+    "FloatField": ("number", "number"),
+    "DateTimeField": ("datetime", "date"),
+    "DateField": ("date", "date"),
+    "BooleanField": ("bool", "booleancheckbox"),
+    "JSONField": ("enumeration", "checkbox"),
+    "TextField": ("string", "textarea"),
+}
+
+
+# -------------------------------------------------------------------
+# Synthetic data
+# -------------------------------------------------------------------
+
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _timestamp(rng, base=BASE_TIME):
+    moment = base - timedelta(seconds=rng.randint(0, 3 * 365 * 86400))
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{rng.randint(0, 999):03d}Z"
+
+
+def _date(rng, base=BASE_TIME):
+    return (base - timedelta(days=rng.randint(0, 3 * 365))).strftime("%Y-%m-%d")
+
+
+def synthetic_value(field, rng, base=BASE_TIME):
+    """A HubSpot-style string value for a model field (HubSpot sends every property as a string)."""
+    internal_type = field.get_internal_type()
+    if rng.random() < 0.1:
+        return None if rng.random() < 0.5 else ""
+    if internal_type in ("BigIntegerField", "IntegerField"):
+        return str(rng.randint(1, 10**9))
+    if internal_type == "FloatField":
+        return str(round(rng.uniform(0, 10**5), 2))
+    if internal_type == "DateTimeField":
+        return _timestamp(rng, base)
+    if internal_type == "DateField":
+        return _date(rng, base)
+    if internal_type == "BooleanField":
+        return rng.choice(("true", "false"))
+    if internal_type == "JSONField":
+        return ";".join(str(rng.randint(1, 10**6)) for _ in range(rng.randint(1, 4)))
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(rng.randint(4, 40)))
+
+
+def synthetic_records(model, key, count, seed=0, start=1):
+    """Generate ``count`` CRM v3 object payloads whose properties cover every field of ``model``."""
+    rng = random.Random(seed)
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if not field.auto_created and field.name not in SYNC_FIELDS
+    ]
+    records = []
+    for object_id in range(start, start + count):
+        properties = {field.name: synthetic_value(field, rng) for field in fields}
+        properties[key] = str(object_id)
+        properties["hs_object_id"] = str(object_id)
+        properties["hs_lastmodifieddate"] = _timestamp(rng)
+        if "firstname" in properties and not properties["firstname"]:
+            properties["firstname"] = "Synthetic"
+        if "hs_unique_creation_key" in properties:
+            properties["hs_unique_creation_key"] = None
+        records.append(
+            {
+                "id": str(object_id),
+                "properties": properties,
+                "createdAt": _timestamp(rng),
+                "updatedAt": properties["hs_lastmodifieddate"],
+                "archived": False,
+            }
+        )
+    return records
+
+
+def schema_properties(model):
+    properties = []
+    for field in model._meta.concrete_fields:
+        if field.auto_created or field.name in SYNC_FIELDS:
+            continue
+        property_type, field_type = PROPERTY_TYPES.get(field.get_internal_type(), ("string", "text"))
+        properties.append(
+            {"name": field.name, "label": field.name, "type": property_type, "fieldType": field_type}
+        )
+    names = {prop["name"] for prop in properties}
+    for name in ("hs_object_id", "hs_lastmodifieddate"):
+        if name not in names:
+            property_type = "number" if name == "hs_object_id" else "datetime"
+            properties.append({"name": name, "label": name, "type": property_type, "fieldType": "text"})
+    return properties
+
+
+def _epoch_ms(value):
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+class MockObject:
+    def __init__(self, type_id, fqn, name, model, key, records):
+        self.type_id = type_id
+        self.fqn = fqn
+        self.name = name
+        self.model = model
+        self.key = key
+        self.records = records
+        self.archived = []
+        self.by_id = {record["id"]: record for record in records}
+        self.numeric = {}
+        self.indexes = {}
+
+    def archive(self, ids, purge=False):
+        """Archive the records with ``ids``; purged records disappear entirely."""
+        ids = {str(object_id) for object_id in ids}
+        removed = [record for record in self.records if record["id"] in ids]
+        self.records = [record for record in self.records if record["id"] not in ids]
+        for record in removed:
+            del self.by_id[record["id"]]
+            if not purge:
+                self.archived.append(
+                    {**record, "archived": True, "archivedAt": datetime.now(timezone.utc).isoformat()}
+                )
+        self.indexes.clear()
+
+    def touch(self, ids, modified=None):
+        """Set hs_lastmodifieddate of the records with ``ids`` to ``modified`` (now)."""
+        modified = (modified or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+        for object_id in ids:
+            record = self.by_id[str(object_id)]
+            record["properties"]["hs_lastmodifieddate"] = record["updatedAt"] = modified
+            self.numeric.pop((record["id"], "hs_lastmodifieddate"), None)
+        self.indexes.clear()
+
+    def sorted_by(self, name):
+        """Records with a value for ``name`` in ascending order, plus their sort keys."""
+        if name not in self.indexes:
+            pairs = [(self.value(record, name), record) for record in self.records]
+            pairs = sorted((pair for pair in pairs if pair[0] is not None), key=lambda pair: pair[0])
+            self.indexes[name] = ([value for value, _ in pairs], [record for _, record in pairs])
+        return self.indexes[name]
+
+    def value(self, record, name):
+        # Numeric view of a property for filtering and sorting; cached per
+        # (record, property) because the same windows are searched repeatedly.
+        cache_key = (record["id"], name)
+        cached = self.numeric.get(cache_key, False)
+        if cached is not False:
+            return cached
+        raw = record["properties"].get(name)
+        if name == "hs_object_id":
+            value = int(record["id"])
+        elif name in ("hs_lastmodifieddate", "hs_createdate") or (raw and raw[:1].isdigit() and "T" in raw):
+            value = _epoch_ms(raw)
+        else:
+            try:
+                value = float(raw) if raw not in (None, "") else None
+            except ValueError:
+                value = raw
+        self.numeric[cache_key] = value
+        return value
+
+
+# -------------------------------------------------------------------
+# Server
+# -------------------------------------------------------------------
+
+
+class MockHubSpot:
+    def __init__(
+        self,
+        volumes=None,
+        seed=0,
+        latency=0.0,
+        jitter=0.0,
+        rate_limit=None,
+        rate_interval=10.0,
+        throttle_rate=0.0,
+        error_rate=0.0,
+        retry_after=1,
+    ):
+        from hubspot_sync import models
+
+        volumes = volumes or {}
+        self.objects = {}
+        self.aliases = {}
+        for index, (type_id, fqn, name, model_name, key) in enumerate(OBJECT_TYPES):
+            model = getattr(models, model_name)
+            count = volumes.get(name, 0)
+            records = synthetic_records(model, key, count, seed=seed + index)
+            obj = MockObject(type_id, fqn, name, model, key, records)
+            self.objects[type_id] = obj
+            for alias in (type_id, fqn, name):
+                self.aliases[alias.lower()] = obj
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_interval = rate_interval
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.arrivals = deque()
+        self.stats = Counter()
+        # Requests being answered; stats["max_in_flight"] is its peak.
+        self.in_flight = 0
+        self.failures = []
+
+    # -- middleware ------------------------------------------------------
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        if request.path == "/__stats":
+            return await handler(request)
+        self.stats["requests"] += 1
+        self.in_flight += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.in_flight)
+        try:
+            return await self.respond(request, handler)
+        finally:
+            self.in_flight -= 1
+
+    async def respond(self, request, handler):
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        headers = {}
+        if self.rate_limit:
+            now = asyncio.get_running_loop().time()
+            while self.arrivals and self.arrivals[0] <= now - self.rate_interval:
+                self.arrivals.popleft()
+            if len(self.arrivals) >= self.rate_limit:
+                return self.throttled()
+            self.arrivals.append(now)
+            headers = {
+                "X-HubSpot-RateLimit-Max": str(self.rate_limit),
+                "X-HubSpot-RateLimit-Interval-Milliseconds": str(int(self.rate_interval * 1000)),
+                "X-HubSpot-RateLimit-Remaining": str(self.rate_limit - len(self.arrivals)),
+            }
+        if self.throttle_rate and self.rng.random() < self.throttle_rate:
+            return self.throttled()
+        if self.injected_failure(request) or (self.error_rate and self.rng.random() < self.error_rate):
+            self.stats["errors"] += 1
+            return web.json_response({"status": "error", "message": "Injected failure"}, status=503)
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    def fail(self, path="", after=0, times=1):
+        """
+        Answer ``times`` requests whose path contains ``path`` with a 503,
+        once ``after`` of them have been served normally.
+        """
+        self.failures.append({"path": path, "after": after, "times": times})
+
+    def injected_failure(self, request):
+        for failure in self.failures:
+            if not failure["times"] or failure["path"] not in request.path:
+                continue
+            if failure["after"]:
+                failure["after"] -= 1
+                continue
+            failure["times"] -= 1
+            return True
+        return False
+
+    def throttled(self):
+        self.stats["throttled"] += 1
+        return web.json_response(
+            {"status": "error", "category": "RATE_LIMITS"},
+            status=429,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def archive(self, object_type, ids, purge=False):
+        self.aliases[object_type.lower()].archive(ids, purge)
+
+    def touch(self, object_type, ids, modified=None):
+        self.aliases[object_type.lower()].touch(ids, modified)
+
+    def resolve(self, request):
+        obj = self.aliases.get(request.match_info["object_type"].lower())
+        if obj is None:
+            raise web.HTTPNotFound(text='{"status": "error", "category": "OBJECT_NOT_FOUND"}')
+        return obj
+
+    @staticmethod
+    def select(record, properties):
+        if not properties:
+            return record
+        wanted = {name: record["properties"].get(name) for name in properties}
+        wanted["hs_object_id"] = record["properties"].get("hs_object_id")
+        return {**record, "properties": wanted}
+
+    # -- handlers --------------------------------------------------------
+
+    async def get_stats(self, request):
+        return web.json_response(dict(self.stats))
+
+    async def get_schemas(self, request):
+        self.stats["schemas"] += 1
+        results = [
+            {
+                "id": obj.type_id.split("-", 1)[1],
+                "objectTypeId": obj.type_id,
+                "fullyQualifiedName": obj.fqn,
+                "name": obj.name,
+                "labels": {"singular": obj.name.rstrip("s").title(), "plural": obj.name.title()},
+                "primaryDisplayProperty": obj.key,
+                "properties": schema_properties(obj.model),
+            }
+            for obj in self.objects.values()
+        ]
+        etag = '"' + hashlib.md5(json.dumps(results, sort_keys=True).encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["schemas_not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response({"results": results}, headers={"ETag": etag})
+
+    async def list_objects(self, request):
+        self.stats["list"] += 1
+        obj = self.resolve(request)
+        limit = min(int(request.query.get("limit", 10)), 100)
+        after = int(request.query.get("after", 0))
+        properties = [p for p in request.query.get("properties", "").split(",") if p]
+        archived = request.query.get("archived", "false") == "true"
+        records = obj.archived if archived else obj.records
+        page = records[after:after + limit]
+        data = {"results": [self.select(record, properties) for record in page]}
+        if after + limit < len(records):
+            data["paging"] = {"next": {"after": str(after + limit)}}
+        return web.json_response(data)
+
+    async def search_objects(self, request):
+        self.stats["search"] += 1
+        obj = self.resolve(request)
+        body = await request.json()
+        limit = min(int(body.get("limit", 10)), 200)
+        after = int(body.get("after", 0) or 0)
+        if after + limit > SEARCH_RESULT_CAP:
+            return web.json_response(
+                {"status": "error", "category": "VALIDATION_ERROR", "message": "Search paging limit exceeded"},
+                status=400,
+            )
+        groups = body.get("filterGroups") or []
+        sorts = body.get("sorts") or []
+        if len(sorts) == 1 and len(groups) <= 1 and sorts[0].get("propertyName") in INDEXED_PROPERTIES:
+            records = self.indexed_search(obj, groups, sorts[0])
+        else:
+            records = [record for record in obj.records if self.matches(obj, record, groups)]
+            for sort in reversed(sorts):
+                name = sort.get("propertyName")
+                descending = sort.get("direction", "ASCENDING") == "DESCENDING"
+                records.sort(
+                    key=lambda record: (obj.value(record, name) is None, obj.value(record, name) or 0),
+                    reverse=descending,
+                )
+        page = records[after:after + limit]
+        data = {
+            "total": len(records),
+            "results": [self.select(record, body.get("properties")) for record in page],
+        }
+        if after + limit < len(records):
+            data["paging"] = {"next": {"after": str(after + limit)}}
+        return web.json_response(data)
+
+    def indexed_search(self, obj, groups, sort):
+        # Narrow range filters on the sort property with bisect before
+        # checking the remaining filters, so paging through a large object
+        # does not scan every record on every call.
+        name = sort["propertyName"]
+        keys, ordered = obj.sorted_by(name)
+        low, high = 0, len(keys)
+        filters = groups[0].get("filters", []) if groups else []
+        for search_filter in filters:
+            if search_filter.get("propertyName") != name or search_filter.get("value") is None:
+                continue
+            value = float(search_filter["value"])
+            operator = search_filter["operator"]
+            if operator == "GTE":
+                low = max(low, bisect_left(keys, value))
+            elif operator == "GT":
+                low = max(low, bisect_right(keys, value))
+            elif operator == "LT":
+                high = min(high, bisect_left(keys, value))
+            elif operator == "LTE":
+                high = min(high, bisect_right(keys, value))
+        records = [record for record in ordered[low:high] if self.matches(obj, record, groups)]
+        if sort.get("direction") == "DESCENDING":
+            records.reverse()
+        return records
+
+    def matches(self, obj, record, groups):
+        if not groups:
+            return True
+        return any(all(self.matches_filter(obj, record, f) for f in group.get("filters", [])) for group in groups)
+
+    def matches_filter(self, obj, record, search_filter):
+        value = obj.value(record, search_filter["propertyName"])
+        operator = search_filter["operator"]
+        if operator == "HAS_PROPERTY":
+            return value is not None
+        if operator == "NOT_HAS_PROPERTY":
+            return value is None
+        if value is None:
+            return False
+        target = search_filter.get("value")
+        if isinstance(value, (int, float)):
+            target = float(target) if target is not None else None
+        if operator == "EQ":
+            return value == target
+        if operator == "NEQ":
+            return value != target
+        if operator == "GT":
+            return value > target
+        if operator == "GTE":
+            return value >= target
+        if operator == "LT":
+            return value < target
+        if operator == "LTE":
+            return value <= target
+        if operator == "IN":
+            return str(record["properties"].get(search_filter["propertyName"])) in search_filter.get("values", [])
+        return False
+
+    async def batch_read(self, request):
+        self.stats["batch_read"] += 1
+        obj = self.resolve(request)
+        body = await request.json()
+        found, missing = [], []
+        for item in body.get("inputs", [])[:100]:
+            record = obj.by_id.get(str(item.get("id")))
+            if record is None:
+                missing.append(str(item.get("id")))
+            else:
+                found.append(self.select(record, body.get("properties")))
+        data = {"status": "COMPLETE", "results": found}
+        if missing:
+            data["errors"] = [
+                {"status": "error", "category": "OBJECT_NOT_FOUND", "context": {"ids": missing}}
+            ]
+        return web.json_response(data, status=207 if missing else 200)
+
+    @staticmethod
+    def associated(from_obj, to_obj, object_id):
+        """
+        Every record is associated with one record of each other object, by
+        position; records with an even id carry a "Primary" label as well.
+        """
+        if not to_obj.records or from_obj is to_obj:
+            return []
+        target = to_obj.records[(int(object_id) - 1) % len(to_obj.records)]
+        types = [{"category": "HUBSPOT_DEFINED", "typeId": 1, "label": None}]
+        if int(object_id) % 2 == 0:
+            types.append({"category": "USER_DEFINED", "typeId": 2, "label": "Primary"})
+        return [{"toObjectId": int(target["id"]), "associationTypes": types}]
+
+    def association_objects(self, request):
+        from_obj = self.aliases.get(request.match_info["from_type"].lower())
+        to_obj = self.aliases.get(request.match_info["to_type"].lower())
+        if from_obj is None or to_obj is None:
+            raise web.HTTPNotFound(text='{"status": "error", "category": "OBJECT_NOT_FOUND"}')
+        return from_obj, to_obj
+
+    async def batch_associations(self, request):
+        self.stats["associations"] += 1
+        from_obj, to_obj = self.association_objects(request)
+        body = await request.json()
+        results, missing = [], []
+        for item in body.get("inputs", [])[:1000]:
+            object_id = str(item.get("id"))
+            targets = self.associated(from_obj, to_obj, object_id) if object_id in from_obj.by_id else []
+            if targets:
+                results.append({"from": {"id": object_id}, "to": targets})
+            else:
+                missing.append(object_id)
+        data = {"status": "COMPLETE", "results": results}
+        if missing:
+            data["errors"] = [
+                {"status": "error", "category": "OBJECT_NOT_FOUND", "context": {"fromObjectId": missing}}
+            ]
+        return web.json_response(data, status=207 if missing else 200)
+
+    async def object_associations(self, request):
+        self.stats["associations"] += 1
+        from_obj, to_obj = self.association_objects(request)
+        object_id = request.match_info["object_id"]
+        targets = self.associated(from_obj, to_obj, object_id) if object_id in from_obj.by_id else []
+        return web.json_response({"results": targets})
+
+    def app(self):
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get("/__stats", self.get_stats)
+        app.router.add_get("/crm/v3/schemas", self.get_schemas)
+        app.router.add_get("/crm/v3/objects/{object_type}", self.list_objects)
+        app.router.add_post("/crm/v3/objects/{object_type}/search", self.search_objects)
+        app.router.add_post("/crm/v3/objects/{object_type}/batch/read", self.batch_read)
+        app.router.add_post("/crm/v4/associations/{from_type}/{to_type}/batch/read", self.batch_associations)
+        app.router.add_get(
+            "/crm/v4/objects/{from_type}/{object_id}/associations/{to_type}", self.object_associations
+        )
+        return app
+
+
+class MockServerThread(threading.Thread):
+    """Serve a MockHubSpot on 127.0.0.1 from a background thread (for tests)."""
+
+    def __init__(self, mock, port=0):
+        super().__init__(daemon=True)
+        self.mock = mock
+        self.port = port
+        self.url = None
+        self._ready = threading.Event()
+        self._loop = None
+        self._runner = None
+
+    def run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.mock.app())
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        self._loop.run_until_complete(site.start())
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def __enter__(self):
+        self.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the HubSpot CRM API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--divisions", type=int, default=100)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds.")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Requests allowed per --rate-interval.")
+    parser.add_argument("--rate-interval", type=float, default=10.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hubspot.settings")
+    import django
+
+    django.setup()
+    mock = MockHubSpot(
+        volumes={"jobs": args.jobs, "divisions": args.divisions, "employees": args.employees},
+        seed=args.seed,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        rate_interval=args.rate_interval,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+    )
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
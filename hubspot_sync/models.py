@@ -1,14 +1,26 @@
 from django.db import models
 
+from hubspot_sync.hot import HubSpotDataQuerySet
+from hubspot_sync.indexes import BrinIndex
+
 class HubSpotData(models.Model):
     endpoint = models.CharField(max_length=100)
     record_id = models.CharField(max_length=100)
     data = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Hash of the stored payload, used to skip unchanged records.
+    fingerprint = models.CharField(max_length=32, null=True, blank=True, editable=False)
+    # When the record was found archived or deleted in HubSpot (--reconcile).
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = HubSpotDataQuerySet.as_manager()
 
     class Meta:
         unique_together = ("endpoint", "record_id")
+        # On PostgreSQL ``data`` also has a GIN jsonb_path_ops index
+        # (migration 0011), and the HUBSPOT_HOT_PROPERTIES are indexed
+        # generated columns managed by hubspot_sync.hot.
         verbose_name = "HubSpot Data"
         verbose_name_plural = "HubSpot Data"
 
@@ -20,10 +32,201 @@ class HubSpotSyncHistory(models.Model):
     endpoint = models.CharField(max_length=100, unique=True)
     last_synced_at = models.DateTimeField(null=True, blank=True)
 
+    # Checkpoint of an unfinished run: when it started (the watermark saved
+    # once it completes) and where its last committed page ended. Searches
+    # store that page's last hs_lastmodifieddate and record id, list scans
+    # (null since) the paging cursor, and sharded searches their window and
+    # the unfinished id range of every shard.
+    checkpoint_started_at = models.DateTimeField(null=True, blank=True)
+    checkpoint_since = models.DateTimeField(null=True, blank=True)
+    checkpoint_after = models.TextField(null=True, blank=True)
+
+    # Reconciliation (--reconcile): when archived records were last fetched,
+    # and when all live ids were last compared against the local table.
+    archived_synced_at = models.DateTimeField(null=True, blank=True)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    # Cumulative counters and stage histograms of every run, served by the
+    # Prometheus endpoint (see hubspot_sync.metrics.merge_totals).
+    metrics = models.JSONField(default=dict, blank=True)
+
     def __str__(self):
         return f"{self.endpoint} last synced at {self.last_synced_at}"
 
 
+class SyncRun(models.Model):
+    # One sync_hubspot run of a portal (in --daemon mode, one scheduled
+    # endpoint run). Rows are only ever appended; one left "running" belongs
+    # to a process that was killed.
+    class Status(models.TextChoices):
+        RUNNING = "running"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+        INTERRUPTED = "interrupted"
+
+    portal = models.CharField(max_length=100, default="default")
+    # "incremental", "full" (--full-load) or "daemon".
+    mode = models.CharField(max_length=20)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.RUNNING)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [models.Index(fields=["-started_at"], name="sync_run_started")]
+
+    def __str__(self):
+        return f"{self.portal} {self.mode} run at {self.started_at}"
+
+
+class SyncRunEndpoint(models.Model):
+    # One endpoint of a SyncRun: its watermark (last_synced_at) before and
+    # after, what it fetched and wrote, and where the time went.
+    run = models.ForeignKey(SyncRun, related_name="endpoints", null=True, blank=True, on_delete=models.CASCADE)
+    endpoint = models.CharField(max_length=100)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=SyncRun.Status.choices, default=SyncRun.Status.RUNNING)
+    error = models.TextField(blank=True, default="")
+    duration = models.FloatField(default=0)
+    watermark_before = models.DateTimeField(null=True, blank=True)
+    watermark_after = models.DateTimeField(null=True, blank=True)
+
+    pages = models.IntegerField(default=0)
+    records = models.IntegerField(default=0)
+    bytes = models.BigIntegerField(default=0)
+    api_calls = models.IntegerField(default=0)
+    retries = models.IntegerField(default=0)
+    throttled = models.IntegerField(default=0)
+    inserted = models.IntegerField(default=0)
+    updated = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+
+    # Seconds spent per stage; the full histograms are in "histograms".
+    http_seconds = models.FloatField(default=0)
+    decode_seconds = models.FloatField(default=0)
+    mapping_seconds = models.FloatField(default=0)
+    write_seconds = models.FloatField(default=0)
+    histograms = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # History of one endpoint, newest first.
+            models.Index(fields=["endpoint", "-started_at"], name="sync_run_endpoint_history"),
+            # "Slowest endpoints over the last N days" reads a started_at
+            # range from the index alone.
+            models.Index(fields=["started_at", "endpoint", "duration"], name="sync_run_endpoint_slowest"),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} run at {self.started_at}"
+
+
+class SyncEndpointDay(models.Model):
+    # Totals of an endpoint's runs per day, updated as each run finishes so
+    # the admin can rank endpoints without scanning SyncRunEndpoint.
+    endpoint = models.CharField(max_length=100)
+    day = models.DateField()
+    runs = models.IntegerField(default=0)
+    failures = models.IntegerField(default=0)
+    records = models.BigIntegerField(default=0)
+    api_calls = models.IntegerField(default=0)
+    throttled = models.IntegerField(default=0)
+    duration_total = models.FloatField(default=0)
+    duration_max = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["endpoint", "day"], name="sync_endpoint_day_unique")]
+        indexes = [models.Index(fields=["day", "duration_max"], name="sync_endpoint_day_slowest")]
+
+    @property
+    def duration_avg(self):
+        return self.duration_total / self.runs if self.runs else 0.0
+
+    @property
+    def records_per_second(self):
+        return self.records / self.duration_total if self.duration_total else 0.0
+
+    def __str__(self):
+        return f"{self.endpoint} on {self.day}"
+
+
+class HubSpotObjectSchema(models.Model):
+    # Cached response of /crm/v3/schemas, refreshed after HUBSPOT_SCHEMA_TTL
+    # (conditionally when HubSpot sent an ETag).
+    object_type_id = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=255)
+    fully_qualified_name = models.CharField(max_length=255, blank=True, default="")
+    labels = models.JSONField(default=dict, blank=True)
+    etag = models.CharField(max_length=255, null=True, blank=True)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} ({self.object_type_id})"
+
+
+class HubSpotProperty(models.Model):
+    schema = models.ForeignKey(HubSpotObjectSchema, related_name="properties", on_delete=models.CASCADE)
+    name = models.CharField(max_length=255)
+    type = models.CharField(max_length=50)
+    field_type = models.CharField(max_length=50, blank=True, default="")
+
+    class Meta:
+        unique_together = ("schema", "name")
+        verbose_name_plural = "HubSpot properties"
+
+    def __str__(self):
+        return f"{self.schema.name}.{self.name} ({self.type})"
+
+
+class HubSpotAssociation(models.Model):
+    # One edge per associated pair and label (unlabeled associations have an
+    # empty label), keyed by object type id and HubSpot object id
+    # (hs_object_id), so joins are integer lookups on an index.
+    from_type = models.CharField(max_length=100)
+    from_id = models.BigIntegerField()
+    to_type = models.CharField(max_length=100)
+    to_id = models.BigIntegerField()
+    label = models.CharField(max_length=255, blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["from_type", "from_id", "to_type", "to_id", "label"],
+                name="hubspot_association_unique",
+            ),
+        ]
+        indexes = [models.Index(fields=["to_type", "to_id"], name="hubspot_association_to")]
+
+    def __str__(self):
+        return f"{self.from_type}:{self.from_id} -> {self.to_type}:{self.to_id}"
+
+
+class HubSpotWebhookEvent(models.Model):
+    # Object change received from a HubSpot webhook, waiting for
+    # sync_hubspot --webhooks to fetch the object (processed_at is null).
+    event_id = models.BigIntegerField(unique=True)
+    portal_id = models.BigIntegerField(null=True, blank=True)
+    object_type = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    change = models.CharField(max_length=50)
+    occurred_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["object_type", "id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="hubspot_webhook_pending",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.change} {self.object_type}:{self.object_id}"
+
+
 # -------------------------------------------------------------------
 # Model for the "jobs" endpoint (from your previous mapping)
 # -------------------------------------------------------------------
@@ -140,6 +343,20 @@ class Job(models.Model):
     time_format = models.FloatField(null=True, blank=True)
     user_id = models.FloatField(null=True, blank=True)
 
+    # Hash of the mapped HubSpot values, used to skip unchanged rows.
+    fingerprint = models.CharField(max_length=32, null=True, blank=True, editable=False)
+    # When the record was found archived or deleted in HubSpot (--reconcile).
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            BrinIndex(fields=["hs_lastmodifieddate"], name="job_modified_brin"),
+            models.Index(fields=["hs_object_id"], name="job_hs_object_id"),
+            # Division reports, usually over a contract date range.
+            models.Index(fields=["division_id", "contract_date"], name="job_division_contract"),
+            models.Index(fields=["contract_date"], name="job_contract_date"),
+        ]
+
     def __str__(self):
         return str(self.job_id)
 
@@ -199,6 +416,17 @@ class Division(models.Model):
     region_id = models.BigIntegerField(null=True, blank=True)
     rescission_period_days = models.FloatField(null=True, blank=True)
 
+    # Hash of the mapped HubSpot values, used to skip unchanged rows.
+    fingerprint = models.CharField(max_length=32, null=True, blank=True, editable=False)
+    # When the record was found archived or deleted in HubSpot (--reconcile).
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            BrinIndex(fields=["hs_lastmodifieddate"], name="division_modified_brin"),
+            models.Index(fields=["hs_object_id"], name="division_hs_object_id"),
+        ]
+
     def __str__(self):
         return str(self.id)
 
@@ -207,6 +435,15 @@ class Division(models.Model):
 # New Model for the "employees" endpoint based on your mapping
 # -------------------------------------------------------------------
 
+# Employees still with the company: not archived in HubSpot and not flagged
+# inactive. The partial indexes on Employee use this condition, and
+# PostgreSQL only uses them for queries filtering on it as well, e.g.
+# Employee.objects.filter(ACTIVE_EMPLOYEE, employee_division_id=...).
+ACTIVE_EMPLOYEE = models.Q(archived_at__isnull=True) & (
+    models.Q(is_inactive__isnull=True) | models.Q(is_inactive__in=["", "0", "false"])
+)
+
+
 class Employee(models.Model):
     # Although the mapping’s required property is "firstname",
     # HubSpot records will include a unique record ID (hs_object_id)
@@ -262,5 +499,17 @@ class Employee(models.Model):
     timezone_name = models.CharField(max_length=255, null=True, blank=True)
     user_id = models.CharField(max_length=255, null=True, blank=True)
 
+    # Hash of the mapped HubSpot values, used to skip unchanged rows.
+    fingerprint = models.CharField(max_length=32, null=True, blank=True, editable=False)
+    # When the record was found archived or deleted in HubSpot (--reconcile).
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["employee_division_id"], name="employee_division"),
+            models.Index(fields=["employee_division_id"], condition=ACTIVE_EMPLOYEE, name="employee_active_division"),
+            models.Index(fields=["employee_user_id"], condition=ACTIVE_EMPLOYEE, name="employee_active_user"),
+        ]
+
     def __str__(self):
         return self.firstname
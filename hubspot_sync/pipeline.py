@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+
+class PipelineStats:
+    def __init__(self):
+        self.pages = 0
+        self.records = 0
+        self.batches = 0
+        # Time the producer spent blocked on a full queue (the DB was the
+        # bottleneck) and the writers spent waiting on an empty one (the API was).
+        self.fetch_idle = 0.0
+        self.write_idle = 0.0
+        self.elapsed = 0.0
+
+
+_DONE = object()
+
+
+async def run_pipeline(pages, write, queue_depth=4, writers=1, batch_pages=1, checkpoint=None):
+    """
+    Overlap fetching with persisting: a producer drains the async iterable
+    ``pages`` of ``(records, cursor)`` pairs into a bounded queue while
+    ``writers`` workers pull up to ``batch_pages`` pages at a time and hand
+    their records to the coroutine ``write(records)``. The queue bound keeps
+    at most ``queue_depth`` pages in memory per endpoint.
+
+    With several writers batches can commit out of order, so the optional
+    coroutine ``checkpoint(cursor)`` is only called with the cursor of the
+    last page for which every earlier page has been written as well.
+    """
+    writers = max(1, writers)
+    stats = PipelineStats()
+    queue = asyncio.Queue(maxsize=max(1, queue_depth))
+    started = time.perf_counter()
+    cursors = {}
+    committed = {"next": 0}
+    checkpoint_lock = asyncio.Lock()
+
+    async def produce():
+        seq = 0
+        async for records, cursor in pages:
+            stats.pages += 1
+            waited = time.perf_counter()
+            await queue.put((seq, records, cursor))
+            stats.fetch_idle += time.perf_counter() - waited
+            seq += 1
+        for _ in range(writers):
+            await queue.put(_DONE)
+
+    async def consume():
+        while True:
+            waited = time.perf_counter()
+            page = await queue.get()
+            stats.write_idle += time.perf_counter() - waited
+            if page is _DONE:
+                return
+            batch = [page]
+            done = False
+            for _ in range(batch_pages - 1):
+                try:
+                    page = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if page is _DONE:
+                    done = True
+                    break
+                batch.append(page)
+            records = [record for _, page_records, _ in batch for record in page_records]
+            await write(records)
+            stats.records += len(records)
+            stats.batches += 1
+            await commit(batch)
+            if done:
+                return
+
+    async def commit(batch):
+        async with checkpoint_lock:
+            for seq, _, cursor in batch:
+                cursors[seq] = cursor
+            cursor = _DONE
+            while committed["next"] in cursors:
+                cursor = cursors.pop(committed["next"])
+                committed["next"] += 1
+            if checkpoint and cursor is not _DONE:
+                await checkpoint(cursor)
+
+    tasks = [asyncio.ensure_future(produce())]
+    tasks += [asyncio.ensure_future(consume()) for _ in range(writers)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # A failed writer would otherwise leave the producer blocked on a full
+        # queue forever (and vice versa).
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+async def merge_pages(iterables, buffer=4):
+    """
+    Drain several async page iterables concurrently and yield their items as
+    they arrive. At most ``buffer`` items wait to be consumed; an error in any
+    source cancels the others and is re-raised here.
+    """
+    queue = asyncio.Queue(maxsize=max(1, buffer))
+
+    async def drain(iterable):
+        try:
+            async for item in iterable:
+                await queue.put((True, item))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            await queue.put((False, exc))
+            return
+        await queue.put((True, _DONE))
+
+    tasks = [asyncio.ensure_future(drain(iterable)) for iterable in iterables]
+    running = len(tasks)
+    try:
+        while running:
+            ok, item = await queue.get()
+            if not ok:
+                raise item
+            if item is _DONE:
+                running -= 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,208 @@
+"""
+Profiling of sync_hubspot --profile: cProfile in every thread (the event
+loop and the sync_to_async threads doing the ORM work), wall time of the
+asyncio tasks by coroutine, and the database queries run in each metrics
+stage, summarised as the top hot spots per stage.
+"""
+import asyncio
+import cProfile
+import pstats
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from hubspot_sync.metrics import current_stage
+
+# Stages of the hot spot report, matched in this order against the file
+# (or, for builtins, the name) of each profiled function.
+PROFILE_STAGES = (
+    ("ORM", ("django/db/", "CursorWrapper", "sqlite3", "psycopg")),
+    ("JSON", ("/json/", "orjson")),
+    ("mapping", ("hubspot_sync/mapping.py", "hubspot_sync/writers.py", "hubspot_sync/dynamic.py", "_hashlib")),
+    ("HTTP", ("aiohttp", "/asyncio/", "yarl", "multidict", "selectors", "socket", "ssl", "hubspot_sync/client.py")),
+    # Threads blocked on the network, a queue or a lock.
+    ("waiting", ("select.epoll", "select.poll", "select.kqueue", "_queue.SimpleQueue", "_thread.lock")),
+)
+OTHER_STAGE = "other"
+
+
+def function_stage(function):
+    filename, _, name = function
+    location = (name if filename == "~" else filename).replace("\\", "/")
+    for stage, markers in PROFILE_STAGES:
+        if any(marker in location for marker in markers):
+            return stage
+    return OTHER_STAGE
+
+
+def hot_spots(stats, limit=5):
+    """
+    ``{stage: (self seconds, [(self seconds, calls, function), ...])}`` with
+    the ``limit`` functions of each stage that spent most time themselves.
+    """
+    by_stage = defaultdict(list)
+    for function, (_, calls, self_time, _, _) in stats.stats.items():
+        by_stage[function_stage(function)].append((self_time, calls, function))
+    return {
+        stage: (sum(entry[0] for entry in entries), sorted(entries, reverse=True)[:limit])
+        for stage, entries in by_stage.items()
+    }
+
+
+class TaskTimer:
+    """Task factory recording the wall time of every task by coroutine name."""
+
+    def __init__(self):
+        self.timings = defaultdict(lambda: [0, 0.0, 0.0])
+
+    def install(self, loop):
+        loop.set_task_factory(self.create_task)
+
+    def create_task(self, loop, coro, **kwargs):
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+        started = time.perf_counter()
+        task.add_done_callback(lambda _: self.record(name, time.perf_counter() - started))
+        return task
+
+    def record(self, name, seconds):
+        timing = self.timings[name]
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper counting queries and their time per metrics
+    stage, on every connection opened while it is installed.
+    """
+
+    def __init__(self):
+        self.queries = defaultdict(lambda: [0, 0.0])
+        self._wrapped = []
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                entry = self.queries[current_stage() or OTHER_STAGE]
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def wrap(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+            with self._lock:
+                self._wrapped.append(connection)
+
+    def install(self):
+        for connection in connections.all(initialized_only=True):
+            self.wrap(connection)
+        connection_created.connect(self.wrap, weak=False)
+
+    def uninstall(self):
+        connection_created.disconnect(self.wrap)
+        # Connections are per thread; remove the wrapper from all of them.
+        with self._lock:
+            wrapped, self._wrapped = self._wrapped, []
+        for connection in wrapped:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+class SyncProfiler:
+    """
+    Profile everything run inside ``with SyncProfiler(path):``; threads
+    started meanwhile get their own profiler, and all of them are merged
+    into one pstats file at ``path``. Task timings are added once
+    the event loop runs with start_loop().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.profiles = []
+        self.tasks = TaskTimer()
+        self.queries = QueryCounter()
+        self.elapsed = None
+        self.stats = None
+        # Profile of each thread, by thread id.
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def attach(self, *args):
+        """Profile the calling thread (once) and count its queries."""
+        # Also the threading.setprofile() hook: called by the first event
+        # of every new thread, then replaced by cProfile's own.
+        with self._lock:
+            if threading.get_ident() in self._threads:
+                return
+            profile = self._threads[threading.get_ident()] = cProfile.Profile()
+            self.profiles.append(profile)
+        for connection in connections.all(initialized_only=True):
+            self.queries.wrap(connection)
+        profile.enable()
+
+    def detach(self):
+        """Stop profiling the calling thread."""
+        profile = self._threads.get(threading.get_ident())
+        if profile is not None:
+            profile.disable()
+
+    async def start_loop(self):
+        """Time the running loop's tasks and profile the sync_to_async thread."""
+        self.tasks.install(asyncio.get_running_loop())
+        # The thread may predate the profiler, and outlive it.
+        await sync_to_async(self.attach)()
+
+    async def stop_loop(self):
+        await sync_to_async(self.detach)()
+
+    def __enter__(self):
+        self.queries.install()
+        threading.setprofile(self.attach)
+        self._started = time.perf_counter()
+        self.attach()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+        threading.setprofile(None)
+        self.elapsed = time.perf_counter() - self._started
+        self.queries.uninstall()
+        with self._lock:
+            profiles = list(self.profiles)
+        self.stats = pstats.Stats(*profiles)
+        self.stats.dump_stats(self.path)
+        return False
+
+    def report(self, limit=5):
+        """The lines of a short report of the hot spots of each stage."""
+        lines = [f"Profile of {self.elapsed:.2f}s in {len(self.profiles)} threads written to {self.path}."]
+        stages = hot_spots(self.stats, limit)
+        order = [stage for stage, _ in PROFILE_STAGES] + [OTHER_STAGE]
+        for stage in order:
+            if stage not in stages:
+                continue
+            total, entries = stages[stage]
+            lines.append(f"{stage}: {total:.3f}s own time")
+            for self_time, calls, function in entries:
+                lines.append(f"  {self_time:8.3f}s {calls:9d} calls  {pstats.func_std_string(function)}")
+        if self.queries.queries:
+            lines.append("Database queries by stage:")
+            for stage, (count, seconds) in sorted(self.queries.queries.items(), key=lambda item: -item[1][1]):
+                lines.append(f"  {stage}: {count} queries, {seconds:.3f}s")
+        if self.tasks.timings:
+            lines.append("Slowest asyncio tasks (count, total, max):")
+            timings = sorted(self.tasks.timings.items(), key=lambda item: -item[1][1])[:limit]
+            for name, (count, total, longest) in timings:
+                lines.append(f"  {name}: {count}, {total:.3f}s, {longest:.3f}s")
+        return lines
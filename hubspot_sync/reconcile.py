@@ -0,0 +1,169 @@
+"""
+Finding the records HubSpot no longer has.
+
+Ids are collected into sorted int64 ``array("q")`` buffers: 8 bytes per id
+instead of a Python int plus a set slot, so every live id of an object and
+every local key fit side by side in memory, and the ids missing from HubSpot
+fall out of one merge pass over the two sorted arrays.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from operator import le
+
+from django.db import DEFAULT_DB_ALIAS
+
+from hubspot_sync.mapping import ARCHIVED_FIELD, FINGERPRINT_FIELD, to_int
+from hubspot_sync.models import HubSpotData
+from hubspot_sync.writers import record_properties, resolve_model
+
+# Ids per UPDATE / DELETE statement.
+RECONCILE_CHUNK_SIZE = 1000
+# Ids sorted at a time by sorted_ids(); only these are ever Python ints.
+SORT_RUN_SIZE = 1 << 16
+
+
+def sorted_ids(ids):
+    """
+    ``ids`` (ints) as a sorted int64 array. They are collected into the
+    array first, then sorted in runs of SORT_RUN_SIZE that are merged, so
+    no list of every id is built. Ids that arrive sorted are returned as is.
+    """
+    values = ids if isinstance(ids, array) else array("q", ids)
+    if all(map(le, values, islice(values, 1, None))):
+        return values
+    runs = [
+        array("q", sorted(values[start:start + SORT_RUN_SIZE]))
+        for start in range(0, len(values), SORT_RUN_SIZE)
+    ]
+    return array("q", heapq.merge(*runs))
+
+
+def missing_ids(local, remote):
+    """Yield each id of sorted ``local`` that is not in sorted ``remote``, once."""
+    position, size = 0, len(remote)
+    previous = None
+    for value in local:
+        if value == previous:
+            continue
+        previous = value
+        while position < size and remote[position] < value:
+            position += 1
+        if position == size or remote[position] != value:
+            yield value
+
+
+def contains(ids, value):
+    position = bisect_left(ids, value)
+    return position < len(ids) and ids[position] == value
+
+
+def chunked(values, size=RECONCILE_CHUNK_SIZE):
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Reconciler:
+    """
+    Applies what HubSpot reports as archived or deleted to one endpoint's
+    table: rows are flagged with ``archived_at`` (and lose their fingerprint,
+    so a restored record is written again), or deleted with ``delete=True``.
+
+    Rows are identified by the model's upsert key (``job_id`` for Job,
+    ``hs_object_id`` for Employee and generated tables, the record id for
+    HubSpotData), which is also the only property requested for them.
+    """
+
+    def __init__(self, endpoint, registry=None, using=None, delete=False):
+        self.endpoint = endpoint
+        self.using = using or DEFAULT_DB_ALIAS
+        self.delete = delete
+        self.model, key = resolve_model(endpoint, registry)
+        if self.model is HubSpotData:
+            self.key = "record_id"
+            self.property = "hs_object_id"
+        else:
+            self.key = key
+            self.property = key
+        # The field holding HubSpot's object id, for callers (webhooks) that
+        # only know that id.
+        names = {field.name for field in self.model._meta.concrete_fields}
+        self.object_key = "hs_object_id" if "hs_object_id" in names else self.key
+
+    def queryset(self):
+        queryset = self.model.objects.using(self.using)
+        if self.model is HubSpotData:
+            queryset = queryset.filter(endpoint=self.endpoint)
+        return queryset
+
+    def remote_key(self, record):
+        value = None
+        if self.model is not HubSpotData:
+            value = to_int(record_properties(record).get(self.key))
+        if value is None and self.property == "hs_object_id":
+            value = to_int(record.get("id"))
+        return value
+
+    def local_ids(self, archived=False):
+        """
+        Sorted keys of the rows not flagged yet, of the flagged rows with
+        ``archived=True``, or of all rows with ``archived=None``.
+        """
+        values = self.queryset()
+        if archived is not None:
+            values = values.filter(**{f"{ARCHIVED_FIELD}__isnull": not archived})
+        if self.model is not HubSpotData:
+            # Integer keys come back sorted, which sorted_ids() then keeps.
+            values = values.order_by(self.key)
+        values = values.values_list(self.key, flat=True).iterator(chunk_size=10000)
+        return sorted_ids(key for key in map(to_int, values) if key is not None)
+
+    def lookup(self, ids, key=None):
+        if self.model is HubSpotData:
+            ids = [str(object_id) for object_id in ids]
+        return {f"{key or self.key}__in": ids}
+
+    def archive(self, ids, archived_at, key=None):
+        """
+        Flag (or delete) the rows whose ``key`` (the upsert key by default)
+        is in ``ids``; returns how many were affected.
+        """
+        count = 0
+        for chunk in chunked(ids):
+            queryset = self.queryset().filter(**self.lookup(chunk, key))
+            if self.delete:
+                count += queryset.delete()[0]
+            else:
+                count += queryset.filter(**{f"{ARCHIVED_FIELD}__isnull": True}).update(
+                    **{ARCHIVED_FIELD: archived_at, FINGERPRINT_FIELD: None}
+                )
+        return count
+
+    def restore(self, ids):
+        count = 0
+        for chunk in chunked(ids):
+            count += self.queryset().filter(**self.lookup(chunk)).update(**{ARCHIVED_FIELD: None})
+        return count
+
+    def reconcile(self, remote, archived_at):
+        """
+        Compare the sorted live ids ``remote`` with the local table: rows
+        HubSpot no longer lists are archived, flagged rows it lists again are
+        restored. Returns ``(archived, restored)``.
+        """
+        # Deleting also removes the rows flagged by earlier runs.
+        local = self.local_ids(None if self.delete else False)
+        archived = self.archive(missing_ids(local, remote), archived_at)
+        restored = 0
+        if not self.delete:
+            restored = self.restore(
+                object_id for object_id in self.local_ids(archived=True) if contains(remote, object_id)
+            )
+        return archived, restored
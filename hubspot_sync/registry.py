@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from hubspot_sync.mapping import MappingPlan, get_plan
+from hubspot_sync.models import Division, Employee, HubSpotData, Job
+
+# -------------------------------------------------------------------
+# Models with a declared table, and the names their object is known by.
+# Object type ids and fully qualified names are portal specific; other
+# portals are matched by name or label through schema discovery.
+# -------------------------------------------------------------------
+
+DECLARED_ENDPOINTS = [
+    (("jobs", "p47947320_jobs", "2-37778614"), Job),
+    (("divisions", "p47947320_divisions", "2-37778609"), Division),
+    (("employees", "p47947320_employees", "2-38071071"), Employee),
+]
+
+
+def schema_aliases(schema):
+    """Every name an endpoint of ``schema`` can be given as, lower-cased."""
+    labels = schema.labels or {}
+    names = (
+        schema.object_type_id,
+        schema.fully_qualified_name,
+        schema.name,
+        labels.get("singular"),
+        labels.get("plural"),
+    )
+    return tuple(dict.fromkeys(name.lower() for name in names if name))
+
+
+class EndpointRegistry:
+    """
+    Where one portal's objects are stored: a dict from every alias of an
+    object (type id, fully qualified name, name, labels) to its model, plus
+    the mapping plan built from that portal's property definitions. Anything
+    not registered resolves to HubSpotData.
+    """
+
+    def __init__(self, entries=DECLARED_ENDPOINTS):
+        self.models = {}
+        self.plans = {}
+        # Alias -> object type id of every object seen in the schemas.
+        self.type_ids = {}
+        for aliases, model in entries:
+            self.register(aliases, model)
+
+    def register(self, aliases, model, plan=None):
+        for alias in aliases:
+            self.models[alias.lower()] = model
+        if plan is not None:
+            self.plans[model] = plan
+
+    def resolve(self, endpoint):
+        return self.models.get(endpoint.lower(), HubSpotData)
+
+    def plan(self, model):
+        return self.plans.get(model) or get_plan(model)
+
+    def object_type(self, endpoint):
+        """The object type id ``endpoint`` is an alias of, or ``endpoint`` itself if unknown."""
+        return self.type_ids.get(endpoint.lower(), endpoint)
+
+    def learn(self, schemas):
+        """
+        Record the object type id of every discovered object's aliases,
+        register the aliases of those that match a known model by any of
+        their names, and rebuild that model's plan with the object's
+        property definitions.
+        """
+        for schema in schemas:
+            aliases = schema_aliases(schema)
+            self.type_ids.update(dict.fromkeys(aliases, schema.object_type_id))
+            model = next((self.models[alias] for alias in aliases if alias in self.models), None)
+            if model is None:
+                continue
+            definitions = {prop.name: (prop.type, prop.field_type) for prop in schema.properties.all()}
+            self.register(aliases, model, MappingPlan(model, get_plan(model).key, definitions))
+
+
+default_registry = EndpointRegistry()
+
+
+class Portal:
+    """
+    A HubSpot account synced with its own token, database and endpoint
+    registry. ``portal_id`` (the HubSpot account id) routes its webhook events.
+    """
+
+    def __init__(self, name, token, database=DEFAULT_DB_ALIAS, base_url=None, portal_id=None):
+        self.name = name
+        self.token = token
+        self.database = database
+        self.base_url = base_url
+        self.portal_id = portal_id
+        self.registry = EndpointRegistry()
+
+    def __repr__(self):
+        return f"<Portal {self.name}>"
+
+
+def configured_portals():
+    """
+    The portals from HUBSPOT_PORTALS, or a single "default" portal using
+    HUBSPOT_API_TOKEN when none are configured.
+    """
+    portals = getattr(settings, "HUBSPOT_PORTALS", None) or {}
+    if not portals:
+        return {"default": Portal("default", getattr(settings, "HUBSPOT_API_TOKEN", None))}
+    return {
+        name: Portal(
+            name,
+            config.get("token"),
+            config.get("database") or DEFAULT_DB_ALIAS,
+            config.get("base_url"),
+            config.get("portal_id"),
+        )
+        for name, config in portals.items()
+    }
@@ -0,0 +1,71 @@
+import heapq
+import itertools
+import time
+
+from django.conf import settings
+
+DEFAULT_SCHEDULE = {"interval": 3600, "priority": 10}
+
+
+def schedule_for(name, registry=None):
+    """
+    ``(interval, priority)`` of ``name`` from HUBSPOT_SCHEDULES, whose keys
+    may be any alias of the endpoint, falling back to
+    HUBSPOT_DEFAULT_SCHEDULE.
+    """
+    schedules = getattr(settings, "HUBSPOT_SCHEDULES", None) or {}
+    entry = schedules.get(name)
+    if entry is None and registry is not None:
+        object_type = registry.object_type(name)
+        entry = next(
+            (value for key, value in schedules.items() if registry.object_type(key) == object_type),
+            None,
+        )
+    if entry is None:
+        entry = getattr(settings, "HUBSPOT_DEFAULT_SCHEDULE", None) or DEFAULT_SCHEDULE
+    if not isinstance(entry, dict):
+        # A bare number is an interval.
+        entry = {"interval": entry}
+    interval = entry.get("interval", DEFAULT_SCHEDULE["interval"])
+    return float(interval), entry.get("priority", DEFAULT_SCHEDULE["priority"])
+
+
+class Scheduler:
+    """
+    Priority queue of timed jobs for sync_hubspot --daemon, ordered by due
+    time and, among jobs due together, by priority (lower first). A job is
+    taken off the queue while it runs and put back by reschedule(), so the
+    same endpoint never runs twice at once.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.jobs = {}
+        self._heap = []
+        self._order = itertools.count()
+
+    def add(self, name, interval, priority=0, due=None):
+        self.jobs[name] = (interval, priority)
+        self._push(name, self.clock() if due is None else due)
+
+    def _push(self, name, due):
+        _, priority = self.jobs[name]
+        heapq.heappush(self._heap, (due, priority, next(self._order), name))
+
+    def reschedule(self, name):
+        interval, _ = self.jobs[name]
+        self._push(name, self.clock() + interval)
+
+    def pop_due(self):
+        """Remove and return the jobs that are due, highest priority first."""
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        return [name for _, _, _, name in sorted(due, key=lambda job: (job[1], job[0], job[2]))]
+
+    def next_in(self):
+        """Seconds until the next job is due (None when nothing is queued)."""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from hubspot_sync.client import HubSpotError
+from hubspot_sync.models import HubSpotObjectSchema, HubSpotProperty
+
+SCHEMAS_PATH = "/crm/v3/schemas"
+
+
+def schema_ttl():
+    return timedelta(seconds=getattr(settings, "HUBSPOT_SCHEMA_TTL", 24 * 60 * 60))
+
+
+def cached_schemas(using=DEFAULT_DB_ALIAS):
+    schemas = HubSpotObjectSchema.objects.using(using).prefetch_related("properties")
+    return list(schemas.order_by("object_type_id"))
+
+
+def is_fresh(schemas, now=None):
+    if not schemas:
+        return False
+    now = now or timezone.now()
+    return min(schema.fetched_at for schema in schemas) + schema_ttl() > now
+
+
+def store_schemas(results, etag, fetched_at, using=DEFAULT_DB_ALIAS):
+    """Replace the cache with the ``results`` of a /crm/v3/schemas response."""
+    with transaction.atomic(using=using):
+        seen = []
+        for result in results:
+            object_type_id = result.get("objectTypeId")
+            if not object_type_id:
+                continue
+            schema, _ = HubSpotObjectSchema.objects.using(using).update_or_create(
+                object_type_id=object_type_id,
+                defaults={
+                    "name": result.get("name") or object_type_id,
+                    "fully_qualified_name": result.get("fullyQualifiedName") or "",
+                    "labels": result.get("labels") or {},
+                    "etag": etag,
+                    "fetched_at": fetched_at,
+                },
+            )
+            properties = {
+                prop["name"]: HubSpotProperty(
+                    schema=schema,
+                    name=prop["name"],
+                    type=prop.get("type") or "string",
+                    field_type=prop.get("fieldType") or "",
+                )
+                for prop in result.get("properties", [])
+                if prop.get("name")
+            }
+            HubSpotProperty.objects.using(using).filter(schema=schema).delete()
+            HubSpotProperty.objects.using(using).bulk_create(properties.values())
+            seen.append(object_type_id)
+        HubSpotObjectSchema.objects.using(using).exclude(object_type_id__in=seen).delete()
+    return cached_schemas(using)
+
+
+def touch_schemas(fetched_at, using=DEFAULT_DB_ALIAS):
+    HubSpotObjectSchema.objects.using(using).update(fetched_at=fetched_at)
+    return cached_schemas(using)
+
+
+async def load_schemas(client, force=False, using=DEFAULT_DB_ALIAS):
+    """
+    Return the cached object schemas, asking HubSpot again only once they are
+    older than HUBSPOT_SCHEMA_TTL (or ``force`` is set). The refresh sends the
+    stored ETag, so an unchanged set costs a 304 and no rewrite. If HubSpot
+    cannot be reached, stale cached schemas are returned rather than nothing.
+    Each portal keeps its cache in its own ``using`` database.
+    """
+    schemas = await sync_to_async(cached_schemas)(using)
+    now = timezone.now()
+    if not force and is_fresh(schemas, now):
+        return schemas
+    etag = schemas[0].etag if schemas else None
+    status, data, etag = await client.conditional_get(SCHEMAS_PATH, etag)
+    if status == 304:
+        return await sync_to_async(touch_schemas)(now, using)
+    if status != 200:
+        if schemas:
+            return schemas
+        raise HubSpotError(f"Failed to fetch object schemas. Status: {status}", status)
+    return await sync_to_async(store_schemas)(data.get("results", []), etag, now, using)
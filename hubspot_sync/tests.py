@@ -1,3 +1,922 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import signal
+import tempfile
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from hubspot_sync.client import HubSpotClient, HubSpotError, RateLimiter, RetryPolicy
+from hubspot_sync.dynamic import register_dynamic_models
+from hubspot_sync.hot import ensure_hot_columns
+from hubspot_sync.indexes import BrinIndex
+from hubspot_sync.mapping import (
+    MappingPlan,
+    char_converter,
+    property_converter,
+    to_date,
+    to_datetime,
+    to_float,
+    to_int,
+)
+from hubspot_sync.metrics import SyncMetrics, collecting, render
+from hubspot_sync.mock_server import MockHubSpot, MockServerThread, synthetic_records
+from hubspot_sync.models import (
+    Division,
+    Employee,
+    HubSpotAssociation,
+    HubSpotData,
+    HubSpotSyncHistory,
+    HubSpotWebhookEvent,
+    Job,
+    SyncEndpointDay,
+    SyncRun,
+    SyncRunEndpoint,
+)
+from hubspot_sync.pipeline import run_pipeline
+from hubspot_sync.reconcile import missing_ids, sorted_ids
+from hubspot_sync.registry import EndpointRegistry, configured_portals
+from hubspot_sync.scheduler import Scheduler
+from hubspot_sync.schemas import load_schemas, store_schemas
+from hubspot_sync.webhooks import pending_changes
+from hubspot_sync.writers import BulkWriter, CopyLoader, requested_properties
+
+
+class FakeRateLimitedServer:
+    """
+    Local stand-in for the HubSpot API that enforces a request limit per
+    rolling window, reports it with HubSpot's rate-limit headers and answers
+    429 when it is exceeded.
+    """
+
+    def __init__(self, limit, interval_ms, throttle_first=0, retry_after=None, fail_first=0, truncate_first=0):
+        self.limit = limit
+        self.fail_first = fail_first
+        self.truncate_first = truncate_first
+        self.interval = interval_ms / 1000
+        self.throttle_first = throttle_first
+        self.retry_after = retry_after
+        self.arrivals = deque()
+        self.ok = 0
+        self.throttled = 0
+
+    def headers(self, remaining):
+        return {
+            "X-HubSpot-RateLimit-Max": str(self.limit),
+            "X-HubSpot-RateLimit-Interval-Milliseconds": str(int(self.interval * 1000)),
+            "X-HubSpot-RateLimit-Remaining": str(max(0, remaining)),
+        }
+
+    async def handle(self, request):
+        if self.fail_first:
+            self.fail_first -= 1
+            return web.json_response({"status": "error"}, status=503)
+        if self.truncate_first:
+            self.truncate_first -= 1
+            return web.Response(body=b'{"results": [', content_type="application/json")
+        now = time.monotonic()
+        while self.arrivals and self.arrivals[0] <= now - self.interval:
+            self.arrivals.popleft()
+        if self.throttle_first or len(self.arrivals) >= self.limit:
+            self.throttle_first = max(0, self.throttle_first - 1)
+            self.throttled += 1
+            headers = self.headers(0)
+            if self.retry_after is not None:
+                headers["Retry-After"] = str(self.retry_after)
+            return web.json_response({"status": "error"}, status=429, headers=headers)
+        self.arrivals.append(now)
+        self.ok += 1
+        return web.json_response(
+            {"results": []}, headers=self.headers(self.limit - len(self.arrivals))
+        )
+
+    def app(self):
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        return app
+
+
+class FakeServerTestCase(SimpleTestCase):
+    async def request_many(self, fake, count, limiter=None, retry=None, path="/crm/v3/objects/2-37778614"):
+        server = TestServer(fake.app())
+        await server.start_server()
+        try:
+            async with aiohttp.ClientSession() as session:
+                client = HubSpotClient(
+                    session,
+                    "token",
+                    limiter=limiter,
+                    base_url=str(server.make_url("")),
+                    retry=retry,
+                )
+                started = time.monotonic()
+                statuses = await asyncio.gather(*(client.get(path) for _ in range(count)))
+                return [status for status, _ in statuses], time.monotonic() - started
+        finally:
+            await server.close()
+
+
+class RateLimiterTests(FakeServerTestCase):
+    async def test_concurrent_requests_stay_under_the_server_limit(self):
+        fake = FakeRateLimitedServer(limit=10, interval_ms=500)
+        statuses, elapsed = await self.request_many(fake, 35, RateLimiter(10, 0.5))
+        self.assertEqual(statuses, [200] * 35)
+        self.assertEqual(fake.throttled, 0)
+        # 35 calls at 10 per 0.5s need at least three more windows after the first.
+        self.assertGreaterEqual(elapsed, 1.5)
+
+    async def test_limits_are_learned_from_response_headers(self):
+        fake = FakeRateLimitedServer(limit=5, interval_ms=500)
+        limiter = RateLimiter(100, 10)
+        statuses, _ = await self.request_many(fake, 20, limiter)
+        self.assertEqual(statuses, [200] * 20)
+        self.assertEqual((limiter.max_requests, limiter.interval), (5, 0.5))
+        # Nothing is sent past the first request until its headers arrive.
+        self.assertEqual(fake.throttled, 0)
+
+    async def test_search_runs_at_its_fixed_rate(self):
+        # Search answers carry no limits of their own to calibrate on.
+        fake = FakeRateLimitedServer(limit=4, interval_ms=1000)
+        statuses, elapsed = await self.request_many(fake, 12, path="/crm/v3/objects/2-37778614/search")
+        self.assertEqual(statuses, [200] * 12)
+        self.assertEqual(fake.throttled, 0)
+        # Three windows of 4 requests per second, not one request per second.
+        self.assertGreaterEqual(elapsed, 2.0)
+        self.assertLess(elapsed, 3.5)
+
+    async def test_429_waits_for_retry_after_and_retries(self):
+        fake = FakeRateLimitedServer(limit=10, interval_ms=1000, throttle_first=1, retry_after=1)
+        limiter = RateLimiter(10, 1.0)
+        statuses, elapsed = await self.request_many(fake, 1, limiter)
+        self.assertEqual(statuses, [200])
+        self.assertEqual(limiter.throttled, 1)
+        self.assertGreaterEqual(elapsed, 1.0)
+
+
+class RetryPolicyTests(FakeServerTestCase):
+    async def test_server_errors_are_retried_with_backoff(self):
+        fake = FakeRateLimitedServer(limit=10, interval_ms=1000, fail_first=2)
+        retry = RetryPolicy(attempts=3, backoff=0.01)
+        statuses, _ = await self.request_many(fake, 1, RateLimiter(10, 1.0), retry)
+        self.assertEqual(statuses, [200])
+
+    async def test_gives_up_after_the_configured_attempts(self):
+        fake = FakeRateLimitedServer(limit=10, interval_ms=1000, fail_first=3)
+        retry = RetryPolicy(attempts=3, backoff=0.01)
+        statuses, _ = await self.request_many(fake, 1, RateLimiter(10, 1.0), retry)
+        self.assertEqual(statuses, [503])
+
+    async def test_truncated_bodies_are_retried(self):
+        fake = FakeRateLimitedServer(limit=10, interval_ms=1000, truncate_first=2)
+        retry = RetryPolicy(attempts=3, backoff=0.01)
+        statuses, _ = await self.request_many(fake, 1, RateLimiter(10, 1.0), retry)
+        self.assertEqual(statuses, [200])
+
+    async def test_a_body_that_stays_invalid_raises_hubspot_error(self):
+        fake = FakeRateLimitedServer(limit=10, interval_ms=1000, truncate_first=3)
+        retry = RetryPolicy(attempts=3, backoff=0.01)
+        with self.assertRaisesMessage(HubSpotError, "Invalid JSON from /crm/v3/objects/2-37778614"):
+            await self.request_many(fake, 1, RateLimiter(10, 1.0), retry)
+
+    async def test_statuses_outside_the_policy_are_not_retried(self):
+        fake = FakeRateLimitedServer(limit=10, interval_ms=1000, fail_first=1)
+        retry = RetryPolicy(attempts=3, backoff=0.01, statuses=(429,))
+        statuses, _ = await self.request_many(fake, 1, RateLimiter(10, 1.0), retry)
+        self.assertEqual(statuses, [503])
+
+
+async def numbered_pages(count, produced=None, fail_at=None):
+    """Pages ``[seq]`` with cursor ``seq``, optionally failing before page ``fail_at``."""
+    for seq in range(count):
+        if seq == fail_at:
+            raise HubSpotError("page failed", 503)
+        if produced is not None:
+            produced.append(seq)
+        yield [seq], seq
+
+
+class PipelineTests(SimpleTestCase):
+    async def test_checkpoints_follow_page_order_when_writes_finish_out_of_order(self):
+        written, checkpoints = [], []
+
+        async def write(records):
+            # Every third page is slow, so the pages after it finish first.
+            await asyncio.sleep(0.03 if records[0] % 3 == 0 else 0)
+            written.extend(records)
+
+        async def checkpoint(cursor):
+            self.assertTrue(set(range(cursor + 1)) <= set(written))
+            checkpoints.append(cursor)
+
+        stats = await run_pipeline(numbered_pages(12), write, writers=3, checkpoint=checkpoint)
+        self.assertNotEqual(written, sorted(written))
+        self.assertEqual(sorted(written), list(range(12)))
+        self.assertEqual(checkpoints, sorted(checkpoints))
+        self.assertEqual(checkpoints[-1], 11)
+        self.assertEqual((stats.pages, stats.records, stats.batches), (12, 12, 12))
+
+    async def test_the_queue_bounds_how_far_fetching_runs_ahead(self):
+        produced, written, ahead = [], [], []
+
+        async def write(records):
+            ahead.append(len(produced) - len(written))
+            await asyncio.sleep(0.005)
+            written.extend(records)
+
+        stats = await run_pipeline(numbered_pages(20, produced), write, queue_depth=2)
+        # The queue, the page being written and the one waiting to be queued.
+        self.assertLessEqual(max(ahead), 2 + 2)
+        self.assertGreater(stats.fetch_idle, 0)
+        self.assertEqual(written, list(range(20)))
+
+    async def test_a_failed_write_stops_the_pipeline_before_its_page_is_checkpointed(self):
+        checkpoints = []
+
+        async def write(records):
+            if records[0] == 4:
+                await asyncio.sleep(0.02)
+                raise RuntimeError("write failed")
+
+        async def checkpoint(cursor):
+            checkpoints.append(cursor)
+
+        with self.assertRaisesMessage(RuntimeError, "write failed"):
+            await asyncio.wait_for(
+                run_pipeline(numbered_pages(50), write, writers=2, checkpoint=checkpoint), timeout=5
+            )
+        # Later pages may have been written, but never past the failed one.
+        self.assertTrue(checkpoints)
+        self.assertLess(max(checkpoints), 4)
+
+    async def test_fetch_errors_propagate_after_the_pages_before_them(self):
+        written, checkpoints = [], []
+
+        async def write(records):
+            written.extend(records)
+
+        async def checkpoint(cursor):
+            checkpoints.append(cursor)
+
+        with self.assertRaises(HubSpotError):
+            await asyncio.wait_for(
+                run_pipeline(numbered_pages(10, fail_at=5), write, writers=2, checkpoint=checkpoint), timeout=5
+            )
+        self.assertLessEqual(set(written), set(range(5)))
+        self.assertLessEqual(max(checkpoints, default=-1), 4)
+
+
+class FingerprintTests(TestCase):
+    def test_unchanged_records_are_skipped(self):
+        records = synthetic_records(Job, "job_id", 5)
+        self.assertEqual(BulkWriter("jobs").write(records), 5)
+        records[0]["properties"]["contract_number"] = "renamed"
+        writer = BulkWriter("jobs")
+        self.assertEqual(writer.write(records), 1)
+        self.assertEqual(writer.skipped, 4)
+        self.assertEqual(Job.objects.get(job_id=records[0]["id"]).contract_number, "renamed")
+
+    def test_row_fingerprints_change_with_the_property_types(self):
+        properties = synthetic_records(Division, "id", 1)[0]["properties"]
+        plan = MappingPlan(Division, "id")
+        self.assertEqual(plan.convert(properties), MappingPlan(Division, "id").convert(properties))
+        retyped = MappingPlan(Division, "id", {"is_inactive": ("bool", "booleancheckbox")})
+        self.assertNotEqual(
+            plan.convert(properties)["fingerprint"], retyped.convert(properties)["fingerprint"]
+        )
+
+    def test_unchanged_payloads_are_skipped(self):
+        records = [{"id": "1", "properties": {"name": "a"}}, {"id": "2", "properties": {"name": "b"}}]
+        BulkWriter("tickets").write(records)
+        records[1]["properties"]["name"] = "c"
+        writer = BulkWriter("tickets")
+        self.assertEqual(writer.write(records), 1)
+        self.assertEqual(writer.skipped, 1)
+        self.assertEqual(HubSpotData.objects.get(record_id="2").data["properties"]["name"], "c")
+
+
+class CopyEncodeTests(SimpleTestCase):
+    def encode(self, name, value):
+        loader = CopyLoader("jobs")
+        return loader.encode(Job._meta.get_field(name), Job(**{name: value}))
+
+    def test_nulls_and_control_characters(self):
+        self.assertEqual(self.encode("prep_status_notes", None), "\\N")
+        self.assertEqual(self.encode("prep_status_notes", "a\tb\nc\rd\\e"), "a\\tb\\nc\\rd\\\\e")
+        # A literal backslash-N is text, not NULL.
+        self.assertEqual(self.encode("prep_status_notes", "\\N"), "\\\\N")
+
+    def test_booleans(self):
+        for value, encoded in ((True, "t"), (False, "f"), ("true", "t"), ("false", "f"), ("", "\\N"), (None, "\\N")):
+            with self.subTest(value=value):
+                self.assertEqual(self.encode("hs_read_only", value), encoded)
+
+    def test_json_is_dumped_and_escaped(self):
+        self.assertEqual(self.encode("hs_all_owner_ids", ["1", "a\\b"]), '["1", "a\\\\\\\\b"]')
+
+
+class SchemaCacheTests(TestCase):
+    async def load(self, server, **kwargs):
+        async with aiohttp.ClientSession() as session:
+            client = HubSpotClient(session, "token", base_url=server.url)
+            schemas = await load_schemas(client, **kwargs)
+            return schemas, client.requests
+
+    async def test_cached_schemas_are_reused_until_the_ttl_expires(self):
+        mock = MockHubSpot()
+        with MockServerThread(mock) as server:
+            schemas, requests = await self.load(server)
+            self.assertEqual([schema.name for schema in schemas], ["divisions", "jobs", "employees"])
+            self.assertEqual(requests, 1)
+            _, requests = await self.load(server)
+            self.assertEqual(requests, 0)
+            with override_settings(HUBSPOT_SCHEMA_TTL=0):
+                schemas, requests = await self.load(server)
+            self.assertEqual(requests, 1)
+            self.assertEqual(mock.stats["schemas_not_modified"], 1)
+        jobs = next(schema for schema in schemas if schema.name == "jobs")
+        self.assertIn("job_id", {prop.name for prop in jobs.properties.all()})
+
+    def test_checkbox_into_numeric_column(self):
+        convert = property_converter(Division._meta.get_field("is_inactive"), ("bool", "booleancheckbox"))
+        self.assertEqual([convert("true"), convert("false"), convert("")], [1.0, 0.0, None])
+
+
+class ConverterTests(SimpleTestCase):
+    def test_datetimes_from_iso_strings_and_epoch_milliseconds(self):
+        expected = datetime(2024, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(to_datetime("2024-05-01T10:00:00Z"), expected)
+        self.assertEqual(to_datetime("2024-05-01T10:00:00.000+00:00"), expected)
+        self.assertEqual(to_datetime(str(int(expected.timestamp() * 1000))), expected)
+        self.assertEqual(to_datetime("2024-05-01T10:00:00"), expected)
+        self.assertEqual(to_date("2024-05-01"), expected.date())
+        self.assertEqual(to_date("1714557600000"), expected.date())
+
+    def test_numbers_from_integer_and_decimal_strings(self):
+        self.assertEqual(to_int("42"), 42)
+        self.assertEqual(to_int("12.0"), 12)
+        self.assertEqual(to_int("1.2E+3"), 1200)
+        self.assertEqual(to_float("1999.50"), 1999.5)
+        self.assertEqual(to_float("-0.25"), -0.25)
+
+    def test_enumerations(self):
+        checkbox = property_converter(Job._meta.get_field("hs_all_owner_ids"), ("enumeration", "checkbox"))
+        self.assertEqual(checkbox("1;2;3"), ["1", "2", "3"])
+        # A single choice that looks like JSON is still a list of values.
+        self.assertEqual(checkbox("[1]"), ["[1]"])
+        select = property_converter(Job._meta.get_field("prep_status_notes"), ("enumeration", "select"))
+        self.assertEqual(select("won"), "won")
+
+    def test_invalid_values_become_null(self):
+        for converter in (to_int, to_float, to_datetime, to_date):
+            for value in ("", None, "n/a", "2024-13-45", "12abc"):
+                with self.subTest(converter=converter.__name__, value=value):
+                    self.assertIsNone(converter(value))
+
+    def test_truncated_values_are_counted(self):
+        convert = char_converter(5)
+        with collecting(SyncMetrics("employees")) as measured:
+            self.assertEqual(convert("abcdefgh"), "abcde")
+            self.assertEqual(convert("abc"), "abc")
+        self.assertEqual(measured.counters["truncated"], 1)
+        self.assertIn("1 values truncated", measured.finish().summary())
+
+
+class PrometheusTests(SimpleTestCase):
+    def test_label_values_are_escaped(self):
+        body = render([({"portal": 'a\\b"c', "endpoint": "line\nbreak"}, {"counters": {"records": 3}})])
+        self.assertIn('hubspot_sync_records_total{portal="a\\\\b\\"c",endpoint="line\\nbreak"} 3', body)
+        self.assertEqual(body.count("\n"), len(body.splitlines()))
+
+
+class EndpointRegistryTests(TestCase):
+    def test_other_portals_are_matched_by_name_or_label(self):
+        registry = EndpointRegistry()
+        self.assertIs(registry.resolve("2-111"), HubSpotData)
+        schemas = store_schemas(
+            [
+                {
+                    "objectTypeId": "2-111",
+                    "fullyQualifiedName": "p9_jobs",
+                    "name": "jobs",
+                    "labels": {"singular": "Job", "plural": "Jobs"},
+                    "properties": [{"name": "job_id", "type": "number"}, {"name": "contract_number"}],
+                },
+                {
+                    "objectTypeId": "2-222",
+                    "name": "crew_members",
+                    "labels": {"singular": "Employee", "plural": "Employees"},
+                    "properties": [],
+                },
+            ],
+            None,
+            timezone.now(),
+        )
+        registry.learn(schemas)
+        self.assertIs(registry.resolve("2-111"), Job)
+        self.assertIs(registry.resolve("P9_JOBS"), Job)
+        self.assertIs(registry.resolve("2-222"), Employee)
+        self.assertEqual(requested_properties("2-111", registry)[:2], ["job_id", "accrued_commission_payout"])
+        # The default registry is not touched by another portal's schemas.
+        self.assertIs(BulkWriter("2-111").model, HubSpotData)
+
+    @override_settings(
+        HUBSPOT_PORTALS={
+            "production": {"token": "a"},
+            "sandbox": {"token": "b", "database": "sandbox", "base_url": "http://localhost"},
+        }
+    )
+    def test_configured_portals_have_separate_registries(self):
+        portals = configured_portals()
+        self.assertEqual(list(portals), ["production", "sandbox"])
+        self.assertEqual(portals["production"].database, "default")
+        self.assertEqual(portals["sandbox"].base_url, "http://localhost")
+        self.assertIsNot(portals["production"].registry, portals["sandbox"].registry)
+
+
+class IndexTests(TestCase):
+    def postgresql_sql(self, model, index):
+        # The SQL is only generated, so no PostgreSQL server is needed.
+        from django.db.backends.postgresql.base import DatabaseWrapper
+
+        settings_dict = {**connection.settings_dict, "ENGINE": "django.db.backends.postgresql", "OPTIONS": {}}
+        editor = DatabaseWrapper(settings_dict, alias="postgresql").schema_editor(collect_sql=True)
+        return str(index.create_sql(model, editor))
+
+    def test_brin_indexes_use_brin_on_postgresql_only(self):
+        index = BrinIndex(fields=["hs_lastmodifieddate"], name="job_modified_brin")
+        self.assertEqual(
+            self.postgresql_sql(Job, index),
+            'CREATE INDEX "job_modified_brin" ON "hubspot_sync_job" USING brin ("hs_lastmodifieddate")',
+        )
+        ranged = BrinIndex(fields=["hs_lastmodifieddate"], name="job_modified_brin", pages_per_range=32)
+        self.assertTrue(self.postgresql_sql(Job, ranged).endswith(" WITH (pages_per_range = 32)"))
+        self.assertEqual(ranged.deconstruct()[2]["pages_per_range"], 32)
+        self.assertEqual(
+            str(index.create_sql(Job, connection.schema_editor(collect_sql=True))),
+            'CREATE INDEX "job_modified_brin" ON "hubspot_sync_job" ("hs_lastmodifieddate")',
+        )
+        with self.assertRaises(ValueError):
+            BrinIndex(fields=["hs_lastmodifieddate"], name="job_modified_brin", pages_per_range=0)
+
+    def test_active_employee_indexes_are_partial(self):
+        index = next(index for index in Employee._meta.indexes if index.name == "employee_active_division")
+        self.assertTrue(
+            self.postgresql_sql(Employee, index).endswith(
+                'WHERE ("archived_at" IS NULL AND ("is_inactive" IS NULL OR "is_inactive" IN (\'\', \'0\', \'false\')))'
+            )
+        )
+
+    def test_migrations_create_the_model_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Job, Division, Employee):
+                constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+                for index in model._meta.indexes:
+                    self.assertIn(index.name, constraints)
+                    columns = [model._meta.get_field(name.lstrip("-")).column for name in index.fields]
+                    self.assertEqual(constraints[index.name]["columns"], columns)
+
+
+class DynamicTableTests(TransactionTestCase):
+    schema = {
+        "objectTypeId": "2-999",
+        "fullyQualifiedName": "p1_cars",
+        "name": "cars",
+        "properties": [
+            {"name": "hs_object_id", "type": "number", "fieldType": "number"},
+            {"name": "make", "type": "string", "fieldType": "text"},
+            {"name": "price", "type": "number", "fieldType": "number"},
+            {"name": "sold_at", "type": "datetime", "fieldType": "date"},
+            {"name": "extras", "type": "enumeration", "fieldType": "checkbox"},
+            {"name": "delete", "type": "string", "fieldType": "text"},
+        ],
+    }
+
+    def setUp(self):
+        self.registry = EndpointRegistry()
+
+    def tearDown(self):
+        with connection.schema_editor() as editor:
+            editor.execute("DROP TABLE IF EXISTS hubspot_object_cars")
+
+    def test_unmapped_objects_get_a_typed_table(self):
+        schemas = store_schemas([self.schema], None, timezone.now())
+        [(model, added)] = register_dynamic_models(schemas, self.registry)
+        self.assertEqual(model._meta.db_table, "hubspot_object_cars")
+        self.assertEqual(added, 7)
+        self.assertEqual(model.skipped_properties, ["delete"])
+        self.assertIs(self.registry.resolve("p1_cars"), model)
+
+        record = {
+            "id": "7",
+            "properties": {"make": "VW", "price": "1999.5", "sold_at": "2024-05-01T10:00:00Z", "extras": "a;b"},
+        }
+        self.assertEqual(BulkWriter("2-999", self.registry).write([record]), 1)
+        car = model.objects.get(hs_object_id=7)
+        self.assertEqual((car.make, car.price, car.sold_at.year, car.extras), ("VW", 1999.5, 2024, ["a", "b"]))
+
+    def test_new_properties_add_columns(self):
+        register_dynamic_models(store_schemas([self.schema], None, timezone.now()), self.registry)
+        schema = dict(self.schema, properties=self.schema["properties"] + [{"name": "vin", "type": "string"}])
+        [(model, added)] = register_dynamic_models(store_schemas([schema], None, timezone.now()), self.registry)
+        self.assertEqual(added, 1)
+        self.assertEqual(BulkWriter("cars", self.registry).write([{"id": "1", "properties": {"vin": "X1"}}]), 1)
+        self.assertEqual(model.objects.get().vin, "X1")
+
+
+class HotPropertyTests(TransactionTestCase):
+    hot = {"2-123": {"dealstage": "text", "amount": "numeric"}}
+
+    def tearDown(self):
+        with override_settings(HUBSPOT_HOT_PROPERTIES={}):
+            ensure_hot_columns(HubSpotData)
+
+    def ids(self, queryset):
+        return sorted(queryset.values_list("record_id", flat=True))
+
+    def test_hot_properties_are_filtered_on_generated_columns(self):
+        BulkWriter("2-123").write(
+            [
+                {"id": "1", "properties": {"dealstage": "won", "amount": "1500.5", "region": "north"}},
+                {"id": "2", "properties": {"dealstage": "won", "amount": "", "region": "north"}},
+                {"id": "3", "properties": {"dealstage": "lost", "amount": "20000", "region": "north"}},
+            ]
+        )
+        with override_settings(HUBSPOT_HOT_PROPERTIES=self.hot):
+            self.assertEqual(ensure_hot_columns(HubSpotData), (["hot_amount", "hot_dealstage"], []))
+            self.assertEqual(ensure_hot_columns(HubSpotData), ([], []))
+            BulkWriter("2-123").write([{"id": "4", "properties": {"dealstage": "won", "amount": "999"}}])
+            won = HubSpotData.objects.filter_properties("2-123", dealstage="won", amount__gte=1000, region="north")
+            self.assertIn('"hot_amount"', str(won.query))
+            self.assertEqual(self.ids(won), ["1"])
+            self.assertEqual(self.ids(HubSpotData.objects.filter_properties("2-123", amount__isnull=True)), ["2"])
+            self.assertEqual(self.ids(HubSpotData.objects.filter_properties("2-999", dealstage="won")), [])
+
+        # Without hot columns the same filters read the JSON.
+        self.assertEqual(ensure_hot_columns(HubSpotData), ([], ["hot_amount", "hot_dealstage"]))
+        won = HubSpotData.objects.filter_properties("2-123", dealstage="won", region="north")
+        self.assertEqual(self.ids(won), ["1", "2"])
+
+
+class ReconcileTests(SimpleTestCase):
+    def test_missing_ids_is_a_sorted_set_difference(self):
+        local = sorted_ids([9, 3, 1, 7, 7, 2**40])
+        remote = sorted_ids([2, 3, 8, 9])
+        self.assertEqual(list(missing_ids(local, remote)), [1, 7, 2**40])
+        self.assertEqual(list(missing_ids(local, sorted_ids([]))), [1, 3, 7, 9, 2**40])
+
+    @mock.patch("hubspot_sync.reconcile.SORT_RUN_SIZE", 4)
+    def test_sorted_ids_merges_sorted_runs(self):
+        rng = random.Random(0)
+        ids = [rng.randrange(-(2**62), 2**62) for _ in range(37)] + [5, 5]
+        self.assertEqual(sorted_ids(iter(ids)).tolist(), sorted(ids))
+        self.assertEqual(sorted_ids(array("q", range(10))).tolist(), list(range(10)))
+
+
+class SchedulerTests(SimpleTestCase):
+    def test_due_jobs_come_out_by_priority_and_wait_for_their_interval(self):
+        now = [0.0]
+        scheduler = Scheduler(clock=lambda: now[0])
+        scheduler.add("divisions", 3600, priority=3)
+        scheduler.add("jobs", 120, priority=1)
+        scheduler.add("employees", 900, priority=2, due=10)
+        self.assertEqual(scheduler.pop_due(), ["jobs", "divisions"])
+        self.assertEqual(scheduler.next_in(), 10)
+        scheduler.reschedule("jobs")
+        scheduler.reschedule("divisions")
+        now[0] = 120
+        self.assertEqual(scheduler.pop_due(), ["jobs", "employees"])
+        self.assertEqual(scheduler.next_in(), 3480)
+
+
+@override_settings(HUBSPOT_CLIENT_SECRET="secret")
+class WebhookTests(TestCase):
+    def post(self, events, secret="secret", timestamp=None):
+        body = json.dumps(events)
+        timestamp = str(timestamp or int(time.time() * 1000))
+        source = f"POSThttp://testserver/hubspot/webhooks/{body}{timestamp}".encode()
+        signature = base64.b64encode(hmac.new(secret.encode(), source, hashlib.sha256).digest()).decode()
+        return self.client.post(
+            reverse("hubspot-webhook"),
+            body,
+            content_type="application/json",
+            headers={"X-HubSpot-Signature-v3": signature, "X-HubSpot-Request-Timestamp": timestamp},
+        )
+
+    def event(self, event_id, object_id, change="propertyChange", object_type="2-37778614"):
+        return {
+            "eventId": event_id,
+            "portalId": 1,
+            "objectId": object_id,
+            "objectTypeId": object_type,
+            "subscriptionType": f"object.{change}",
+            "occurredAt": 1700000000000,
+        }
+
+    def test_signed_events_are_queued_and_coalesced(self):
+        events = [self.event(1, 10), self.event(2, 10), self.event(3, 11), self.event(4, 11, "deletion")]
+        self.assertEqual(self.post(events).status_code, 204)
+        # HubSpot redelivers events it did not get an answer for in time.
+        self.assertEqual(self.post(events[:2]).status_code, 204)
+        self.assertEqual(HubSpotWebhookEvent.objects.count(), 4)
+        pks, changes = pending_changes()
+        self.assertEqual(len(pks), 4)
+        self.assertEqual(changes, {"2-37778614": ([10], [11])})
+
+    def test_invalid_and_stale_signatures_are_rejected(self):
+        self.assertEqual(self.post([self.event(1, 10)], secret="other").status_code, 403)
+        stale = int((time.time() - 3600) * 1000)
+        self.assertEqual(self.post([self.event(1, 10)], timestamp=stale).status_code, 403)
+        self.assertFalse(HubSpotWebhookEvent.objects.exists())
+
+
+class MockServerSyncTests(TransactionTestCase):
+    def test_full_sync_against_the_mock_server(self):
+        mock = MockHubSpot({"jobs": 250, "divisions": 30, "employees": 40})
+        with MockServerThread(mock) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", stdout=io.StringIO())
+        self.assertEqual(Job.objects.count(), 250)
+        self.assertEqual(Division.objects.count(), 30)
+        self.assertEqual(Employee.objects.count(), 40)
+        self.assertEqual(HubSpotSyncHistory.objects.count(), 3)
+
+    def test_retries_below_one_are_rejected(self):
+        with override_settings(HUBSPOT_API_TOKEN="token"):
+            with self.assertRaisesMessage(CommandError, "--retries must be at least 1."):
+                call_command("sync_hubspot", "--retries", "0", stdout=io.StringIO())
+
+    def test_pipelined_sync_on_sqlite_uses_a_single_writer(self):
+        mock_hubspot = MockHubSpot({"jobs": 250, "divisions": 30, "employees": 40})
+        stdout = io.StringIO()
+        with MockServerThread(mock_hubspot) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", "--pipeline", "--writers", "3", stdout=stdout)
+        self.assertIn("ignoring --writers 3", stdout.getvalue())
+        self.assertEqual(Job.objects.count(), 250)
+
+    def test_failed_endpoints_make_the_command_fail(self):
+        mock = MockHubSpot({"jobs": 20, "divisions": 5, "employees": 0})
+        mock.fail("/crm/v3/objects/2-37778614")
+        with MockServerThread(mock) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                with self.assertRaisesMessage(CommandError, "failed for 1 endpoint(s): 2-37778614"):
+                    call_command("sync_hubspot", "--retries", "1", stdout=io.StringIO())
+        self.assertEqual((Job.objects.count(), Division.objects.count()), (0, 5))
+        self.assertEqual(SyncRunEndpoint.objects.get(endpoint="2-37778614").status, SyncRun.Status.FAILED)
+
+    def test_failed_schema_discovery_makes_the_command_fail(self):
+        mock_hubspot = MockHubSpot({"jobs": 20, "divisions": 0, "employees": 0})
+        mock_hubspot.fail("/crm/v3/schemas")
+        with MockServerThread(mock_hubspot) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                with self.assertRaisesMessage(CommandError, "failed for 1 endpoint(s): schemas"):
+                    call_command("sync_hubspot", "--retries", "1", stdout=io.StringIO())
+        self.assertEqual(Job.objects.count(), 0)
+
+    def test_failed_batch_reads_are_reported_with_their_ids(self):
+        mock_hubspot = MockHubSpot({"jobs": 250, "divisions": 0, "employees": 0})
+        mock_hubspot.fail("/batch/read", after=1)
+        ids = [str(object_id) for object_id in range(1, 251)]
+        stdout = io.StringIO()
+        with MockServerThread(mock_hubspot) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                with self.assertRaisesMessage(CommandError, "failed for 1 endpoint(s): jobs"):
+                    call_command(
+                        "sync_hubspot", "--endpoint", "jobs", "--ids", *ids, "--concurent", "1", "--retries", "1",
+                        stdout=stdout,
+                    )
+        # The second of three batch reads failed; the others were written.
+        self.assertEqual(Job.objects.count(), 150)
+        self.assertIn("100 ids were not re-fetched: " + " ".join(ids[100:200]), stdout.getvalue())
+
+    @mock.patch.object(HubSpotClient, "SEARCH_RATE", 1000)
+    def test_incremental_search_moves_past_the_result_cap(self):
+        mock_hubspot = MockHubSpot({"jobs": 10400, "divisions": 0, "employees": 0})
+        HubSpotSyncHistory.objects.create(endpoint="jobs", last_synced_at=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        started = timezone.now()
+        with MockServerThread(mock_hubspot) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", "--endpoint", "jobs", stdout=io.StringIO())
+        self.assertEqual(Job.objects.count(), 10400)
+        self.assertEqual(mock_hubspot.stats["list"], 0)
+        # One window past the 10k cap; only the boundary timestamp is fetched twice.
+        run = SyncRunEndpoint.objects.get(endpoint="jobs")
+        self.assertGreaterEqual(run.records, 10400)
+        self.assertLess(run.records, 10400 + 5)
+        self.assertEqual(mock_hubspot.stats["search"], run.pages)
+        history = HubSpotSyncHistory.objects.get(endpoint="jobs")
+        self.assertEqual(history.last_synced_at, run.watermark_after)
+        self.assertTrue(started <= history.last_synced_at <= run.finished_at)
+        self.assertIsNone(history.checkpoint_started_at)
+
+    def test_an_interrupted_search_resumes_from_its_last_committed_record(self):
+        mock_hubspot = MockHubSpot({"jobs": 1000, "divisions": 0, "employees": 0})
+        HubSpotSyncHistory.objects.create(endpoint="jobs", last_synced_at=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        mock_hubspot.fail("/search", after=2)
+        with MockServerThread(mock_hubspot) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                with self.assertRaises(CommandError):
+                    call_command("sync_hubspot", "--endpoint", "jobs", "--retries", "1", stdout=io.StringIO())
+                history = HubSpotSyncHistory.objects.get(endpoint="jobs")
+                synced = set(Job.objects.values_list("job_id", flat=True))
+                self.assertEqual(len(synced), 400)
+                last = max(Job.objects.all(), key=lambda job: job.hs_lastmodifieddate)
+                self.assertEqual(history.checkpoint_since, last.hs_lastmodifieddate)
+                self.assertEqual(history.checkpoint_after, str(last.job_id))
+                # Modifying synced records moves them to the end of the
+                # search and shifts every later record to a lower offset.
+                mock_hubspot.touch("jobs", sorted(synced)[:200])
+                call_command("sync_hubspot", "--endpoint", "jobs", stdout=io.StringIO())
+        self.assertEqual(Job.objects.count(), 1000)
+        history.refresh_from_db()
+        self.assertIsNone(history.checkpoint_started_at)
+
+    @mock.patch.object(HubSpotClient, "SEARCH_RATE", 1000)
+    def test_shards_are_searched_concurrently_and_every_record_arrives_once(self):
+        mock_hubspot = MockHubSpot({"jobs": 2000, "divisions": 0, "employees": 0}, latency=0.02)
+        with MockServerThread(mock_hubspot) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", "--endpoint", "jobs", "--shards", "4", stdout=io.StringIO())
+        self.assertEqual(Job.objects.count(), 2000)
+        run = SyncRunEndpoint.objects.get(endpoint="jobs")
+        # Each 500-id shard takes three pages of up to 200 records.
+        self.assertEqual((run.records, run.pages), (2000, 12))
+        # Two searches for the id bounds, then one per page.
+        self.assertEqual(mock_hubspot.stats["search"], 2 + 12)
+        self.assertEqual(mock_hubspot.stats["list"], 0)
+        self.assertGreater(mock_hubspot.stats["max_in_flight"], 1)
+
+    @mock.patch.object(HubSpotClient, "SEARCH_RATE", 1000)
+    def test_an_interrupted_sharded_search_resumes_its_unfinished_shards(self):
+        mock_hubspot = MockHubSpot({"jobs": 2000, "divisions": 0, "employees": 0})
+        mock_hubspot.fail("/search", after=8)
+        with MockServerThread(mock_hubspot) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                with self.assertRaises(CommandError):
+                    call_command(
+                        "sync_hubspot", "--endpoint", "jobs", "--shards", "4", "--retries", "1",
+                        stdout=io.StringIO(),
+                    )
+                history = HubSpotSyncHistory.objects.get(endpoint="jobs")
+                self.assertTrue(history.checkpoint_after.startswith("shards:"))
+                self.assertLess(Job.objects.count(), 2000)
+                call_command("sync_hubspot", "--endpoint", "jobs", stdout=io.StringIO())
+        self.assertEqual(Job.objects.count(), 2000)
+        first, second = SyncRunEndpoint.objects.filter(endpoint="jobs").order_by("started_at")
+        self.assertEqual(first.records + second.records, 2000)
+        history.refresh_from_db()
+        self.assertIsNone(history.checkpoint_after)
+
+    def test_runs_are_recorded_and_metrics_exposed(self):
+        mock = MockHubSpot({"jobs": 120, "divisions": 0, "employees": 0})
+        with MockServerThread(mock) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", "--endpoint", "jobs", stdout=io.StringIO())
+                call_command("sync_hubspot", "--endpoint", "jobs", "--full-load", stdout=io.StringIO())
+        first, second = SyncRunEndpoint.objects.filter(endpoint="jobs").order_by("started_at")
+        self.assertEqual((first.pages, first.records, first.inserted, first.skipped), (2, 120, 120, 0))
+        self.assertEqual((second.records, second.inserted, second.updated, second.skipped), (120, 0, 0, 120))
+        self.assertTrue(first.bytes > 0 and first.api_calls >= 2)
+        self.assertEqual(first.histograms["http"]["count"], first.api_calls)
+        # Each run is kept with the watermark it started from and left behind.
+        self.assertIsNone(first.watermark_before)
+        self.assertEqual(second.watermark_before, first.watermark_after)
+        self.assertEqual(second.watermark_after, HubSpotSyncHistory.objects.get(endpoint="jobs").last_synced_at)
+        self.assertEqual(
+            list(SyncRun.objects.order_by("started_at").values_list("mode", "status")),
+            [("incremental", "succeeded"), ("full", "succeeded")],
+        )
+        self.assertEqual(second.run.endpoints.get(), second)
+        day = SyncEndpointDay.objects.get(endpoint="jobs")
+        self.assertEqual((day.runs, day.failures, day.records), (2, 0, 240))
+
+        body = self.client.get(reverse("hubspot-metrics")).content.decode()
+        self.assertIn('hubspot_sync_runs_total{portal="default",endpoint="jobs"} 2', body)
+        self.assertIn('hubspot_sync_rows_total{portal="default",endpoint="jobs",result="skipped"} 120', body)
+        self.assertIn('hubspot_sync_http_request_duration_seconds_bucket{portal="default",endpoint="jobs",le="+Inf"}', body)
+        with override_settings(HUBSPOT_METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get(reverse("hubspot-metrics")).status_code, 403)
+            response = self.client.get(reverse("hubspot-metrics"), headers={"Authorization": "Bearer secret"})
+            self.assertEqual(response.status_code, 200)
+
+    def test_profile_reports_hot_spots_per_stage(self):
+        mock = MockHubSpot({"jobs": 150, "divisions": 0, "employees": 0})
+        output = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory, MockServerThread(mock) as server:
+            path = os.path.join(directory, "sync.pstats")
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", "--endpoint", "jobs", "--profile", path, stdout=output)
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
+        report = output.getvalue()
+        for stage in ("ORM:", "JSON:", "mapping:", "HTTP:", "Slowest asyncio tasks"):
+            self.assertIn(stage, report)
+        self.assertRegex(report, r"write: [1-9]\d* queries")
+        self.assertEqual(Job.objects.count(), 150)
+
+    def test_associations_are_stored_as_edges(self):
+        mock = MockHubSpot({"jobs": 30, "divisions": 4, "employees": 6})
+        with MockServerThread(mock) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", "--associations", stdout=io.StringIO())
+                # Re-fetching a record replaces its edges instead of adding to them.
+                call_command(
+                    "sync_hubspot", "--associations", "--endpoint", "jobs", "--ids", "2", stdout=io.StringIO()
+                )
+        edges = HubSpotAssociation.objects.filter(from_type="2-37778614", from_id=2, to_type="2-37778609")
+        self.assertEqual(sorted(edges.values_list("to_id", "label")), [(2, ""), (2, "Primary")])
+        # One edge per record and pair, plus a labeled one for even ids.
+        self.assertEqual(HubSpotAssociation.objects.filter(from_type="2-37778614").count(), 2 * (30 + 15))
+        self.assertEqual(HubSpotAssociation.objects.filter(from_type="2-38071071").count(), 6 + 3)
+
+    def test_reconcile_flags_and_deletes_records_gone_from_hubspot(self):
+        mock = MockHubSpot({"jobs": 50, "divisions": 0, "employees": 20})
+        with MockServerThread(mock) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", "--reconcile", stdout=io.StringIO())
+                self.assertFalse(Job.objects.filter(archived_at__isnull=False).exists())
+                archived = sorted(Job.objects.values_list("job_id", flat=True))[:5]
+                deleted = sorted(Employee.objects.values_list("hs_object_id", flat=True))[:3]
+                mock.archive("jobs", archived)
+                mock.archive("employees", deleted, purge=True)
+                # Archived records are found on every run, deletions by the
+                # comparison of all live ids.
+                call_command("sync_hubspot", "--reconcile", stdout=io.StringIO())
+                self.assertEqual(
+                    sorted(Job.objects.filter(archived_at__isnull=False).values_list("job_id", flat=True)), archived
+                )
+                self.assertFalse(Employee.objects.filter(archived_at__isnull=False).exists())
+                call_command("sync_hubspot", "--full-reconcile", stdout=io.StringIO())
+                self.assertEqual(
+                    sorted(Employee.objects.filter(archived_at__isnull=False).values_list("hs_object_id", flat=True)),
+                    deleted,
+                )
+                call_command("sync_hubspot", "--full-reconcile", "--delete-missing", stdout=io.StringIO())
+        self.assertEqual((Job.objects.count(), Employee.objects.count()), (45, 17))
+
+    def test_webhook_events_are_applied_with_batch_reads(self):
+        mock = MockHubSpot({"jobs": 10, "divisions": 0, "employees": 5})
+        with MockServerThread(mock) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                call_command("sync_hubspot", "--endpoint", "employees", stdout=io.StringIO())
+                HubSpotWebhookEvent.objects.bulk_create(
+                    [
+                        HubSpotWebhookEvent(event_id=1, object_type="2-37778614", object_id=3, change="creation"),
+                        HubSpotWebhookEvent(event_id=2, object_type="2-37778614", object_id=4, change="creation"),
+                        HubSpotWebhookEvent(event_id=3, object_type="2-37778614", object_id=4, change="propertyChange"),
+                        HubSpotWebhookEvent(event_id=4, object_type="2-38071071", object_id=2, change="deletion"),
+                    ]
+                )
+                call_command("sync_hubspot", "--webhooks", stdout=io.StringIO())
+        self.assertEqual(sorted(Job.objects.values_list("job_id", flat=True)), [3, 4])
+        archived = Employee.objects.filter(archived_at__isnull=False)
+        self.assertEqual(list(archived.values_list("hs_object_id", flat=True)), [2])
+        self.assertFalse(HubSpotWebhookEvent.objects.filter(processed_at__isnull=True).exists())
+        # Both jobs were fetched with a single batch read.
+        self.assertEqual(mock.stats["batch_read"], 1)
+
+    @override_settings(
+        HUBSPOT_SCHEDULES={"jobs": {"interval": 0.2, "priority": 0}},
+        HUBSPOT_DEFAULT_SCHEDULE={"interval": 3600, "priority": 1},
+    )
+    def test_daemon_runs_endpoints_on_their_schedule_until_sigterm(self):
+        mock = MockHubSpot({"jobs": 20, "divisions": 3, "employees": 5})
+        output = io.StringIO()
+
+        def terminate():
+            # Once the jobs endpoint has been synced a few times.
+            deadline = time.monotonic() + 30
+            while output.getvalue().count("Syncing endpoint: 2-37778614") < 3 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        with MockServerThread(mock) as server:
+            with override_settings(HUBSPOT_API_BASE_URL=server.url, HUBSPOT_API_TOKEN="token"):
+                thread = threading.Thread(target=terminate)
+                thread.start()
+                call_command("sync_hubspot", "--daemon", stdout=output)
+                thread.join()
+        log = output.getvalue()
+        self.assertIn("Sync daemon stopped.", log)
+        self.assertEqual(log.count("Syncing endpoint: 2-37778609"), 1)
+        self.assertGreaterEqual(log.count("Syncing endpoint: 2-37778614"), 3)
+        self.assertEqual((Job.objects.count(), Division.objects.count()), (20, 3))
+        self.assertEqual(mock.stats["schemas"], 1)
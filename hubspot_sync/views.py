@@ -1,3 +1,59 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from hubspot_sync.metrics import render
+from hubspot_sync.models import HubSpotSyncHistory
+from hubspot_sync.registry import configured_portals
+from hubspot_sync.webhooks import SIGNATURE_HEADER, TIMESTAMP_HEADER, parse_events, queue_events, valid_signature
+
+
+@csrf_exempt
+@require_POST
+def webhook(request):
+    """
+    Receive HubSpot webhook events. Requests are checked against their v3
+    signature and the events only queued, so HubSpot gets its answer within a
+    single insert; sync_hubspot --webhooks fetches the changed objects.
+    """
+    if not valid_signature(
+        request.method,
+        request.build_absolute_uri(),
+        request.body,
+        request.headers.get(TIMESTAMP_HEADER),
+        request.headers.get(SIGNATURE_HEADER),
+    ):
+        return HttpResponseForbidden("Invalid signature.")
+    try:
+        events = parse_events(request.body)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid payload.")
+    queue_events(events)
+    return HttpResponse(status=204)
+
+
+@require_GET
+def metrics(request):
+    """
+    Sync metrics of every endpoint in the Prometheus text format. The sync
+    runs in its own process, so the totals are read from each portal's
+    HubSpotSyncHistory rather than kept in memory. With HUBSPOT_METRICS_TOKEN
+    set, scrapers must send it as a bearer token.
+    """
+    token = getattr(settings, "HUBSPOT_METRICS_TOKEN", None)
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden("Invalid token.")
+    databases = {}
+    for portal in configured_portals().values():
+        databases.setdefault(portal.database, portal.name)
+    rows = []
+    for using, portal in databases.items():
+        for endpoint, totals in (
+            HubSpotSyncHistory.objects.using(using).order_by("endpoint").values_list("endpoint", "metrics")
+        ):
+            if totals:
+                rows.append(({"portal": portal, "endpoint": endpoint}, totals))
+    return HttpResponse(render(rows), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,150 @@
+"""
+HubSpot webhook events: signature validation (v3), parsing into queued
+HubSpotWebhookEvent rows, and coalescing the queue into the object ids to
+fetch or archive per object type.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from hubspot_sync.mapping import to_int
+from hubspot_sync.models import HubSpotWebhookEvent
+from hubspot_sync.registry import configured_portals
+
+SIGNATURE_HEADER = "X-HubSpot-Signature-v3"
+TIMESTAMP_HEADER = "X-HubSpot-Request-Timestamp"
+# HubSpot signs the URI with these escapes decoded ("%3F" is kept).
+URI_ESCAPES = {
+    "%3A": ":", "%2F": "/", "%40": "@", "%21": "!", "%24": "$", "%27": "'",
+    "%28": "(", "%29": ")", "%2A": "*", "%2C": ",", "%3B": ";",
+}
+# Object type ids of the standard objects named by legacy subscription types
+# ("contact.propertyChange"); generic "object.*" events carry objectTypeId.
+STANDARD_OBJECT_TYPES = {"contact": "0-1", "company": "0-2", "deal": "0-3", "ticket": "0-5"}
+# Changes after which an object is archived instead of fetched.
+DELETIONS = frozenset(("deletion", "privacyDeletion"))
+# Pending events read per round of sync_hubspot --webhooks.
+WEBHOOK_BATCH_SIZE = 10000
+
+
+def signed_uri(uri):
+    for escape, character in URI_ESCAPES.items():
+        uri = uri.replace(escape, character).replace(escape.lower(), character)
+    return uri
+
+
+def valid_signature(method, uri, body, timestamp, signature, secret=None, now=None):
+    """
+    Check a v3 signature: base64 HMAC-SHA256 with the app's client secret of
+    method + URI + body + timestamp, sent less than HUBSPOT_WEBHOOK_MAX_AGE
+    seconds ago.
+    """
+    secret = secret or getattr(settings, "HUBSPOT_CLIENT_SECRET", None)
+    timestamp_ms = to_int(timestamp)
+    if not secret or not signature or timestamp_ms is None:
+        return False
+    now = time.time() if now is None else now
+    if abs(now * 1000 - timestamp_ms) > getattr(settings, "HUBSPOT_WEBHOOK_MAX_AGE", 300) * 1000:
+        return False
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    source = f"{method}{signed_uri(uri)}{body}{timestamp}".encode("utf-8")
+    expected = base64.b64encode(hmac.new(secret.encode(), source, hashlib.sha256).digest()).decode()
+    return hmac.compare_digest(expected, signature)
+
+
+def object_type(event):
+    if event.get("objectTypeId"):
+        return event["objectTypeId"]
+    prefix = (event.get("subscriptionType") or "").split(".", 1)[0]
+    return STANDARD_OBJECT_TYPES.get(prefix)
+
+
+def parse_events(body):
+    """
+    The object change events of a webhook payload as unsaved
+    HubSpotWebhookEvent rows. Raises ValueError for a malformed payload.
+    """
+    payload = json.loads(body)
+    if not isinstance(payload, list):
+        raise ValueError("A webhook payload is a list of events.")
+    events = []
+    for event in payload:
+        if not isinstance(event, dict):
+            continue
+        event_id = to_int(event.get("eventId"))
+        object_id = to_int(event.get("objectId"))
+        type_id = object_type(event)
+        if event_id is None or object_id is None or not type_id:
+            continue
+        occurred_at = to_int(event.get("occurredAt"))
+        events.append(
+            HubSpotWebhookEvent(
+                event_id=event_id,
+                portal_id=to_int(event.get("portalId")),
+                object_type=type_id,
+                object_id=object_id,
+                change=(event.get("subscriptionType") or "").rsplit(".", 1)[-1][:50],
+                occurred_at=(
+                    datetime.fromtimestamp(occurred_at / 1000, tz=dt_timezone.utc) if occurred_at else None
+                ),
+            )
+        )
+    return events
+
+
+def portal_databases():
+    """Database alias of each configured portal, by HubSpot portal id."""
+    return {
+        to_int(portal.portal_id): portal.database
+        for portal in configured_portals().values()
+        if portal.portal_id is not None
+    }
+
+
+def queue_events(events):
+    """
+    Store events in the database of the portal they came from (the default
+    database for unknown portals); redelivered events are ignored.
+    """
+    databases = portal_databases()
+    by_database = {}
+    for event in events:
+        by_database.setdefault(databases.get(event.portal_id, DEFAULT_DB_ALIAS), []).append(event)
+    for using, rows in by_database.items():
+        HubSpotWebhookEvent.objects.using(using).bulk_create(rows, ignore_conflicts=True)
+    return len(events)
+
+
+def pending_changes(using=DEFAULT_DB_ALIAS, limit=WEBHOOK_BATCH_SIZE):
+    """
+    Coalesce up to ``limit`` pending events into ``(event pks, changes)``,
+    where ``changes`` maps each object type to ``(ids to fetch, ids to
+    archive)``, decided by the latest event of each object.
+    """
+    pending = (
+        HubSpotWebhookEvent.objects.using(using)
+        .filter(processed_at__isnull=True)
+        .order_by("id")
+        .values_list("id", "object_type", "object_id", "change")[:limit]
+    )
+    pks = []
+    latest = {}
+    for pk, type_id, object_id, change in pending:
+        pks.append(pk)
+        latest[(type_id, object_id)] = change
+    changes = {}
+    for (type_id, object_id), change in latest.items():
+        fetch, archive = changes.setdefault(type_id, ([], []))
+        (archive if change in DELETIONS else fetch).append(object_id)
+    return pks, changes
+
+
+def mark_processed(pks, processed_at, using=DEFAULT_DB_ALIAS):
+    return HubSpotWebhookEvent.objects.using(using).filter(id__in=pks).update(processed_at=processed_at)
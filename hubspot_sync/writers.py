@@ -0,0 +1,297 @@
+import io
+import json
+import threading
+from array import array
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from hubspot_sync import metrics
+from hubspot_sync.mapping import FINGERPRINT_FIELD, fingerprint, to_bool, to_int
+from hubspot_sync.models import HubSpotData
+from hubspot_sync.registry import default_registry
+
+
+def resolve_model(endpoint, registry=None):
+    """The model storing ``endpoint`` and its upsert key (None for HubSpotData)."""
+    registry = registry or default_registry
+    model = registry.resolve(endpoint)
+    if model is HubSpotData:
+        return HubSpotData, None
+    return model, registry.plan(model).key
+
+
+def requested_properties(endpoint, registry=None):
+    """
+    The property names to ask HubSpot for. Mapped models request exactly
+    their concrete fields; HubSpotData fallbacks use HUBSPOT_DATA_PROPERTIES
+    and get HubSpot's default property set when no list is configured.
+    """
+    registry = registry or default_registry
+    model = registry.resolve(endpoint)
+    if model is HubSpotData:
+        configured = getattr(settings, "HUBSPOT_DATA_PROPERTIES", {}) or {}
+        properties = configured.get(endpoint)
+        return list(properties) if properties else None
+    return list(registry.plan(model).properties)
+
+
+def record_properties(record):
+    # HubSpot nests the object's values under "properties"; fall back to the
+    # record itself for payloads that were already flattened.
+    return record.get("properties") or record
+
+
+class BulkWriter:
+    """
+    Persists whole pages of HubSpot records for one endpoint with a single
+    bulk_create(update_conflicts=True) per call instead of one query per record.
+
+    Rows whose fingerprint matches the stored one are left alone, so records
+    an incremental run returns without changes cost no row update; their
+    number is kept in ``skipped``.
+
+    The target model and plan come from ``registry`` (one per portal) and
+    are resolved once here; rows go to the ``using`` database.
+    """
+
+    def __init__(self, endpoint, registry=None, using=None):
+        self.endpoint = endpoint
+        self.registry = registry or default_registry
+        self.using = using or DEFAULT_DB_ALIAS
+        self.model, self.key = resolve_model(endpoint, self.registry)
+        self.skipped = 0
+        # HubSpot object ids of every record written, once track_ids() was
+        # called (the records whose associations are refreshed).
+        self.object_ids = None
+        self._lock = threading.Lock()
+        if self.model is HubSpotData:
+            self.plan = None
+            self.unique_fields = ["endpoint", "record_id"]
+            self.update_fields = ["data", "fingerprint", "archived_at", "updated_at"]
+            self.fields = []
+        else:
+            self.plan = self.registry.plan(self.model)
+            self.fields = self.plan.fields
+            self.unique_fields = [self.key]
+            self.update_fields = [
+                field.name for field in self.fields if field.name != self.key
+            ]
+
+    def build(self, records):
+        objs = {}
+        for record in records:
+            obj = self.build_instance(record)
+            if obj is None:
+                continue
+            # The same object can show up twice in one batch; ON CONFLICT can
+            # only touch a row once per statement, so the latest copy wins.
+            objs[self.instance_key(obj)] = obj
+        return list(objs.values())
+
+    def build_instance(self, record):
+        if self.model is HubSpotData:
+            record_id = record.get("id") or record_properties(record).get("job_id")
+            if record_id is None:
+                return None
+            return HubSpotData(
+                endpoint=self.endpoint,
+                record_id=str(record_id),
+                data=record,
+                fingerprint=fingerprint(record),
+            )
+
+        data = self.plan.convert(record_properties(record))
+        if data.get(self.key) is None and self.key == "hs_object_id":
+            data[self.key] = to_int(record.get("id"))
+        if data.get(self.key) is None:
+            return None
+        return self.model(**data)
+
+    def instance_key(self, obj):
+        if self.model is HubSpotData:
+            return obj.record_id
+        return str(getattr(obj, self.key))
+
+    def changed(self, objs):
+        """
+        Drop the objects whose stored fingerprint is already up to date, and
+        count the rest as inserted or updated.
+        """
+        if not objs:
+            return objs
+        if self.plan and not self.plan.fingerprinted:
+            # Without fingerprints an upsert cannot tell the two apart.
+            metrics.count("updated", len(objs))
+            return objs
+        keys = [self.instance_key(obj) for obj in objs]
+        if self.model is HubSpotData:
+            stored = HubSpotData.objects.using(self.using).filter(endpoint=self.endpoint, record_id__in=keys)
+            stored = dict(stored.values_list("record_id", FINGERPRINT_FIELD))
+        else:
+            stored = self.model.objects.using(self.using).filter(**{f"{self.key}__in": keys})
+            stored = {str(key): value for key, value in stored.values_list(self.key, FINGERPRINT_FIELD)}
+        changed = [obj for obj, key in zip(objs, keys) if stored.get(key) != obj.fingerprint]
+        inserted = sum(1 for key in keys if key not in stored)
+        with self._lock:
+            self.skipped += len(objs) - len(changed)
+        metrics.count("inserted", inserted)
+        metrics.count("updated", len(changed) - inserted)
+        metrics.count("skipped", len(objs) - len(changed))
+        return changed
+
+    def track_ids(self):
+        self.object_ids = array("q")
+
+    def track(self, records):
+        if self.object_ids is None:
+            return
+        ids = [object_id for object_id in (to_int(record.get("id")) for record in records) if object_id is not None]
+        with self._lock:
+            self.object_ids.extend(ids)
+
+    def begin(self):
+        pass
+
+    def write(self, records):
+        self.track(records)
+        with metrics.timed("mapping"):
+            objs = self.build(records)
+        with metrics.timed("write"):
+            objs = self.changed(objs)
+            if objs:
+                self.model.objects.using(self.using).bulk_create(
+                    objs,
+                    update_conflicts=True,
+                    unique_fields=self.unique_fields,
+                    update_fields=self.update_fields,
+                )
+        return len(objs)
+
+    def finish(self, mark_synced=None):
+        if mark_synced:
+            mark_synced(self.endpoint)
+        return 0
+
+
+class CopyLoader(BulkWriter):
+    """
+    Full-load path for PostgreSQL: every page is streamed into a temporary
+    staging table with COPY FROM STDIN, and finish() merges the staging table
+    into the real table with a single INSERT ... ON CONFLICT DO UPDATE. The
+    merge and the sync history update share one transaction, so a run either
+    lands completely or not at all.
+    """
+
+    def __init__(self, endpoint, registry=None, using=None):
+        super().__init__(endpoint, registry, using)
+        if self.model is HubSpotData:
+            raise ValueError(f"Endpoint {endpoint} has no model to full-load into.")
+        self.table = self.model._meta.db_table
+        self.stage = f"{self.table}_stage"
+        self.columns = [field.column for field in self.fields]
+        self.key_column = self.model._meta.get_field(self.key).column
+        self.staged = 0
+
+    @property
+    def connection(self):
+        # Looked up on every use: connections are per thread.
+        return connections[self.using]
+
+    @staticmethod
+    def supported(using=None):
+        return connections[using or DEFAULT_DB_ALIAS].vendor == "postgresql"
+
+    def begin(self):
+        qn = self.connection.ops.quote_name
+        columns = ", ".join(qn(column) for column in self.columns)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {qn(self.stage)}")
+            # No constraints or indexes on the staging table; duplicates are
+            # resolved in the merge by keeping the most recently staged row.
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {qn(self.stage)} AS "
+                f"SELECT {columns} FROM {qn(self.table)} WITH NO DATA"
+            )
+            cursor.execute(f"ALTER TABLE {qn(self.stage)} ADD COLUMN _seq bigserial")
+        self.staged = 0
+
+    def write(self, records):
+        self.track(records)
+        with metrics.timed("mapping"):
+            objs = self.build(records)
+            if not objs:
+                return 0
+            buffer = io.StringIO()
+            for obj in objs:
+                buffer.write("\t".join(self.encode(field, obj) for field in self.fields))
+                buffer.write("\n")
+            buffer.seek(0)
+        qn = self.connection.ops.quote_name
+        columns = ", ".join(qn(column) for column in self.columns)
+        with metrics.timed("write"), self.connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {qn(self.stage)} ({columns}) FROM STDIN", buffer)
+        self.staged += len(objs)
+        return len(objs)
+
+    def encode(self, field, obj):
+        """``obj``'s value for ``field`` as one column of COPY's text format."""
+        value = getattr(obj, field.attname)
+        internal_type = field.get_internal_type()
+        if internal_type == "BooleanField":
+            # HubSpot sends "true" / "false"; any non-empty string is truthy.
+            value = to_bool(value)
+        value = field.get_prep_value(value)
+        if value is None:
+            return "\\N"
+        if internal_type == "JSONField":
+            value = json.dumps(value)
+        elif internal_type == "BooleanField":
+            value = "t" if value else "f"
+        else:
+            value = str(value)
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+
+    def finish(self, mark_synced=None):
+        qn = self.connection.ops.quote_name
+        columns = ", ".join(qn(column) for column in self.columns)
+        updates = ", ".join(
+            f"{qn(column)} = EXCLUDED.{qn(column)}"
+            for column in self.columns
+            if column != self.key_column
+        )
+        condition = ""
+        if self.plan.fingerprinted:
+            # Rows with an unchanged fingerprint are neither rewritten nor counted.
+            column = qn(FINGERPRINT_FIELD)
+            condition = f" WHERE {qn(self.table)}.{column} IS DISTINCT FROM EXCLUDED.{column}"
+        merged = 0
+        with transaction.atomic(using=self.using):
+            with metrics.timed("write"), self.connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(DISTINCT {qn(self.key_column)}) FROM {qn(self.stage)}")
+                distinct = cursor.fetchone()[0]
+                # xmax is 0 on rows the merge inserted rather than updated.
+                cursor.execute(
+                    f"WITH merged AS ("
+                    f"INSERT INTO {qn(self.table)} ({columns}) "
+                    f"SELECT DISTINCT ON ({qn(self.key_column)}) {columns} "
+                    f"FROM {qn(self.stage)} "
+                    f"ORDER BY {qn(self.key_column)}, _seq DESC "
+                    f"ON CONFLICT ({qn(self.key_column)}) DO UPDATE SET {updates}{condition} "
+                    f"RETURNING (xmax = 0) AS inserted"
+                    f") SELECT COUNT(*), COUNT(*) FILTER (WHERE inserted) FROM merged"
+                )
+                merged, inserted = cursor.fetchone()
+                self.skipped = distinct - merged
+                cursor.execute(f"DROP TABLE {qn(self.stage)}")
+            metrics.count("inserted", inserted)
+            metrics.count("updated", merged - inserted)
+            metrics.count("skipped", self.skipped)
+            if mark_synced:
+                mark_synced(self.endpoint)
+        return merged